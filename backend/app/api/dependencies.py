@@ -0,0 +1,147 @@
+"""
+Dependency Providers
+
+Shared service instances injected into routes with FastAPI's Depends().
+The payment service scores against the same FraudDetector as the
+evaluation routes, so every route sees one consistent sender history.
+With SCORING_WORKERS set, scoring runs in a pool of worker processes
+that own the sender state instead, and the routes send requests there.
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+from app.config import settings
+from app.services.flagged_accounts import FlaggedAccountStore
+from app.services.fraud_detector import FraudDetector
+from app.services.journal import TransactionJournal
+from app.services.metrics import FraudMetrics
+from app.services.payment_service import PaymentService
+from app.services.profiling import SamplingProfiler
+from app.services.receiver_fan_in import ReceiverFanIn
+from app.services.scoring_pool import ScoringPool
+from app.services.state_store import InMemoryStateStore, SenderSpill, StateStore, create_state_store
+
+
+@lru_cache(maxsize=None)
+def get_state_store() -> StateStore:
+    """Process-wide state store (STATE_BACKEND selects memory or shared SQLite)"""
+    spill = None
+    if settings.sender_spill_path and settings.state_backend == "memory":
+        spill = SenderSpill(settings.sender_spill_path)
+        if not settings.persistence_dir:
+            # Without a journal the rest of the state starts empty; spilled senders must too
+            spill.clear()
+    return create_state_store(
+        settings.state_backend,
+        settings.state_path,
+        payment_max_entries=settings.payment_max_entries,
+        payment_ttl_s=settings.payment_ttl_s,
+        max_senders=settings.sender_max_count,
+        max_bytes=settings.sender_memory_budget_mb * 1024 * 1024,
+        idle_ttl_s=settings.sender_idle_ttl_s,
+        spill=spill
+    )
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> Optional[FraudMetrics]:
+    """Process-wide metrics (None when METRICS_ENABLED is false); gauges read the shared services"""
+    if not settings.metrics_enabled:
+        return None
+    metrics = FraudMetrics(factor_sample_every=settings.metrics_factor_sample_every)
+    if settings.scoring_workers > 0:
+        metrics.track_state(lambda: get_scoring_pool().state_stats())
+    else:
+        metrics.track_state(lambda: get_state_store().state_stats())
+    metrics.add_gauge(
+        "payment_history_size", "Payments held in payment history", lambda: get_state_store().payment_count()
+    )
+    metrics.add_gauge(
+        "settlement_queue_depth", "Payments waiting for a free settler",
+        lambda: get_payment_service().settlement.queued()
+    )
+    metrics.add_gauge(
+        "fraud_flagged_accounts", "Receivers on the flagged list", lambda: len(get_flagged_account_store())
+    )
+    metrics.add_gauge(
+        "fraud_fan_in_receivers", "Receivers tracked by the fan-in index",
+        (lambda: get_scoring_pool().state_stats()["fan_in_receivers"]) if settings.scoring_workers > 0
+        else (lambda: len(get_fraud_detector().fan_in))
+    )
+    return metrics
+
+
+@lru_cache(maxsize=None)
+def get_profiler() -> Optional[SamplingProfiler]:
+    """Sampling profiler when PROFILE_PATH is set (started and stopped with the app)"""
+    if not settings.profile_path:
+        return None
+    return SamplingProfiler(settings.profile_path, settings.profile_interval_ms, settings.profile_flush_s)
+
+
+@lru_cache(maxsize=None)
+def get_flagged_account_store() -> FlaggedAccountStore:
+    """Flagged receiver list, hot-reloaded from FLAGGED_ACCOUNTS_PATH when set"""
+    flagged = FlaggedAccountStore(settings.flagged_accounts_path, settings.flagged_reload_interval_s)
+    flagged.start()
+    return flagged
+
+
+@lru_cache(maxsize=None)
+def get_transaction_journal() -> Optional[TransactionJournal]:
+    """
+    Snapshot + log journal for the memory backend when PERSISTENCE_DIR is set.
+    The SQLite backend is durable on its own and never journals; with a
+    scoring pool each worker journals its own partition instead.
+    """
+    store = get_state_store()
+    if not settings.persistence_dir or not isinstance(store, InMemoryStateStore) or settings.scoring_workers > 0:
+        return None
+    return TransactionJournal(
+        settings.persistence_dir,
+        store,
+        fsync_interval_ms=settings.log_fsync_interval_ms,
+        snapshot_interval_s=settings.snapshot_interval_s
+    )
+
+
+@lru_cache(maxsize=None)
+def get_fraud_detector() -> FraudDetector:
+    """Process-wide fraud detector, restored from the journal when one is configured"""
+    journal = get_transaction_journal()
+    detector = FraudDetector(
+        store=get_state_store(),
+        journal=journal,
+        flagged_receivers=get_flagged_account_store(),
+        stages=[name.strip() for name in settings.scoring_stages.split(",") if name.strip()],
+        fast_decisions=settings.fast_decisions,
+        metrics=get_metrics(),
+        fan_in=ReceiverFanIn(
+            settings.fan_in_window_s, settings.fan_in_threshold, settings.fan_in_max_receivers,
+            settings.fan_in_established_s
+        )
+    )
+    if journal is not None:
+        journal.restore(detector._apply_transaction)
+        journal.start()
+    return detector
+
+
+@lru_cache(maxsize=None)
+def get_scoring_pool() -> Optional[ScoringPool]:
+    """Scoring worker processes when SCORING_WORKERS is set (started and closed with the app)"""
+    if settings.scoring_workers <= 0:
+        return None
+    return ScoringPool(settings.scoring_workers, metrics=get_metrics())
+
+
+@lru_cache(maxsize=None)
+def get_payment_service() -> PaymentService:
+    """Process-wide payment service, sharing the fraud detector (or scoring pool) and the store"""
+    return PaymentService(
+        fraud_detector=get_fraud_detector(),
+        store=get_state_store(),
+        metrics=get_metrics(),
+        scoring_pool=get_scoring_pool()
+    )
@@ -0,0 +1,126 @@
+"""
+Request Middleware
+
+Plain ASGI middleware (no per-request task or body buffering, so streaming
+responses pass straight through):
+
+- MetricsMiddleware counts requests and times them by route template, and
+  sets the route for decision counters recorded while the request is handled.
+- ServerTimingMiddleware returns a per-phase Server-Timing header for
+  requests that ask for one.
+"""
+
+import time
+from typing import Dict, Iterable, List
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import FraudMetrics, current_route
+from app.services.profiling import RequestTimer, current_timer
+
+# Values of the Server-Timing-Request header / timing query parameter that opt in
+_TRUE = ("1", "true", "yes")
+
+
+class MetricsMiddleware:
+    """Records http_requests_total and http_request_duration_seconds"""
+
+    def __init__(self, app: ASGIApp, metrics: FraudMetrics, routes: List[BaseRoute]):
+        """
+        Args:
+            app: Next ASGI application
+            metrics: Instruments to update
+            routes: The application's route list (read at request time, so
+                routers included after the middleware is added are seen)
+        """
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+        # Resolved templates of parameter-free paths. Format: {(method, path): template}
+        self._static: Dict[tuple, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_template(scope)
+        token = current_route.set(route)
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.observe_request(route, scope["method"], status_code, time.perf_counter() - started)
+            current_route.reset(token)
+
+    def _route_template(self, scope: Scope) -> str:
+        """Route path template (e.g. /api/payments/{payment_id}), keeping label cardinality bounded"""
+        key = (scope["method"], scope["path"])
+        template = self._static.get(key)
+        if template is not None:
+            return template
+
+        for candidate in self.routes:
+            match, _ = candidate.matches(scope)
+            if match != Match.NONE:
+                template = getattr(candidate, "path", "unmatched")
+                if "{" not in template:
+                    self._static[key] = template
+                return template
+        return "unmatched"
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header to requests for `paths` that opt in with a
+    `Server-Timing-Request: 1` header or a `timing=true` query parameter
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str]):
+        """
+        Args:
+            app: Next ASGI application
+            paths: Request paths that may be timed
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timer.header(time.perf_counter()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timer.reset(token)
+
+    @staticmethod
+    def _requested(scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"server-timing-request":
+                return value.decode("latin-1").strip().lower() in _TRUE
+        for name, value in parse_qsl(scope["query_string"].decode("latin-1")):
+            if name == "timing":
+                return value.lower() in _TRUE
+        return False
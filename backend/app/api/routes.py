@@ -1,7 +1,28 @@
-from fastapi import APIRouter, HTTPException, status
+import json
+from typing import AsyncIterator, Literal, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from starlette.requests import ClientDisconnect
+from app.api.dependencies import (
+    get_flagged_account_store,
+    get_fraud_detector,
+    get_payment_service,
+    get_scoring_pool
+)
 from app.models.schemas import TransactionRequest, TransactionResponse, PaymentResult
+from app.services.flagged_accounts import FlaggedAccountStore
 from app.services.fraud_detector import FraudDetector
+from app.services.idempotency import IdempotencyKeyReused
 from app.services.payment_service import PaymentService
+from app.services.metrics import current_route
+from app.services.profiling import server_timed, timed_phase
+from app.services.scoring_channel import ScoringChannel
+from app.services.scoring_pool import ScoringPool
+from app.services.stream_scoring import LineSplitter, ThroughputReport, chunked, score_chunk
+from app.config import settings
 import logging
 
 # Configure logging
@@ -10,19 +31,53 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Singleton instances
-fraud_detector = FraudDetector()
-payment_service = PaymentService()
+# format=text: TransactionResponse with rendered messages; format=compact: codes and numbers only
+ResponseFormat = Literal["text", "compact"]
+FORMAT_DESCRIPTION = "compact: omit reason text and return flags as [code, *numeric params]"
+
+# Scoring routes return pre-serialized bodies: FastAPI then skips
+# re-validating and re-encoding results against response_model, which still
+# documents the schema. Results are built by the services without validation
+# (TrustedModel.trusted) and dumped by pydantic's compiled serializers.
+TRANSACTION_LIST = TypeAdapter(list[TransactionResponse])
+
+
+def json_response(body: Union[bytes, str], headers: Optional[dict] = None) -> Response:
+    return Response(body, media_type="application/json", headers=headers)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body is produced while the request body is
+    still being read. Starlette's StreamingResponse listens for a client
+    disconnect by calling receive(), which would consume request body
+    messages; here a disconnect surfaces through request.stream() instead.
+    """
+    
+    media_type = "application/x-ndjson"
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
 
 
 @router.post(
     "/evaluate-transaction",
     response_model=TransactionResponse,
+    response_model_exclude_none=True,
     status_code=status.HTTP_200_OK,
     summary="Evaluate transaction for fraud risk",
     description="Analyzes a transaction and returns a risk assessment with decision (approve/warn/block)"
 )
-async def evaluate_transaction(transaction: TransactionRequest) -> TransactionResponse:
+@server_timed
+async def evaluate_transaction(
+    transaction: TransactionRequest,
+    fast: Optional[bool] = Query(None, description="Fast-decision mode: stop scoring once the decision is settled"),
+    response_format: ResponseFormat = Query("text", alias="format", description=FORMAT_DESCRIPTION),
+    fraud_detector: FraudDetector = Depends(get_fraud_detector),
+    scoring_pool: Optional[ScoringPool] = Depends(get_scoring_pool)
+) -> TransactionResponse:
     """
     Evaluate a transaction for fraud risk.
     
@@ -33,21 +88,45 @@ async def evaluate_transaction(transaction: TransactionRequest) -> TransactionRe
     - Behavioral pattern detection
     
     Returns a decision (approve/warn/block) with detailed risk analysis.
+    With fast=true the decision is identical, but risk_score and flags cover
+    only the factors evaluated before it was settled (see skipped_factors).
+    With format=compact the reason text is omitted and flags are returned as
+    codes with their numbers, e.g. ["VELOCITY_HIGH", 3].
+    
+    Send `Server-Timing-Request: 1` (or ?timing=true) for a Server-Timing
+    response header breaking the request down by phase and factor.
     """
     try:
         logger.info(f"Evaluating transaction: {transaction.sender_id} -> {transaction.receiver_id}, ${transaction.amount}")
         
-        # Perform fraud evaluation
-        result = fraud_detector.evaluate_transaction(
-            amount=transaction.amount,
-            sender_id=transaction.sender_id,
-            receiver_id=transaction.receiver_id,
-            timestamp=transaction.timestamp
-        )
+        # Perform fraud evaluation (in the sender's worker process when there is a pool,
+        # otherwise in the threadpool)
+        with timed_phase("scoring"):
+            if scoring_pool is not None:
+                result = await scoring_pool.evaluate_transaction_async(
+                    amount=transaction.amount,
+                    sender_id=transaction.sender_id,
+                    receiver_id=transaction.receiver_id,
+                    timestamp=transaction.timestamp,
+                    fast=fast
+                )
+            else:
+                # Off the event loop: a shared state store can wait on its lock
+                result = await run_in_threadpool(
+                    fraud_detector.evaluate_transaction,
+                    amount=transaction.amount,
+                    sender_id=transaction.sender_id,
+                    receiver_id=transaction.receiver_id,
+                    timestamp=transaction.timestamp,
+                    fast=fast
+                )
         
         logger.info(f"Decision: {result.decision}, Risk Score: {result.risk_score}")
         
-        return result
+        with timed_phase("serialization"):
+            if response_format == "compact":
+                return json_response(to_json(result.to_compact()))
+            return json_response(result.model_dump_json(exclude_none=True))
         
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
@@ -64,23 +143,203 @@ async def evaluate_transaction(transaction: TransactionRequest) -> TransactionRe
         )
 
 
+@router.post(
+    "/evaluate-transactions",
+    response_model=list[TransactionResponse],
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    summary="Evaluate a batch of transactions for fraud risk",
+    description="Scores a list of transactions in one call. Results match calling /evaluate-transaction for each item in order."
+)
+async def evaluate_transactions(
+    transactions: list[TransactionRequest],
+    fast: Optional[bool] = Query(None, description="Fast-decision mode: stop scoring once each decision is settled"),
+    response_format: ResponseFormat = Query("text", alias="format", description=FORMAT_DESCRIPTION),
+    fraud_detector: FraudDetector = Depends(get_fraud_detector),
+    scoring_pool: Optional[ScoringPool] = Depends(get_scoring_pool)
+) -> list[TransactionResponse]:
+    """
+    Evaluate a batch of transactions for fraud risk.
+    
+    Intended for reconciling large upstream batches without per-item HTTP overhead.
+    Transactions are applied in list order, so velocity and history signals for
+    repeated senders are identical to sequential single-item calls.
+    
+    Returns one risk assessment per transaction, in request order. With a
+    scoring pool the batch is split by sender partition and scored in parallel.
+    """
+    if len(transactions) > settings.batch_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds maximum size of {settings.batch_max_size} transactions"
+        )
+    
+    try:
+        logger.info(f"Evaluating batch of {len(transactions)} transactions")
+        
+        if scoring_pool is not None:
+            results = await scoring_pool.evaluate_batch_async(transactions, fast=fast)
+        else:
+            # Up to batch_max_size transactions: off the event loop
+            results = await run_in_threadpool(fraud_detector.evaluate_batch, transactions, fast=fast)
+        
+        logger.info(f"Batch complete: {sum(1 for r in results if r.decision == 'block')} blocked")
+        
+        if response_format == "compact":
+            return json_response(to_json([result.to_compact() for result in results]))
+        return json_response(TRANSACTION_LIST.dump_json(results, exclude_none=True))
+        
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid transaction data: {str(e)}"
+        )
+    
+    except Exception as e:
+        logger.error(f"Unexpected error during batch fraud evaluation: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred during fraud evaluation. Please try again."
+        )
+
+
+@router.post(
+    "/evaluate-stream",
+    response_class=NDJSONStreamingResponse,
+    summary="Score a stream of transactions (NDJSON)",
+    description="Reads newline-delimited JSON transactions and streams one NDJSON risk assessment back per line, in order, as each is scored. Intended for backfills and replays.",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}}
+        }
+    }
+)
+async def evaluate_stream(
+    request: Request,
+    fast: Optional[bool] = Query(None, description="Fast-decision mode: stop scoring once each decision is settled"),
+    report: bool = Query(False, description="Append a final {\"summary\": ...} line with throughput counters"),
+    response_format: ResponseFormat = Query("text", alias="format", description=FORMAT_DESCRIPTION),
+    fraud_detector: FraudDetector = Depends(get_fraud_detector),
+    scoring_pool: Optional[ScoringPool] = Depends(get_scoring_pool)
+) -> NDJSONStreamingResponse:
+    """
+    Score an unbounded NDJSON stream of transactions.
+    
+    Each input line is a TransactionRequest; each output line is the
+    TransactionResponse for it, or {"line": n, "error": "..."} for a line
+    that could not be parsed. Lines are scored in chunks of
+    STREAM_CHUNK_SIZE through the batch path, so results match
+    /evaluate-transaction called once per line in order.
+    
+    The pipeline is pull-based: the request body is read only as fast as
+    the client consumes responses, so memory stays constant for any input
+    size and a slow reader slows the upload (backpressure).
+    """
+    compact = response_format == "compact"
+    scorer = scoring_pool if scoring_pool is not None else fraud_detector
+    
+    async def score() -> AsyncIterator[bytes]:
+        throughput = ThroughputReport()
+        splitter = LineSplitter()
+        try:
+            async for block in request.stream():
+                for chunk in chunked(splitter.feed(block), settings.stream_chunk_size):
+                    yield await run_in_threadpool(score_chunk, scorer, chunk, throughput, fast, compact)
+            for chunk in chunked(splitter.close(), settings.stream_chunk_size):
+                yield await run_in_threadpool(score_chunk, scorer, chunk, throughput, fast, compact)
+        except ClientDisconnect:
+            logger.warning(f"Stream client disconnected: {throughput.as_dict()}")
+            return
+        
+        summary = throughput.as_dict()
+        logger.info(f"Stream complete: {summary}")
+        if report:
+            yield json.dumps({"summary": summary}).encode() + b"\n"
+    
+    return NDJSONStreamingResponse(score())
+
+
+@router.websocket("/ws/evaluate")
+async def evaluate_websocket(
+    websocket: WebSocket,
+    fast: Optional[bool] = Query(None, description="Fast-decision mode: stop scoring once each decision is settled"),
+    response_format: ResponseFormat = Query("text", alias="format", description=FORMAT_DESCRIPTION),
+    fraud_detector: FraudDetector = Depends(get_fraud_detector),
+    scoring_pool: Optional[ScoringPool] = Depends(get_scoring_pool)
+):
+    """
+    Score a continuous stream of transactions over one WebSocket connection.
+    
+    Each message is a TransactionRequest with a correlation `id`, e.g.
+    {"id": 17, "amount": 250.0, "sender_id": "user123", ...}; each reply is
+    the TransactionResponse for it with the same `id`, or
+    {"id": 17, "error": "..."} for an invalid message. Clients may send
+    without waiting for replies (pipelining): transactions are scored in the
+    order they arrive, with the same results as /evaluate-transaction called
+    once per message, and up to WS_MAX_IN_FLIGHT unanswered transactions per
+    connection. Past that, the server stops reading until replies have been
+    sent (flow control). Replies can arrive out of order with a scoring pool.
+    """
+    await websocket.accept()
+    token = current_route.set("/api/ws/evaluate")
+    channel = ScoringChannel(
+        websocket,
+        fraud_detector,
+        scoring_pool,
+        max_in_flight=settings.ws_max_in_flight,
+        fast=fast,
+        compact=response_format == "compact"
+    )
+    logger.info(f"WebSocket scoring channel opened: {websocket.client}")
+    try:
+        await channel.run()
+    finally:
+        current_route.reset(token)
+        logger.info(f"WebSocket scoring channel closed: {channel.report.as_dict()}")
+
+
 @router.post(
     "/process-payment",
     response_model=PaymentResult,
     status_code=status.HTTP_200_OK,
     summary="Process payment with fraud detection",
-    description="Processes a payment transaction with integrated fraud detection. Approves low/medium risk, blocks high risk."
+    description="Processes a payment transaction with integrated fraud detection. Blocks high risk; low/medium risk payments are queued for settlement and returned as pending unless wait_ms is given."
 )
-async def process_payment(transaction: TransactionRequest) -> PaymentResult:
+@server_timed
+async def process_payment(
+    transaction: TransactionRequest,
+    wait_ms: int = Query(0, ge=0, le=30000, description="Wait up to this many milliseconds for settlement to complete"),
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        min_length=1,
+        max_length=255,
+        description="Retries with the same key return the original payment instead of paying again"
+    ),
+    payment_service: PaymentService = Depends(get_payment_service)
+) -> PaymentResult:
     """
     Process a payment transaction with fraud detection.
     
     This endpoint performs the complete payment flow:
     1. Runs fraud detection on the transaction
     2. If high risk (block) -> Rejects payment immediately
-    3. If low/medium risk (approve/warn) -> Processes payment
+    3. If low/medium risk (approve/warn) -> Queues payment for settlement
     4. Returns payment result with unique payment ID
     
+    Settlement runs in the background, so approved payments are returned with
+    status "pending". Poll GET /payments/{payment_id} for the final status, or
+    pass wait_ms to wait for settlement (synchronous semantics) up to that limit.
+    Send `Server-Timing-Request: 1` (or ?timing=true) for a Server-Timing
+    breakdown of the request.
+    
+    Clients that retry (e.g. after a timeout) should send an Idempotency-Key:
+    a repeated key returns the original payment, current status included,
+    with an `Idempotent-Replayed: true` header, and is never scored or paid
+    twice. Reusing a key for a different transaction is rejected with 422.
+    
     The payment process includes:
     - Real-time fraud risk assessment
     - Automatic blocking of high-risk transactions
@@ -91,13 +350,34 @@ async def process_payment(transaction: TransactionRequest) -> PaymentResult:
     try:
         logger.info(f"Processing payment: {transaction.sender_id} -> {transaction.receiver_id}, ${transaction.amount}")
         
-        # Process payment (includes fraud detection)
-        result = payment_service.process_payment(transaction)
+        # Process payment (includes fraud detection), once per idempotency key
+        headers = None
+        if idempotency_key is None:
+            result = await payment_service.process_payment_async(transaction)
+        else:
+            result, replayed = await payment_service.process_payment_once(transaction, idempotency_key)
+            if replayed:
+                headers = {"Idempotent-Replayed": "true"}
+                logger.info(f"Idempotency key replayed: payment {result.payment_id}")
+        
+        if wait_ms and result.status == "pending":
+            with timed_phase("settlement-wait"):
+                settled = await payment_service.wait_for_settlement(result.payment_id, wait_ms / 1000)
+            # None once the payment has left payment history: report it as accepted
+            if settled is not None:
+                result = settled
         
         logger.info(f"Payment {result.payment_id}: {result.status}, Risk Score: {result.risk_score}")
         
-        return result
+        with timed_phase("serialization"):
+            return json_response(result.model_dump_json(), headers)
         
+    except IdempotencyKeyReused as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(
@@ -113,14 +393,111 @@ async def process_payment(transaction: TransactionRequest) -> PaymentResult:
         )
 
 
+@router.get(
+    "/payments",
+    summary="List payments",
+    description="Returns one page of stored payments, newest first, optionally filtered by sender, status and processed time"
+)
+async def list_payments(
+    sender_id: Optional[str] = Query(None, description="Only this sender's payments"),
+    payment_status: Optional[Literal["pending", "success", "failed", "blocked"]] = Query(
+        None, alias="status", description="Only payments currently in this status"
+    ),
+    since: Optional[str] = Query(None, description="Only payments processed at or after this ISO timestamp"),
+    until: Optional[str] = Query(None, description="Only payments processed before this ISO timestamp"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum payments per page"),
+    payment_service: PaymentService = Depends(get_payment_service)
+):
+    """Return a page of payments; follow next_cursor until it is null"""
+    try:
+        # Off the event loop: a SQLite store can wait on its lock
+        payments, next_cursor = await run_in_threadpool(
+            payment_service.list_payments,
+            sender_id=sender_id,
+            status=payment_status,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "payments": payments,
+        "next_cursor": next_cursor
+    }
+
+
+@router.get(
+    "/payments/{payment_id}",
+    response_model=PaymentResult,
+    summary="Get payment status",
+    description="Returns the current state of a processed payment, including its final settlement status"
+)
+async def get_payment(
+    payment_id: str,
+    payment_service: PaymentService = Depends(get_payment_service)
+) -> PaymentResult:
+    """Return a payment by ID (status moves from pending to success/failed once settled)"""
+    result = await run_in_threadpool(payment_service.get_payment, payment_id)
+    
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Payment '{payment_id}' not found"
+        )
+    
+    return result
+
+
 @router.get(
     "/flagged-accounts",
     summary="Get list of flagged accounts",
-    description="Returns the list of receiver accounts currently flagged as high-risk"
+    description="Returns one page of receiver accounts currently flagged as high-risk, in sorted order"
 )
-async def get_flagged_accounts():
-    """Return list of flagged accounts (for testing/demo purposes)"""
+async def get_flagged_accounts(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum accounts per page"),
+    fraud_detector: FraudDetector = Depends(get_fraud_detector)
+):
+    """Return a page of flagged accounts (for testing/demo purposes)"""
+    accounts, next_cursor, count = fraud_detector.get_flagged_accounts(cursor, limit)
+    return {
+        "flagged_accounts": accounts,
+        "count": count,
+        "next_cursor": next_cursor
+    }
+
+
+@router.post(
+    "/flagged-accounts/reload",
+    summary="Reload the flagged account list",
+    description="Loads FLAGGED_ACCOUNTS_PATH now instead of waiting for the next poll, and swaps it in atomically"
+)
+async def reload_flagged_accounts(flagged: FlaggedAccountStore = Depends(get_flagged_account_store)):
+    """Reload the flagged list file if it changed"""
+    if not flagged.path:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No flagged account file configured (FLAGGED_ACCOUNTS_PATH)"
+        )
+    
+    try:
+        reloaded = await run_in_threadpool(flagged.reload)
+    except (OSError, ValueError) as e:
+        logger.error(f"Flagged account reload failed: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not load the flagged account file; the previous list is still active."
+        )
+    
     return {
-        "flagged_accounts": list(fraud_detector.get_flagged_accounts()),
-        "count": len(fraud_detector.get_flagged_accounts())
+        "reloaded": reloaded,
+        "count": len(flagged),
+        "loaded_at": flagged.loaded_at
     }
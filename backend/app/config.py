@@ -7,6 +7,77 @@ class Settings(BaseSettings):
     cors_origins: str = "http://localhost:3000"
     environment: str = "development"
     
+    # Maximum number of transactions accepted by /api/evaluate-transactions
+    batch_max_size: int = 10000
+    
+    # Transactions scored per batch by /api/evaluate-stream and the replay CLI
+    stream_chunk_size: int = 500
+    
+    # WebSocket scoring channel: transactions in flight per connection before reading pauses
+    ws_max_in_flight: int = 256
+    
+    # Asynchronous payment settlement
+    settlement_workers: int = 32
+    settlement_delay_ms: int = 500
+    
+    # Payment history bounds (0 disables either): oldest payments are evicted first
+    payment_max_entries: int = 100000
+    payment_ttl_s: int = 86400
+    
+    # Idempotency-Key cache for /api/process-payment (least recently used keys dropped first)
+    idempotency_max_entries: int = 100000
+    idempotency_ttl_s: int = 86400
+    
+    # State backend: "memory" (per process) or "sqlite" (shared by all workers on a host)
+    state_backend: str = "memory"
+    state_path: str = "fraud_state.db"
+    
+    # Memory backend sender budget (0 disables each): least recently active senders are evicted
+    # past the count or estimated size, and senders idle for the TTL expire
+    sender_max_count: int = 0
+    sender_memory_budget_mb: int = 0
+    sender_idle_ttl_s: int = 0
+    # Spill evicted senders to this SQLite file and reload them on their next transaction (dropped when empty)
+    sender_spill_path: str = ""
+    
+    # Snapshot + transaction log for the memory backend (disabled when empty)
+    persistence_dir: str = ""
+    snapshot_interval_s: int = 300
+    log_fsync_interval_ms: int = 50
+    
+    # Factor pipeline: comma-separated stage names, in evaluation order (omit a stage to disable it)
+    scoring_stages: str = "amount,recipient,context,behavior,history,self_transfer,round_amount"
+    
+    # Scoring worker processes, each owning a hash partition of senders (0 scores in the API process)
+    scoring_workers: int = 0
+    
+    # Fast-decision mode by default (stop scoring once the decision is settled); per request via ?fast=
+    fast_decisions: bool = False
+    
+    # Receiver fan-in: distinct senders paying one receiver within the window (opt-in: 0 disables);
+    # scored for new recipients at the threshold (and twice it), except receivers paid continuously
+    # for fan_in_established_s. Per process: each scoring worker or API process counts its own share
+    fan_in_window_s: int = 0
+    fan_in_threshold: int = 10
+    fan_in_max_receivers: int = 100000
+    fan_in_established_s: int = 3600
+    
+    # Flagged receiver list: one ID per line, polled for changes (built-in demo list when empty)
+    flagged_accounts_path: str = ""
+    flagged_reload_interval_s: int = 30
+    
+    # Prometheus metrics at /metrics; factor latency is timed on 1 in N evaluations
+    metrics_enabled: bool = True
+    metrics_factor_sample_every: int = 16
+    
+    # Server-Timing breakdowns for requests that ask for one (header or ?timing=true)
+    server_timing_enabled: bool = True
+    
+    # Sampling profiler writing folded stacks to this file (disabled when empty)
+    profile_path: str = ""
+    profile_interval_ms: int = 10
+    profile_flush_s: int = 60
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
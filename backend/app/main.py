@@ -1,15 +1,58 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.api.dependencies import (
+    get_flagged_account_store,
+    get_metrics,
+    get_payment_service,
+    get_profiler,
+    get_scoring_pool,
+    get_state_store,
+    get_transaction_journal
+)
+from app.api.middleware import MetricsMiddleware, ServerTimingMiddleware
 from app.api.routes import router
 from app.config import settings
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Restore sender state and start background settlers (and the scoring
+    workers and sampling profiler, when configured) on startup; on shutdown
+    stop them, the flagged-list watcher, flush the journal and close the
+    state store
+    """
+    scoring_pool = get_scoring_pool()
+    if scoring_pool is not None:
+        scoring_pool.start()
+    payment_service = get_payment_service()
+    payment_service.settlement.start()
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.start()
+    yield
+    await payment_service.settlement.stop()
+    if scoring_pool is not None:
+        scoring_pool.close()
+    if profiler is not None:
+        profiler.close()
+    get_flagged_account_store().close()
+    journal = get_transaction_journal()
+    if journal is not None:
+        journal.close()
+    get_state_store().close()
+
+
 # Initialize FastAPI application
 app = FastAPI(
     title="Fraud Detection API",
     description="Real-time transaction fraud detection system for VexStorm'26 Capital-Core track",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS for cross-origin requests
@@ -24,6 +67,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request Server-Timing breakdown, on request
+if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware, paths=["/api/evaluate-transaction", "/api/process-payment"])
+
+# Request counters and latency by route (outermost, so CORS preflights are counted too)
+metrics = get_metrics()
+if metrics is not None:
+    app.add_middleware(MetricsMiddleware, metrics=metrics, routes=app.router.routes)
+
 # Include API routes
 app.include_router(router, prefix="/api", tags=["fraud-detection"])
 
@@ -42,7 +94,27 @@ async def root():
 @app.get("/health", tags=["health"])
 async def health_check():
     """Health check endpoint for monitoring and deployment verification"""
-    return {
+    health = {
         "status": "healthy",
         "environment": settings.environment
     }
+    journal = get_transaction_journal()
+    if journal is not None:
+        health["persistence"] = {
+            "last_restore": journal.last_restore,
+            "last_snapshot": journal.last_snapshot
+        }
+    return health
+
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Prometheus metrics: request/decision counters, factor and settlement
+    latency histograms, state-size gauges. A plain def, so the state scan
+    for the gauges runs in the threadpool rather than on the event loop.
+    """
+    metrics = get_metrics()
+    if metrics is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,82 @@
+"""
+Risk Flags
+
+Factors report risk indicators as compact Flag values: a stable code plus
+the numbers behind it. The human-readable sentence is rendered from
+FLAG_TEXT only when a response is serialized as text, so scoring never
+formats strings and machine clients (format=compact) never receive them.
+"""
+
+from typing import Any, List, NamedTuple, Union
+
+# Message template per flag code, formatted with the flag's params
+FLAG_TEXT = {
+    "AMOUNT_5X_AVERAGE": "Amount ${0:,.2f} is 5x higher than user's average ${1:,.2f}",
+    "AMOUNT_3X_AVERAGE": "Amount ${0:,.2f} is 3x higher than user's average ${1:,.2f}",
+    "AMOUNT_OUTLIER": "Amount is statistical outlier (3+ standard deviations)",
+    "HIGH_VALUE_LIMITED_HISTORY": "High-value transaction (${0:,.2f}) with limited user history",
+    "MODERATE_VALUE_LIMITED_HISTORY": "Moderate-value transaction (${0:,.2f}) with limited user history",
+    "FLAGGED_RECEIVER": "Receiver '{0}' is flagged as high-risk in system database",
+    "NEW_RECIPIENT_ESTABLISHED": "Payment to new recipient (user typically sends to {0} known recipients)",
+    "NEW_RECIPIENT": "Payment to new recipient",
+    "FAN_IN_EXTREME": "Receiver paid by {0} distinct senders in the past {1} minutes (possible mule account)",
+    "FAN_IN_HIGH": "Receiver paid by {0} distinct senders in the past {1} minutes",
+    "INVALID_TIMESTAMP": "Invalid or malformed timestamp",
+    "EARLY_MORNING": "Transaction initiated at unusual time ({0:02d}:00 - early morning)",
+    "LATE_HOURS": "Transaction initiated at late/early hours ({0:02d}:00)",
+    "UNUSUAL_HOUR": "Transaction initiated at an unusual hour for this user ({0:02d}:00, {1}% of past activity)",
+    "VELOCITY_EXTREME": "Extremely high velocity: {0} transactions in past hour",
+    "VELOCITY_HIGH": "High transaction velocity: {0} transactions in past hour",
+    "VELOCITY_ELEVATED": "Elevated transaction frequency: {0} transactions in past hour",
+    "TRANSACTION_BURST": "Unusual transaction burst: {0} transactions today",
+    "AMOUNT_2X_MAXIMUM": "Amount ${0:,.2f} is 2x higher than user's previous maximum ${1:,.2f}",
+    "SMALL_TO_LARGE_SHIFT": "Sudden shift from small to large transactions (behavior change)",
+    "SELF_TRANSFER": "Self-transfer detected (unusual pattern)",
+    "ROUND_AMOUNT": "Round number amount (minor indicator)",
+    "NO_RISK_INDICATORS": "No risk indicators detected - transaction appears normal",
+}
+
+# Codes whose params are request fields rather than numbers
+_TEXT_PARAM_CODES = frozenset({"FLAGGED_RECEIVER"})
+
+
+class Flag(NamedTuple):
+    """One risk indicator: code (a key of FLAG_TEXT) and its message parameters"""
+
+    code: str
+    params: tuple = ()
+
+    def __str__(self) -> str:
+        return FLAG_TEXT[self.code].format(*self.params)
+
+    def compact(self) -> List[Union[str, float]]:
+        """[code, *numeric params]; string params (receiver IDs) echo the request and are left out"""
+        if self.code in _TEXT_PARAM_CODES:
+            return [self.code]
+        return [self.code, *self.params]
+
+
+# Parameterless flags, shared instead of allocated per transaction
+AMOUNT_OUTLIER = Flag("AMOUNT_OUTLIER")
+NEW_RECIPIENT = Flag("NEW_RECIPIENT")
+INVALID_TIMESTAMP = Flag("INVALID_TIMESTAMP")
+SMALL_TO_LARGE_SHIFT = Flag("SMALL_TO_LARGE_SHIFT")
+SELF_TRANSFER = Flag("SELF_TRANSFER")
+ROUND_AMOUNT = Flag("ROUND_AMOUNT")
+NO_RISK_INDICATORS = Flag("NO_RISK_INDICATORS")
+
+
+def validate_flag(value: Any) -> Union[Flag, str]:
+    """Accept Flag values from the detector and rendered text (e.g. payments read back from storage)"""
+    if isinstance(value, (Flag, str)):
+        return value
+    raise ValueError("flag must be a string")
+
+
+def render_flag(value: Union[Flag, str]) -> str:
+    return str(value)
+
+
+def money(value: float) -> float:
+    """Round an amount parameter to cents, as it is displayed"""
+    return round(value, 2)
@@ -1,6 +1,69 @@
-from pydantic import BaseModel, Field, validator
-from typing import Literal, Optional
+from pydantic import BaseModel, Field, PlainSerializer, PlainValidator, WithJsonSchema, validator
+from typing import Annotated, Any, Dict, Literal, Optional, Union
 from datetime import datetime
+from app.models.flags import NO_RISK_INDICATORS, Flag, render_flag, validate_flag
+
+# Longest account ID in UTF-8 bytes: the transaction journal stores ID
+# lengths as uint16 (not part of the schema: it only guards persistence)
+MAX_ID_BYTES = 0xFFFF
+
+# Risk flag: a Flag from the detector (rendered to its message when
+# serialized) or already-rendered text; always a string on the wire
+FlagText = Annotated[
+    Union[Flag, str],
+    PlainValidator(validate_flag),
+    PlainSerializer(render_flag, return_type=str),
+    WithJsonSchema({"type": "string"})
+]
+
+
+class TrustedModel(BaseModel):
+    """
+    Response model that services can build without validation.
+    
+    Results assembled by the detector and payment service from values they
+    already guarantee (fixed decision strings, capped integer scores, Flag
+    lists) skip pydantic's validators via trusted(); request input is always
+    validated as usual.
+    """
+    
+    @classmethod
+    def trusted(cls, **values: Any):
+        """
+        Instance from already-valid field values, skipping validation.
+        Omitted fields take their defaults; passing every field in declaration
+        order is the fastest path.
+        """
+        fields_set = set(values)
+        if tuple(values) != (_FIELD_ORDER.get(cls) or _field_order(cls)):
+            values = {
+                name: values[name] if name in values else field.get_default(call_default_factory=True)
+                for name, field in cls.model_fields.items()
+            }
+        instance = _new_object(cls)
+        # BaseModel's slots, set as model_construct() does
+        _set_dict(instance, values)
+        _set_fields_set(instance, fields_set)
+        _set_extra(instance, None)
+        _set_private(instance, None)
+        return instance
+
+
+_new_object = object.__new__
+_set_dict = BaseModel.__dict__["__dict__"].__set__
+_set_fields_set = BaseModel.__dict__["__pydantic_fields_set__"].__set__
+_set_extra = BaseModel.__dict__["__pydantic_extra__"].__set__
+_set_private = BaseModel.__dict__["__pydantic_private__"].__set__
+
+# Field names per TrustedModel subclass, in declaration order
+_FIELD_ORDER: Dict[type, tuple] = {}
+
+
+def _field_order(cls: type) -> tuple:
+    order = _FIELD_ORDER.get(cls)
+    if order is None:
+        order = _FIELD_ORDER[cls] = tuple(cls.model_fields)
+    return order
 
 
 class TransactionRequest(BaseModel):
@@ -17,6 +80,13 @@ class TransactionRequest(BaseModel):
             raise ValueError('Amount exceeds maximum limit of $1,000,000')
         return v
     
+    @validator('sender_id', 'receiver_id')
+    def id_must_fit_the_journal(cls, v):
+        # A character is at most 4 UTF-8 bytes: only long IDs need encoding
+        if len(v) > MAX_ID_BYTES // 4 and len(v.encode('utf-8')) > MAX_ID_BYTES:
+            raise ValueError(f'Account IDs are limited to {MAX_ID_BYTES} bytes (UTF-8)')
+        return v
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -28,7 +98,13 @@ class TransactionRequest(BaseModel):
         }
 
 
-class TransactionResponse(BaseModel):
+class ScoringMessage(TransactionRequest):
+    """Transaction sent over the WebSocket scoring channel, with its correlation ID"""
+    
+    id: Union[str, int] = Field(..., description="Correlation ID, echoed on the response to this transaction")
+
+
+class TransactionResponse(TrustedModel):
     """Response model for transaction evaluation"""
     
     decision: Literal["approve", "warn", "block"] = Field(
@@ -39,7 +115,30 @@ class TransactionResponse(BaseModel):
     risk_level: Literal["low", "medium", "high"] = Field(
         ..., description="Risk level classification"
     )
-    flags: list[str] = Field(default_factory=list, description="List of risk indicators")
+    flags: list[FlagText] = Field(default_factory=list, description="List of risk indicators")
+    skipped_factors: Optional[list[str]] = Field(
+        default=None,
+        description="Fast-decision mode only: factor stages skipped once the decision was settled"
+    )
+    
+    def to_compact(self) -> dict:
+        """
+        Codes-and-numbers form for machine clients (format=compact): no
+        reason text, and flags as [code, *numeric params], e.g.
+        ["VELOCITY_HIGH", 3] (empty when there are no risk indicators)
+        """
+        compact = {
+            "decision": self.decision,
+            "risk_score": self.risk_score,
+            "risk_level": self.risk_level,
+            "flags": [
+                flag.compact() if isinstance(flag, Flag) else [flag]
+                for flag in self.flags if flag is not NO_RISK_INDICATORS
+            ]
+        }
+        if self.skipped_factors is not None:
+            compact["skipped_factors"] = self.skipped_factors
+        return compact
     
     class Config:
         json_schema_extra = {
@@ -56,11 +155,13 @@ class TransactionResponse(BaseModel):
         }
 
 
-class PaymentResult(BaseModel):
+class PaymentResult(TrustedModel):
     """Response model for payment processing"""
     
     payment_id: str = Field(..., description="Unique payment identifier (UUID)")
-    status: Literal["success", "blocked"] = Field(..., description="Payment processing status")
+    status: Literal["pending", "success", "failed", "blocked"] = Field(
+        ..., description="Payment processing status (pending until settlement completes)"
+    )
     transaction_id: str = Field(..., description="Transaction identifier")
     sender_id: str = Field(..., description="Sender account identifier")
     receiver_id: str = Field(..., description="Receiver account identifier")
@@ -69,7 +170,7 @@ class PaymentResult(BaseModel):
     decision: Literal["approve", "warn", "block"] = Field(..., description="Fraud detection decision")
     processed_at: str = Field(..., description="Payment processing timestamp (ISO format)")
     message: str = Field(..., description="Human-readable status message")
-    flags: Optional[list[str]] = Field(default=None, description="Risk flags (if any)")
+    flags: Optional[list[FlagText]] = Field(default=None, description="Risk flags (if any)")
     
     class Config:
         json_schema_extra = {
@@ -0,0 +1,150 @@
+"""
+Transaction Replay CLI
+
+Scores a newline-delimited JSON file of transactions, e.g. to warm up
+detector state for a newly onboarded merchant from months of history.
+Output is one NDJSON risk assessment per input line, in order; a
+throughput report goes to stderr.
+
+Local mode scores in-process against the configured state (STATE_BACKEND,
+STATE_PATH, PERSISTENCE_DIR), so a shared SQLite store or a persistence
+directory is warm when the API next starts. With --url the file is streamed
+to a running API's /api/evaluate-stream instead.
+
+Usage:
+    python -m app.replay transactions.ndjson [-o results.ndjson] [--fast]
+    python -m app.replay - --url http://localhost:8000 < transactions.ndjson
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import urlencode, urlsplit
+
+from app.config import settings
+from app.services.stream_scoring import ThroughputReport, score_stream
+
+# Input is read (and, with --url, uploaded) in blocks of this size
+READ_BYTES = 64 * 1024
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL_S = 5.0
+
+
+def read_blocks(source: BinaryIO) -> Iterator[bytes]:
+    return iter(lambda: source.read(READ_BYTES), b"")
+
+
+def replay_local(source: BinaryIO, sink: BinaryIO, fast: Optional[bool], chunk_size: int) -> dict:
+    """Score in-process with the configured detector; returns the throughput report"""
+    # Imported here so --url mode never opens the local state store
+    from app.api.dependencies import get_state_store, get_transaction_journal, get_fraud_detector
+
+    detector = get_fraud_detector()
+    report = ThroughputReport()
+    next_progress = time.monotonic() + PROGRESS_INTERVAL_S
+    try:
+        for output in score_stream(detector, read_blocks(source), report, chunk_size, fast):
+            sink.write(output)
+            if time.monotonic() >= next_progress:
+                print(f"progress: {report.as_dict()}", file=sys.stderr)
+                next_progress = time.monotonic() + PROGRESS_INTERVAL_S
+    finally:
+        # Same shutdown as the API: final snapshot, then release the store
+        journal = get_transaction_journal()
+        if journal is not None:
+            journal.close()
+        get_state_store().close()
+    return report.as_dict()
+
+
+def replay_remote(url: str, source: BinaryIO, sink: BinaryIO, fast: Optional[bool]) -> dict:
+    """
+    Stream the input to a running API and copy its responses to sink.
+
+    The upload runs on its own thread while responses are read here: the
+    server answers while the request is still arriving, and only reads more
+    input as responses are consumed.
+    """
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = connection_class(parts.hostname, parts.port)
+    query = {"report": "true"}
+    if fast is not None:
+        query["fast"] = "true" if fast else "false"
+    conn.putrequest("POST", f"{parts.path.rstrip('/')}/api/evaluate-stream?{urlencode(query)}")
+    conn.putheader("Content-Type", "application/x-ndjson")
+    conn.putheader("Transfer-Encoding", "chunked")
+    conn.endheaders()
+
+    upload_error = []
+
+    def upload():
+        try:
+            for block in read_blocks(source):
+                conn.send(b"%X\r\n%s\r\n" % (len(block), block))
+            conn.send(b"0\r\n\r\n")
+        except OSError as e:
+            upload_error.append(e)
+
+    uploader = threading.Thread(target=upload, name="replay-upload", daemon=True)
+    uploader.start()
+
+    response = conn.getresponse()
+    if response.status != 200:
+        raise SystemExit(f"{url} answered {response.status}: {response.read().decode(errors='replace')}")
+
+    summary = {}
+    lines = 0
+    next_progress = time.monotonic() + PROGRESS_INTERVAL_S
+    for line in response:
+        if line.startswith(b'{"summary"'):
+            summary = json.loads(line)["summary"]
+            continue
+        sink.write(line)
+        lines += 1
+        if time.monotonic() >= next_progress:
+            print(f"progress: {lines} results received", file=sys.stderr)
+            next_progress = time.monotonic() + PROGRESS_INTERVAL_S
+
+    uploader.join()
+    conn.close()
+    if upload_error:
+        raise SystemExit(f"Upload to {url} failed: {upload_error[0]}")
+    return summary
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Score an NDJSON file of transactions")
+    parser.add_argument("input", help="NDJSON transactions file, or - for stdin")
+    parser.add_argument("-o", "--output", help="Write results here instead of stdout")
+    parser.add_argument("--url", help="Stream to a running API (e.g. http://localhost:8000) instead of scoring locally")
+    parser.add_argument("--fast", action=argparse.BooleanOptionalAction, default=None,
+                        help="Fast-decision mode (default: FAST_DECISIONS)")
+    parser.add_argument("--chunk-size", type=int, default=settings.stream_chunk_size,
+                        help="Transactions scored per batch in local mode")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    sink = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        if args.url:
+            summary = replay_remote(args.url, source, sink, args.fast)
+        else:
+            summary = replay_local(source, sink, args.fast, args.chunk_size)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if sink is not sys.stdout.buffer:
+            sink.close()
+        else:
+            sink.flush()
+
+    print(f"done: {summary}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
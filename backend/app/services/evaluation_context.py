@@ -0,0 +1,58 @@
+"""
+Evaluation Context
+
+A transaction normalised once for all risk factor stages: the ISO timestamp
+is parsed a single time into epoch microseconds, UTC offset and hour of day, and the
+sender's state is bound once, so stages read plain attributes instead of
+re-parsing the timestamp or re-fetching history.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.services.sender_history import SenderHistory
+from app.services.state_store import SenderState
+from app.services.velocity_window import to_epoch_us
+
+
+def parse_timestamp(timestamp_str: str) -> Optional[datetime]:
+    """Parse an ISO timestamp ("Z" accepted), or None if malformed"""
+    try:
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class EvaluationContext:
+    """Everything the factor stages read for one transaction"""
+
+    __slots__ = ("amount", "sender_id", "receiver_id", "timestamp", "time_us", "utc_offset", "hour", "state",
+                 "history")
+
+    def __init__(self, amount: float, sender_id: str, receiver_id: str, timestamp: str):
+        self.amount = amount
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.timestamp = timestamp
+
+        parsed = parse_timestamp(timestamp)
+        # Epoch microseconds (UTC), the timestamp's UTC offset in minutes (0 when
+        # it has none) and hour of day in that offset; all None for a malformed timestamp
+        self.time_us: Optional[int] = None
+        self.utc_offset: Optional[int] = None
+        self.hour: Optional[int] = None
+        if parsed is not None:
+            self.time_us = to_epoch_us(parsed)
+            offset = parsed.utcoffset()
+            self.utc_offset = offset // timedelta(minutes=1) if offset is not None else 0
+            self.hour = parsed.hour
+
+        # Sender state, set by bind() once the sender is locked
+        self.state: Optional[SenderState] = None
+        self.history: Optional[SenderHistory] = None
+
+    def bind(self, state: SenderState) -> "EvaluationContext":
+        """Attach the sender's (locked) state"""
+        self.state = state
+        self.history = state.history
+        return self
@@ -0,0 +1,385 @@
+"""
+Flagged Accounts
+
+Deny-list of receiver accounts, loadable from a file and hot-swappable.
+
+The list file holds one account ID per line (UTF-8, LF line endings):
+
+- Sorted bytewise (`LC_ALL=C sort -u`): the file is memory-mapped and
+  searched in place, so tens of millions of IDs cost page cache rather than
+  Python objects. A Bloom filter sits in front, so the common "not flagged"
+  lookup is answered without touching the file. The filter and a sparse
+  block index are cached next to the list as `<path>.idx` and rebuilt
+  whenever the list changes.
+- Unsorted: loaded into an in-memory set (fine for small lists).
+
+Without a file, the built-in demo accounts are used. FlaggedAccountStore
+polls the file's stat and swaps in a new version atomically; lookups in
+flight keep using the version they started with. Publish new lists by
+writing a temporary file and renaming it over the old one.
+"""
+
+import bisect
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Simulated database of flagged accounts (used when no list file is configured)
+DEFAULT_FLAGGED_ACCOUNTS = (
+    "flagged_account_1",
+    "flagged_account_2",
+    "suspicious_merchant",
+    "blocked_user_999"
+)
+
+# Index sidecar: magic, then Bloom blocks, hash count, entry count, the list
+# file's size and mtime, and the number of block offsets that follow the filter
+_INDEX_MAGIC = b"FDIDX002"
+_INDEX_HEADER = struct.Struct("<QIQQQQ")
+_HASH_PAIR = struct.Struct("<QQ")
+
+# Bloom filter block: one 64-byte cache line (512 bits)
+_BLOOM_BLOCK_BYTES = 64
+# Lines per block of the sorted-file index
+_INDEX_BLOCK_LINES = 128
+
+
+class BloomFilter:
+    """
+    Cache-line blocked Bloom filter: h1 picks a 512-bit block and up to 7
+    9-bit slices of h2 pick the bits inside it, so a lookup touches a single
+    cache line (and a single page when the filter is memory-mapped). The
+    false-positive rate is slightly above a classic filter of the same size.
+    The bit array may be a bytearray or a read-only memory map.
+    """
+
+    __slots__ = ("num_blocks", "num_hashes", "count", "_bits")
+
+    def __init__(self, num_blocks: int, num_hashes: int, bits=None, count: int = 0):
+        self.num_blocks = num_blocks
+        self.num_hashes = num_hashes
+        self.count = count
+        self._bits = bits if bits is not None else bytearray(num_blocks * _BLOOM_BLOCK_BYTES)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.01) -> "BloomFilter":
+        """Size a filter for `capacity` keys at (about) the given false-positive rate"""
+        capacity = max(capacity, 1)
+        num_bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        num_hashes = min(7, max(1, round(num_bits / capacity * math.log(2))))
+        return cls(math.ceil(num_bits / (_BLOOM_BLOCK_BYTES * 8)), num_hashes)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.num_blocks * _BLOOM_BLOCK_BYTES
+
+    def __contains__(self, key: bytes) -> bool:
+        h1, h2 = _HASH_PAIR.unpack(hashlib.blake2b(key, digest_size=16).digest())
+        base = (h1 % self.num_blocks) * _BLOOM_BLOCK_BYTES
+        bits = self._bits
+        for _ in range(self.num_hashes):
+            bit = h2 & 511
+            if not bits[base + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+            h2 >>= 9
+        return True
+
+    def add_many(self, keys: List[bytes]):
+        """Add keys in one vectorized pass"""
+        if not keys:
+            return
+        digests = b"".join(hashlib.blake2b(key, digest_size=16).digest() for key in keys)
+        pairs = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+        base = (pairs[:, 0] % np.uint64(self.num_blocks)) * np.uint64(_BLOOM_BLOCK_BYTES)
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        for i in range(self.num_hashes):
+            bit = (pairs[:, 1] >> np.uint64(9 * i)) & np.uint64(511)
+            masks = np.left_shift(1, bit & np.uint64(7)).astype(np.uint8)
+            np.bitwise_or.at(bits, (base + (bit >> np.uint64(3))).astype(np.int64), masks)
+        self.count += len(keys)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
+
+
+class _UnsortedList(ValueError):
+    """The list file is not sorted, so it cannot be searched in place"""
+
+
+class _SetIndex:
+    """In-memory list (unsorted files and the built-in defaults)"""
+
+    def __init__(self, account_ids: Iterable[str]):
+        self._members = frozenset(account_ids)
+        self._sorted: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, account_id: str) -> bool:
+        return account_id in self._members
+
+    def page(self, cursor: Optional[str], limit: int) -> List[str]:
+        if self._sorted is None:
+            self._sorted = sorted(self._members)
+        start = bisect.bisect_right(self._sorted, cursor) if cursor is not None else 0
+        return self._sorted[start:start + limit]
+
+
+class _MappedIndex:
+    """
+    Sorted list file searched in place through mmap. A Bloom filter answers
+    most misses; otherwise the first ID of every 128th line (held in memory)
+    narrows the search to one block, which is scanned with a single find().
+    """
+
+    def __init__(self, path: str, error_rate: float):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            # mmap cannot map an empty file
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+        self._size = stat.st_size
+        # A last line without a trailing newline is matched separately
+        self._tail = None
+        if self._size and self._map[self._size - 1:] != b"\n":
+            self._tail = self._map[self._map.rfind(b"\n") + 1:]
+
+        try:
+            loaded = self._load_index(stat) or self._build_index(stat, error_rate)
+        except BaseException:
+            # Unsorted (the caller falls back to a set) or unreadable: don't keep the mapping
+            if self._size:
+                self._map.close()
+            raise
+        self.bloom, self._block_offsets = loaded
+        self._block_keys = [self._line_at(offset)[0] for offset in self._block_offsets]
+
+    def __len__(self) -> int:
+        # Distinct IDs (repeated lines are counted once when the index is built)
+        return self.bloom.count
+
+    def __contains__(self, account_id: str) -> bool:
+        key = account_id.encode("utf-8")
+        if key not in self.bloom:
+            return False
+        block = bisect.bisect_right(self._block_keys, key) - 1
+        if block < 0:
+            return False
+        start, end = self._block_range(block)
+        line = key + b"\n"
+        if self._map[start:start + len(line)] == line or self._map.find(b"\n" + line, start, end) >= 0:
+            return True
+        return end == self._size and self._tail == key
+
+    def page(self, cursor: Optional[str], limit: int) -> List[str]:
+        offset = 0
+        key = None
+        if cursor is not None:
+            key = cursor.encode("utf-8")
+            block = bisect.bisect_right(self._block_keys, key) - 1
+            if block >= 0:
+                offset = self._block_offsets[block]
+
+        results = []
+        previous = None
+        while offset < self._size and len(results) < limit:
+            line, end = self._line_at(offset)
+            # Repeated lines are adjacent in a sorted list: each ID is listed once
+            if line and line != previous and (key is None or line > key):
+                results.append(line.decode("utf-8"))
+            previous = line
+            offset = end + 1
+        return results
+
+    def _block_range(self, block: int) -> Tuple[int, int]:
+        start = self._block_offsets[block]
+        end = self._block_offsets[block + 1] if block + 1 < len(self._block_offsets) else self._size
+        return start, end
+
+    def _line_at(self, start: int) -> Tuple[bytes, int]:
+        """Line beginning at `start` and the offset of its terminating newline"""
+        end = self._map.find(b"\n", start)
+        if end < 0:
+            end = self._size
+        return self._map[start:end], end
+
+    def _load_index(self, stat: os.stat_result) -> Optional[Tuple[BloomFilter, array]]:
+        """Reuse <path>.idx when it was built from this exact version of the list"""
+        try:
+            with open(self.path + ".idx", "rb") as f:
+                header = f.read(len(_INDEX_MAGIC) + _INDEX_HEADER.size)
+                if not header.startswith(_INDEX_MAGIC):
+                    return None
+                num_blocks, num_hashes, count, size, mtime_ns, entries = _INDEX_HEADER.unpack_from(
+                    header, len(_INDEX_MAGIC)
+                )
+                if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                    return None
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, struct.error):
+            return None
+
+        bloom_end = len(header) + num_blocks * _BLOOM_BLOCK_BYTES
+        bloom = BloomFilter(num_blocks, num_hashes, memoryview(data)[len(header):bloom_end], count)
+        offsets = array("q")
+        offsets.frombytes(data[bloom_end:bloom_end + entries * offsets.itemsize])
+        return bloom, offsets
+
+    def _build_index(self, stat: os.stat_result, error_rate: float) -> Tuple[BloomFilter, array]:
+        """Scan the list once (checking it is sorted), build the filter and block index, and cache them"""
+        # Line count bounds the entry count; good enough for sizing
+        lines = sum(self._map[offset:offset + (1 << 24)].count(b"\n") for offset in range(0, self._size, 1 << 24))
+        bloom = BloomFilter.for_capacity(lines + 1, error_rate)
+        offsets = array("q")
+
+        chunk: List[bytes] = []
+        previous = b""
+        offset = 0
+        entries = 0
+        if self._size:
+            self._map.seek(0)
+            for raw in iter(self._map.readline, b""):
+                line = raw.rstrip(b"\n")
+                if line and line != previous:
+                    if line < previous:
+                        raise _UnsortedList(self.path)
+                    if entries % _INDEX_BLOCK_LINES == 0:
+                        offsets.append(offset)
+                    entries += 1
+                    previous = line
+                    chunk.append(line)
+                    if len(chunk) >= 128 * _INDEX_BLOCK_LINES:
+                        bloom.add_many(chunk)
+                        chunk = []
+                offset += len(raw)
+        bloom.add_many(chunk)
+
+        temp_path = self.path + ".idx.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(_INDEX_MAGIC)
+                f.write(_INDEX_HEADER.pack(bloom.num_blocks, bloom.num_hashes, bloom.count,
+                                           stat.st_size, stat.st_mtime_ns, len(offsets)))
+                f.write(bloom.to_bytes())
+                f.write(offsets.tobytes())
+            os.replace(temp_path, self.path + ".idx")
+        except OSError as e:
+            logger.warning(f"Could not cache index for {self.path}: {str(e)}")
+        return bloom, offsets
+
+
+class FlaggedAccountStore:
+    """
+    Current flagged-account list with atomic hot reload.
+
+    Membership checks and pages read `self.accounts` once, so a reload that
+    swaps it mid-request never mixes two versions.
+    """
+
+    def __init__(self, path: str = "", reload_interval_s: float = 30, error_rate: float = 0.01):
+        self.path = path
+        self.reload_interval = reload_interval_s
+        self.error_rate = error_rate
+
+        self._source_stat: Optional[Tuple[int, int, int]] = None
+        self._reload_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.accounts = _SetIndex(DEFAULT_FLAGGED_ACCOUNTS)
+        self.loaded_at = time.time()
+        if path:
+            self.reload()
+
+    def __contains__(self, account_id: str) -> bool:
+        return account_id in self.accounts
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def contains_many(self, account_ids: np.ndarray) -> np.ndarray:
+        """Vectorized membership for an object array of IDs (each distinct ID checked once)"""
+        accounts = self.accounts
+        unique = np.unique(account_ids)
+        hits = [account_id for account_id in unique if account_id in accounts]
+        return np.isin(account_ids, hits)
+
+    def page(self, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[str], Optional[str]]:
+        """
+        One page of flagged IDs in sorted order.
+
+        Args:
+            cursor: Last ID of the previous page (None for the first page)
+            limit: Maximum IDs to return
+
+        Returns:
+            (IDs, cursor for the next page or None at the end)
+        """
+        ids = self.accounts.page(cursor, limit)
+        return ids, (ids[-1] if len(ids) == limit else None)
+
+    # ---------- Reloading ----------
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the list file if it changed since the last load and swap it in.
+
+        Returns:
+            True if a new version was loaded
+        """
+        with self._reload_lock:
+            stat = os.stat(self.path)
+            source = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if source == self._source_stat and not force:
+                return False
+
+            started = time.perf_counter()
+            try:
+                accounts = _MappedIndex(self.path, self.error_rate)
+            except _UnsortedList:
+                logger.warning(f"{self.path} is not sorted; loading it into memory (LC_ALL=C sort -u enables mmap)")
+                with open(self.path, encoding="utf-8") as f:
+                    accounts = _SetIndex(line.rstrip("\n") for line in f if line.strip())
+
+            self.accounts = accounts
+            self.loaded_at = time.time()
+            self._source_stat = source
+            logger.info(
+                f"Loaded {len(accounts)} flagged accounts from {self.path} "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+            return True
+
+    def start(self):
+        """Poll the list file for changes in a background thread"""
+        if not self.path or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="flagged-accounts-reload", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the reload thread"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stopping.wait(self.reload_interval):
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                # Keep serving the previous version
+                logger.error(f"Flagged account reload failed: {str(e)}")
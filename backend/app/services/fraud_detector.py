@@ -1,7 +1,32 @@
-from datetime import datetime, timedelta
-from typing import List, Dict
-from statistics import mean, stdev
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.models.flags import (
+    AMOUNT_OUTLIER,
+    INVALID_TIMESTAMP,
+    NEW_RECIPIENT,
+    NO_RISK_INDICATORS,
+    ROUND_AMOUNT,
+    SELF_TRANSFER,
+    SMALL_TO_LARGE_SHIFT,
+    Flag,
+    money
+)
 from app.models.schemas import TransactionRequest, TransactionResponse
+from app.services.evaluation_context import EvaluationContext
+from app.services.flagged_accounts import FlaggedAccountStore
+from app.services.hour_profile import local_time_us
+from app.services.journal import TransactionJournal
+from app.services.metrics import FraudMetrics
+from app.services.profiling import current_timer
+from app.services.receiver_fan_in import ReceiverFanIn
+from app.services.state_store import InMemoryStateStore, SenderState, StateStore
+from app.services.velocity_window import to_epoch_us
+
+
+# A factor stage scores one transaction: (risk points, flags)
+FactorStage = Callable[[EvaluationContext], Tuple[int, List[Flag]]]
 
 
 class FraudDetector:
@@ -11,24 +36,110 @@ class FraudDetector:
     behavior signals, and historical deviation detection.
     """
     
-    def __init__(self):
-        # Simulated database of flagged accounts
-        self.flagged_receivers = {
-            "flagged_account_1",
-            "flagged_account_2", 
-            "suspicious_merchant",
-            "blocked_user_999"
+    # Registered factor stages (name -> method), in default pipeline order
+    FACTOR_STAGES = {
+        "amount": "_analyze_transaction_amount",        # FACTOR 1: Transaction Amount Analysis
+        "recipient": "_analyze_recipient_profile",      # FACTOR 2: Recipient Profile Analysis
+        "context": "_analyze_transaction_context",      # FACTOR 3: Transaction Context (Time, Device, Location)
+        "behavior": "_analyze_user_behavior",           # FACTOR 4: User Behavior Signals (Velocity, Frequency)
+        "history": "_analyze_historical_deviation",     # FACTOR 5: Historical Pattern Deviation
+        "self_transfer": "_check_self_transfer",        # SPECIAL CHECK: Self-transfer detection
+        "round_amount": "_check_round_amount"           # SPECIAL CHECK: Round number pattern
+    }
+    DEFAULT_STAGES = list(FACTOR_STAGES)
+    
+    # Most risk points each stage can add (bounds the score in fast-decision mode)
+    STAGE_MAX_RISK = {
+        "amount": 50,
+        "recipient": 90,
+        "context": 20,
+        "behavior": 50,
+        "history": 35,
+        "self_transfer": 25,
+        "round_amount": 5
+    }
+    # Fast-decision evaluation order: cheapest and most decisive stages first
+    FAST_STAGE_ORDER = ["self_transfer", "round_amount", "context", "recipient", "amount", "history", "behavior"]
+    
+    def __init__(self, store: Optional[StateStore] = None, journal: Optional[TransactionJournal] = None,
+                 flagged_receivers: Optional[FlaggedAccountStore] = None, stages: Optional[List[str]] = None,
+                 fast_decisions: bool = False, metrics: Optional[FraudMetrics] = None,
+                 fan_in: Optional[ReceiverFanIn] = None):
+        # Database of flagged accounts (built-in demo list unless loaded from a file)
+        self.flagged_receivers = flagged_receivers if flagged_receivers is not None else FlaggedAccountStore()
+        
+        # Per-sender state: transaction history (ring buffer of the last 100,
+        # with running amount statistics and a sorted velocity window) and
+        # known receiver relationships. In process memory by default, or a
+        # shared store so all workers on a host see the same history.
+        self.store = store if store is not None else InMemoryStateStore()
+        
+        # Receiver -> distinct recent senders (fan-in), across all senders (off unless configured)
+        self.fan_in = fan_in if fan_in is not None else ReceiverFanIn()
+        
+        # Optional append-only log of stored transactions (warm restart for the memory store)
+        self.journal = journal
+        
+        # Factor pipeline: enabled stages in evaluation order
+        self._stage_registry: Dict[str, FactorStage] = {
+            name: getattr(self, method) for name, method in self.FACTOR_STAGES.items()
         }
+        self._stage_max_risk: Dict[str, int] = dict(self.STAGE_MAX_RISK)
+        self.configure_stages(stages if stages is not None else self.DEFAULT_STAGES)
         
-        # In-memory transaction history
-        # Format: {"sender_id": [{"timestamp": datetime, "amount": float, "receiver_id": str}, ...]}
-        self.transaction_history: Dict[str, List[Dict]] = {}
+        # Default for evaluate_transaction(fast=None): stop scoring once the decision is settled
+        self.fast_decisions = fast_decisions
+        
+        # Optional decision counters and sampled per-factor latency histograms
+        self.metrics = metrics
+    
+    def register_stage(self, name: str, stage: FactorStage, max_risk: int = 100):
+        """
+        Register an additional factor stage. It only runs once its name is
+        included in configure_stages().
         
-        # Track known receiver relationships per sender
-        # Format: {"sender_id": {"receiver_id": count}}
-        self.receiver_relationships: Dict[str, Dict[str, int]] = {}
+        Args:
+            name: Stage name used in configuration
+            stage: Callable scoring an EvaluationContext, returning (risk
+                points, flags); flags are Flag values (or plain strings)
+            max_risk: Most points the stage can add (fast-decision mode relies on it)
+        """
+        if name in self._stage_registry:
+            raise ValueError(f"Factor stage '{name}' is already registered")
+        self._stage_registry[name] = stage
+        self._stage_max_risk[name] = max_risk
+    
+    def configure_stages(self, names: List[str]):
+        """
+        Set which factor stages run, and in what order.
+        
+        Args:
+            names: Registered stage names; omitted stages are disabled
+        """
+        unknown = [name for name in names if name not in self._stage_registry]
+        if unknown:
+            raise ValueError(
+                f"Unknown factor stage(s) {', '.join(unknown)} "
+                f"(available: {', '.join(self._stage_registry)})"
+            )
+        if len(set(names)) != len(names):
+            raise ValueError("Factor stages may only be listed once")
+        
+        self.stages: List[Tuple[str, FactorStage]] = [(name, self._stage_registry[name]) for name in names]
+        # The vectorized batch path hard-codes the default pipeline
+        self._default_pipeline = list(names) == self.DEFAULT_STAGES
+        
+        # Fast-decision order (known stages cheapest-first, custom stages last) and,
+        # per position, the most points the stages from there on can still add
+        rank = {name: index for index, name in enumerate(self.FAST_STAGE_ORDER)}
+        self._fast_stages = sorted(self.stages, key=lambda item: rank.get(item[0], len(rank)))
+        self._fast_remaining_risk = [
+            sum(self._stage_max_risk[name] for name, _ in self._fast_stages[index:])
+            for index in range(len(self._fast_stages))
+        ]
     
-    def evaluate_transaction(self, amount: float, sender_id: str, receiver_id: str, timestamp: str) -> TransactionResponse:
+    def evaluate_transaction(self, amount: float, sender_id: str, receiver_id: str, timestamp: str,
+                             fast: Optional[bool] = None) -> TransactionResponse:
         """
         Comprehensive fraud evaluation using multiple risk factors.
         
@@ -41,124 +152,277 @@ class FraudDetector:
         
         Args:
             transaction: Transaction details to evaluate
+            fast: Fast-decision mode (defaults to the detector setting). Stages
+                run cheapest-first and scoring stops once no remaining stage
+                could change the decision; the transaction is still stored.
+                risk_score and flags then cover only the stages that ran, and
+                skipped_factors lists the rest.
             
         Returns:
             TransactionResponse with decision and risk analysis
         """
+        if fast is None:
+            fast = self.fast_decisions
+        
+        # Scoring and storage form one atomic read-modify-write of the sender's
+        # state, so concurrent requests never see or overwrite partial state
+        with self.store.sender(sender_id) as state:
+            return self._evaluate_transaction(state, amount, sender_id, receiver_id, timestamp, fast)
+    
+    def _evaluate_transaction(self, state: SenderState, amount: float, sender_id: str, receiver_id: str,
+                              timestamp: str, fast: bool = False) -> TransactionResponse:
+        """Score and store one transaction against the sender's (locked) state"""
+        context = EvaluationContext(amount, sender_id, receiver_id, timestamp).bind(state)
+        return self._evaluate_context(context, fast)
+    
+    def _evaluate_context(self, context: EvaluationContext, fast: bool = False) -> TransactionResponse:
+        """Run the factor pipeline over a bound context, then store the transaction"""
         score = 0
         flags = []
+        skipped = None
+        metrics = self.metrics
+        # Stages are timed on sampled evaluations (recorded in one batch at the
+        # end) and for requests that asked for a Server-Timing breakdown
+        timer = current_timer.get()
+        sampled = metrics is not None and metrics.sample_factors()
+        timed = sampled or timer is not None
+        timings = []
+        
+        if fast:
+            skipped = []
+            for index, (name, stage) in enumerate(self._fast_stages):
+                if self._decision_settled(score, self._fast_remaining_risk[index]):
+                    skipped = [name for name, _ in self._fast_stages[index:]]
+                    break
+                if timed:
+                    started = time.perf_counter()
+                    stage_risk, stage_flags = stage(context)
+                    timings.append(((name,), time.perf_counter() - started))
+                else:
+                    stage_risk, stage_flags = stage(context)
+                score += stage_risk
+                flags.extend(stage_flags)
+        elif timed:
+            for name, stage in self.stages:
+                started = time.perf_counter()
+                stage_risk, stage_flags = stage(context)
+                timings.append(((name,), time.perf_counter() - started))
+                score += stage_risk
+                flags.extend(stage_flags)
+        else:
+            for _, stage in self.stages:
+                stage_risk, stage_flags = stage(context)
+                score += stage_risk
+                flags.extend(stage_flags)
         
-        # FACTOR 1: Transaction Amount Analysis
-        amount_risk, amount_flags = self._analyze_transaction_amount(
-            sender_id, 
-            amount
+        # Store transaction in history
+        if timer is not None:
+            started = time.perf_counter()
+            self._store_transaction(context)
+            timer.add_factors(timings)
+            timer.add("history", time.perf_counter() - started)
+        else:
+            self._store_transaction(context)
+        
+        # Determine final decision
+        decision, risk_level, reason = self._determine_decision(score, flags)
+        if metrics is not None:
+            metrics.record_decision(decision)
+            if sampled:
+                metrics.observe_factors(timings)
+        
+        # Every field is produced here from known-good values: skip validation
+        return TransactionResponse.trusted(
+            decision=decision,
+            reason=reason,
+            risk_score=min(score, 100),  # Cap at 100
+            risk_level=risk_level,
+            flags=flags if flags else [NO_RISK_INDICATORS],
+            skipped_factors=skipped
         )
-        score += amount_risk
+    
+    def _decision_settled(self, score: int, remaining_risk: int) -> bool:
+        """True if adding up to remaining_risk more points cannot change the decision band"""
+        return self._decision_band(score) == self._decision_band(score + remaining_risk)
+    
+    def _decision_band(self, score: int) -> int:
+        """0 = approve, 1 = warn, 2 = block (thresholds of _determine_decision)"""
+        if score >= 70:
+            return 2
+        return 1 if score >= 40 else 0
+    
+    def evaluate_batch(self, transactions: List[TransactionRequest],
+                       fast: Optional[bool] = None) -> List[TransactionResponse]:
+        """
+        Evaluate a batch of transactions, equivalent to calling
+        evaluate_transaction on each item in order.
+        
+        Stateless checks (flagged receiver, self-transfer, round amounts)
+        and the final decisions are computed as NumPy
+        operations over the whole batch. History-dependent factors are
+        applied item by item, in order, so transactions from the same
+        sender see each other exactly as in the sequential path. With a
+        non-default factor pipeline or in fast-decision mode, items run
+        through the pipeline one by one.
+        
+        Args:
+            transactions: Transactions to evaluate, in arrival order
+            fast: Fast-decision mode (see evaluate_transaction)
+            
+        Returns:
+            One TransactionResponse per transaction, in the same order
+        """
+        count = len(transactions)
+        if count == 0:
+            return []
+        
+        contexts = [
+            EvaluationContext(tx.amount, tx.sender_id, tx.receiver_id, tx.timestamp) for tx in transactions
+        ]
+        
+        if fast is None:
+            fast = self.fast_decisions
+        
+        if fast or not self._default_pipeline:
+            with self.store.session():
+                self.store.prefetch(tx.sender_id for tx in transactions)
+                responses = []
+                for context in contexts:
+                    with self.store.sender(context.sender_id) as state:
+                        responses.append(self._evaluate_context(context.bind(state), fast))
+                return responses
+        
+        amounts = np.fromiter((tx.amount for tx in transactions), dtype=np.float64, count=count)
+        senders = np.array([tx.sender_id for tx in transactions], dtype=object)
+        receivers = np.array([tx.receiver_id for tx in transactions], dtype=object)
+        
+        # FACTOR 2 (flagged receiver), SPECIAL CHECKS - vectorized
+        flagged = self.flagged_receivers.contains_many(receivers)
+        self_transfer = senders == receivers
+        round_number = (np.mod(amounts, 1000) == 0) & (amounts > 0)
+        
+        scores = 50 * flagged + 25 * self_transfer + 5 * round_number
+        
+        # FACTORS 1, 2 (relationships), 3 (hour profile), 4 and 5 - sequential, history-dependent.
+        # One store session covers the batch, so shared backends load and
+        # write each sender once instead of once per item.
+        item_flags = []
+        with self.store.session():
+            self.store.prefetch(tx.sender_id for tx in transactions)
+            
+            for index, context in enumerate(contexts):
+                with self.store.sender(context.sender_id) as state:
+                    dynamic_risk, flags = self._analyze_batch_item(context.bind(state), flagged[index])
+                
+                if self_transfer[index]:
+                    flags.append(SELF_TRANSFER)
+                if round_number[index]:
+                    flags.append(ROUND_AMOUNT)
+                
+                scores[index] += dynamic_risk
+                item_flags.append(flags)
+        
+        # Final decisions - vectorized thresholds (0 = approve, 1 = warn, 2 = block)
+        outcomes = [self._determine_decision(score, []) for score in (0, 40, 70)]
+        levels = (scores >= 40).astype(np.int64) + (scores >= 70)
+        capped_scores = np.minimum(scores, 100)
+        
+        responses = []
+        for index in range(count):
+            decision, risk_level, reason = outcomes[levels[index]]
+            flags = item_flags[index]
+            responses.append(TransactionResponse.trusted(
+                decision=decision,
+                reason=reason,
+                risk_score=int(capped_scores[index]),
+                risk_level=risk_level,
+                flags=flags if flags else [NO_RISK_INDICATORS],
+                skipped_factors=None
+            ))
+        
+        # Vectorized factors are not timed individually; decisions are counted per band
+        if self.metrics is not None:
+            for (decision, _, _), band_count in zip(outcomes, np.bincount(levels, minlength=3)):
+                if band_count:
+                    self.metrics.record_decision(decision, int(band_count))
+        
+        return responses
+    
+    def _analyze_batch_item(self, context: EvaluationContext, flagged: bool) -> tuple:
+        """
+        Apply the history-dependent factors to one batch item and store it
+        against the sender's (locked) state. The precomputed flagged result
+        is interleaved so flags keep the sequential order.
+        """
+        flags = []
+        
+        amount_risk, amount_flags = self._analyze_transaction_amount(context)
         flags.extend(amount_flags)
         
-        # FACTOR 2: Recipient Profile Analysis
-        recipient_risk, recipient_flags = self._analyze_recipient_profile(
-            sender_id,
-            receiver_id
-        )
-        score += recipient_risk
-        flags.extend(recipient_flags)
+        if flagged:
+            flags.append(Flag("FLAGGED_RECEIVER", (context.receiver_id,)))
+        relationship_risk, relationship_flags = self._analyze_recipient_relationship(context)
+        flags.extend(relationship_flags)
         
-        # FACTOR 3: Transaction Context (Time, Device, Location patterns)
-        context_risk, context_flags = self._analyze_transaction_context(
-            timestamp
-        )
-        score += context_risk
+        context_risk, context_flags = self._analyze_transaction_context(context)
         flags.extend(context_flags)
         
-        # FACTOR 4: User Behavior Signals (Velocity, Frequency)
-        behavior_risk, behavior_flags = self._analyze_user_behavior(
-            sender_id,
-            timestamp
-        )
-        score += behavior_risk
+        behavior_risk, behavior_flags = self._analyze_user_behavior(context)
         flags.extend(behavior_flags)
         
-        # FACTOR 5: Historical Pattern Deviation
-        history_risk, history_flags = self._analyze_historical_deviation(
-            sender_id,
-            amount
-        )
-        score += history_risk
+        history_risk, history_flags = self._analyze_historical_deviation(context)
         flags.extend(history_flags)
         
-        # SPECIAL CHECKS
-        # Self-transfer detection
-        if sender_id == receiver_id:
-            score += 25
-            flags.append("Self-transfer detected (unusual pattern)")
-        
-        # Round number pattern
-        if amount % 1000 == 0 and amount > 0:
-            score += 5
-            flags.append("Round number amount (minor indicator)")
-        
-        # Store transaction in history
-        self._store_transaction(sender_id, receiver_id, amount, timestamp)
-        
-        # Determine final decision
-        decision, risk_level, reason = self._determine_decision(score, flags)
+        self._store_transaction(context)
         
-        return TransactionResponse(
-            decision=decision,
-            reason=reason,
-            risk_score=min(score, 100),  # Cap at 100
-            risk_level=risk_level,
-            flags=flags if flags else ["No risk indicators detected - transaction appears normal"]
-        )
+        return amount_risk + relationship_risk + context_risk + behavior_risk + history_risk, flags
     
     # ========== RISK FACTOR 1: Transaction Amount Analysis ==========
-    def _analyze_transaction_amount(self, sender_id: str, amount: float) -> tuple:
+    def _analyze_transaction_amount(self, context: EvaluationContext) -> tuple:
         """
         Analyze if transaction amount is unusual for this user.
         Compares to user's historical spending patterns.
         """
         risk_score = 0
         flags = []
+        amount = context.amount
         
-        # Get user's transaction history
-        user_history = self.transaction_history.get(sender_id, [])
+        # Get user's running spending statistics
+        user_history = context.history
         
         if len(user_history) >= 3:
+            stats = user_history.amount_stats
+            
             # Calculate average and deviation
-            past_amounts = [tx["amount"] for tx in user_history]
-            avg_amount = mean(past_amounts)
+            avg_amount = stats.mean()
             
             # Check if significantly higher than average
             if amount > avg_amount * 5:  # 5x average
                 risk_score += 35
-                flags.append(f"Amount ${amount:,.2f} is 5x higher than user's average ${avg_amount:,.2f}")
+                flags.append(Flag("AMOUNT_5X_AVERAGE", (money(amount), money(avg_amount))))
             elif amount > avg_amount * 3:  # 3x average
                 risk_score += 20
-                flags.append(f"Amount ${amount:,.2f} is 3x higher than user's average ${avg_amount:,.2f}")
+                flags.append(Flag("AMOUNT_3X_AVERAGE", (money(amount), money(avg_amount))))
             
             # Check for statistical outlier (if enough data)
-            if len(past_amounts) >= 5:
-                try:
-                    std_dev = stdev(past_amounts)
-                    if amount > avg_amount + (3 * std_dev):
-                        risk_score += 15
-                        flags.append("Amount is statistical outlier (3+ standard deviations)")
-                except:
-                    pass  # Not enough variance
+            if len(user_history) >= 5:
+                std_dev = stats.stdev()
+                if amount > avg_amount + (3 * std_dev):
+                    risk_score += 15
+                    flags.append(AMOUNT_OUTLIER)
         else:
             # New user or limited history - check absolute thresholds
             if amount > 50000:
                 risk_score += 30
-                flags.append(f"High-value transaction (${amount:,.2f}) with limited user history")
+                flags.append(Flag("HIGH_VALUE_LIMITED_HISTORY", (money(amount),)))
             elif amount > 10000:
                 risk_score += 10
-                flags.append(f"Moderate-value transaction (${amount:,.2f}) with limited user history")
+                flags.append(Flag("MODERATE_VALUE_LIMITED_HISTORY", (money(amount),)))
         
         return risk_score, flags
     
     # ========== RISK FACTOR 2: Recipient Profile Analysis ==========
-    def _analyze_recipient_profile(self, sender_id: str, receiver_id: str) -> tuple:
+    def _analyze_recipient_profile(self, context: EvaluationContext) -> tuple:
         """
         Analyze recipient profile: flagged accounts, new receivers, relationship history.
         """
@@ -166,29 +430,54 @@ class FraudDetector:
         flags = []
         
         # Check if receiver is flagged
-        if receiver_id in self.flagged_receivers:
+        if context.receiver_id in self.flagged_receivers:
             risk_score += 50
-            flags.append(f"Receiver '{receiver_id}' is flagged as high-risk in system database")
+            flags.append(Flag("FLAGGED_RECEIVER", (context.receiver_id,)))
         
-        # Initialize relationship tracking if needed
-        if sender_id not in self.receiver_relationships:
-            self.receiver_relationships[sender_id] = {}
+        relationship_risk, relationship_flags = self._analyze_recipient_relationship(context)
+        risk_score += relationship_risk
+        flags.extend(relationship_flags)
         
-        # Check if this is a new/unseen receiver
-        if receiver_id not in self.receiver_relationships[sender_id]:
+        return risk_score, flags
+    
+    def _analyze_recipient_relationship(self, context: EvaluationContext) -> tuple:
+        """
+        Analyze the sender's relationship with this receiver (new vs known
+        recipients), and for new recipients how many distinct senders paid
+        the receiver recently (fan-in).
+        """
+        risk_score = 0
+        flags = []
+        receiver_id = context.receiver_id
+        
+        relationships = context.state.relationships
+        interner = self.store.interner
+        
+        # Check if this is a new/unseen receiver (bounded tracking: see receiver_relationships.py)
+        if not relationships.knows(receiver_id, interner):
             # New receiver
-            total_receivers = len(self.receiver_relationships[sender_id])
+            total_receivers = len(relationships)
             
             if total_receivers >= 5:
                 # User has established patterns - new receiver is moderate risk
                 risk_score += 15
-                flags.append(f"Payment to new recipient (user typically sends to {total_receivers} known recipients)")
+                flags.append(Flag("NEW_RECIPIENT_ESTABLISHED", (total_receivers,)))
             elif total_receivers >= 2:
                 risk_score += 8
-                flags.append("Payment to new recipient")
+                flags.append(NEW_RECIPIENT)
+            
+            # Many distinct senders paying one receiver in a short window (mule account)
+            fan_in = self.fan_in
+            senders = fan_in.count(receiver_id, context.sender_id, context.time_us)
+            if senders >= 2 * fan_in.threshold:
+                risk_score += 25
+                flags.append(Flag("FAN_IN_EXTREME", (senders, fan_in.window_s // 60)))
+            elif senders >= fan_in.threshold:
+                risk_score += 15
+                flags.append(Flag("FAN_IN_HIGH", (senders, fan_in.window_s // 60)))
         else:
             # Known receiver - low risk indicator
-            transaction_count = self.receiver_relationships[sender_id][receiver_id]
+            transaction_count = relationships.count(receiver_id, interner)
             if transaction_count >= 5:
                 # Frequent recipient - reduce risk slightly (but don't go negative)
                 pass  # Trusted relationship
@@ -196,155 +485,176 @@ class FraudDetector:
         return risk_score, flags
     
     # ========== RISK FACTOR 3: Transaction Context Analysis ==========
-    def _analyze_transaction_context(self, timestamp_str: str) -> tuple:
+    def _analyze_transaction_context(self, context: EvaluationContext) -> tuple:
         """
         Analyze transaction timing and context.
-        Suspicious times: Late night (2-6 AM), unusual patterns.
+        Suspicious times: Late night (2-6 AM), unusual patterns. Once a sender
+        has an hour profile, the hour is judged against the sender's own habits.
         """
+        hour = context.hour
+        if hour is None:
+            # Invalid timestamp - minor risk flag
+            return 5, [INVALID_TIMESTAMP]
+        
+        # Weekend pattern check (could add if needed)
+        # weekday = timestamp.weekday()
+        # if weekday >= 5:  # Saturday=5, Sunday=6
+        #     flags.append("Weekend transaction")
+        
+        profile = context.state.hours
+        if profile.weight >= 10:
+            share = profile.share(hour)
+            if share >= 0.25:
+                # One of the sender's usual hours (night-shift and overseas users) - no risk
+                return 0, []
+            if share < 0.02:
+                # Sender (almost) never transacts around this hour
+                risk_score = 20 if 2 <= hour < 6 else 5
+                return risk_score, [Flag("UNUSUAL_HOUR", (hour, round(share * 100, 1)))]
+        
+        return self._analyze_transaction_hour(hour)
+    
+    def _analyze_transaction_hour(self, hour: int) -> tuple:
+        """Score the local hour of day a transaction was initiated at"""
         risk_score = 0
         flags = []
         
-        try:
-            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            hour = timestamp.hour
-            
-            # Late night transactions (2 AM - 6 AM) are higher risk
-            if 2 <= hour < 6:
-                risk_score += 20
-                flags.append(f"Transaction initiated at unusual time ({hour:02d}:00 - early morning)")
-            # Very early or very late (midnight - 2 AM, 10 PM - midnight)
-            elif (0 <= hour < 2) or (22 <= hour < 24):
-                risk_score += 10
-                flags.append(f"Transaction initiated at late/early hours ({hour:02d}:00)")
-            
-            # Weekend pattern check (could add if needed)
-            # weekday = timestamp.weekday()
-            # if weekday >= 5:  # Saturday=5, Sunday=6
-            #     flags.append("Weekend transaction")
-                
-        except ValueError:
-            # Invalid timestamp - minor risk flag
-            risk_score += 5
-            flags.append("Invalid or malformed timestamp")
+        # Late night transactions (2 AM - 6 AM) are higher risk
+        if 2 <= hour < 6:
+            risk_score += 20
+            flags.append(Flag("EARLY_MORNING", (hour,)))
+        # Very early or very late (midnight - 2 AM, 10 PM - midnight)
+        elif (0 <= hour < 2) or (22 <= hour < 24):
+            risk_score += 10
+            flags.append(Flag("LATE_HOURS", (hour,)))
         
         return risk_score, flags
     
     # ========== RISK FACTOR 4: User Behavior Signals ==========
-    def _analyze_user_behavior(self, sender_id: str, timestamp_str: str) -> tuple:
+    def _analyze_user_behavior(self, context: EvaluationContext) -> tuple:
         """
         Analyze user behavior: transaction velocity, frequency changes, burst patterns.
         """
         risk_score = 0
         flags = []
+        state = context.state
+        current_time_us = context.time_us
         
         # Velocity check - rapid succession of transactions
-        recent_count = self._count_recent_transactions(sender_id, timestamp_str, hours=1)
+        recent_count = self._count_recent_transactions(state, current_time_us, hours=1)
         
         if recent_count >= 5:
             risk_score += 35
-            flags.append(f"Extremely high velocity: {recent_count} transactions in past hour")
+            flags.append(Flag("VELOCITY_EXTREME", (recent_count,)))
         elif recent_count >= 3:
             risk_score += 25
-            flags.append(f"High transaction velocity: {recent_count} transactions in past hour")
+            flags.append(Flag("VELOCITY_HIGH", (recent_count,)))
         elif recent_count >= 2:
             risk_score += 12
-            flags.append(f"Elevated transaction frequency: {recent_count} transactions in past hour")
+            flags.append(Flag("VELOCITY_ELEVATED", (recent_count,)))
         
         # Check for burst patterns (many transactions in short time vs typical)
-        user_history = self.transaction_history.get(sender_id, [])
-        if len(user_history) >= 10:
+        if len(state.history) >= 10:
             # Compare recent activity to historical average
-            daily_count = self._count_recent_transactions(sender_id, timestamp_str, hours=24)
+            daily_count = self._count_recent_transactions(state, current_time_us, hours=24)
             if daily_count >= 10:
                 risk_score += 15
-                flags.append(f"Unusual transaction burst: {daily_count} transactions today")
+                flags.append(Flag("TRANSACTION_BURST", (daily_count,)))
         
         return risk_score, flags
     
     # ========== RISK FACTOR 5: Historical Pattern Deviation ==========
-    def _analyze_historical_deviation(self, sender_id: str, amount: float) -> tuple:
+    def _analyze_historical_deviation(self, context: EvaluationContext) -> tuple:
         """
         Analyze deviation from user's established spending patterns.
         """
         risk_score = 0
         flags = []
+        amount = context.amount
         
-        user_history = self.transaction_history.get(sender_id, [])
+        user_history = context.history
         
         if len(user_history) >= 5:
-            past_amounts = [tx["amount"] for tx in user_history]
+            stats = user_history.amount_stats
             
             # Calculate spending pattern
-            avg_amount = mean(past_amounts)
-            max_amount = max(past_amounts)
+            avg_amount = stats.mean()
+            max_amount = stats.max()
             
             # Check for sudden increase in spending
             if amount > max_amount * 2:
                 risk_score += 20
-                flags.append(f"Amount ${amount:,.2f} is 2x higher than user's previous maximum ${max_amount:,.2f}")
+                flags.append(Flag("AMOUNT_2X_MAXIMUM", (money(amount), money(max_amount))))
             
             # Check consistency - if user typically does small transactions
             if avg_amount < 500 and amount > 5000:
                 risk_score += 15
-                flags.append("Sudden shift from small to large transactions (behavior change)")
+                flags.append(SMALL_TO_LARGE_SHIFT)
             
             # Analyze transaction frequency deviation
             # (This could be enhanced with more sophisticated time-series analysis)
             
         return risk_score, flags
     
+    # ========== SPECIAL CHECKS ==========
+    def _check_self_transfer(self, context: EvaluationContext) -> tuple:
+        """Self-transfer detection"""
+        if context.sender_id == context.receiver_id:
+            return 25, [SELF_TRANSFER]
+        return 0, []
+    
+    def _check_round_amount(self, context: EvaluationContext) -> tuple:
+        """Round number pattern"""
+        if context.amount % 1000 == 0 and context.amount > 0:
+            return 5, [ROUND_AMOUNT]
+        return 0, []
+    
     # ========== Helper Methods ==========
-    def _count_recent_transactions(self, sender_id: str, current_timestamp: str, hours: int = 1) -> int:
-        """Count transactions from sender in the specified time window"""
-        if sender_id not in self.transaction_history:
-            return 0
-        
-        try:
-            current_time = datetime.fromisoformat(current_timestamp.replace('Z', '+00:00'))
-        except ValueError:
+    def _count_recent_transactions(self, state: SenderState, current_time_us: Optional[int], hours: int = 1) -> int:
+        """Count transactions from sender in the specified time window (binary search over sorted times)"""
+        if current_time_us is None:
             return 0
         
-        time_ago = current_time - timedelta(hours=hours)
-        
-        recent_count = sum(
-            1 for tx in self.transaction_history[sender_id]
-            if tx["timestamp"] > time_ago
-        )
-        
-        return recent_count
+        return state.history.count_recent(current_time_us, hours)
     
-    def _store_transaction(self, sender_id: str, receiver_id: str, amount: float, timestamp: str):
+    def _store_transaction(self, context: EvaluationContext):
         """Store transaction in history and update relationship tracking"""
-        try:
-            parsed_timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        except ValueError:
-            parsed_timestamp = datetime.now()
-        
-        # Store in transaction history
-        if sender_id not in self.transaction_history:
-            self.transaction_history[sender_id] = []
-        
-        self.transaction_history[sender_id].append({
-            "timestamp": parsed_timestamp,
-            "amount": amount,
-            "receiver_id": receiver_id
-        })
+        # Malformed timestamps are stored at the current time (UTC, like parsed ones)
+        if context.time_us is not None:
+            time_us, utc_offset = context.time_us, context.utc_offset
+        else:
+            time_us, utc_offset = to_epoch_us(datetime.now(timezone.utc)), 0
+        # Logged first: a record the journal rejects must not change the state (the
+        # sender lock keeps a concurrent snapshot from seeing the record without it)
+        log_seq = None
+        if self.journal is not None:
+            log_seq = self.journal.append(context.sender_id, context.receiver_id, context.amount, time_us, utc_offset)
+        self._apply_transaction(context.state, context.receiver_id, context.amount, time_us, utc_offset)
+        self.fan_in.add(context.receiver_id, context.sender_id, time_us)
+        if log_seq is not None:
+            context.state.log_seq = log_seq
+    
+    def _apply_transaction(self, state: SenderState, receiver_id: str, amount: float, time_us: int,
+                           utc_offset: int = 0):
+        """
+        Add a stored transaction to the sender's state (also used to replay the
+        journal). `utc_offset` is the request timestamp's UTC offset in minutes,
+        which places the transaction in the sender's local hour and day.
+        """
+        # Store in transaction history (the ring overwrites its oldest entry past 100)
+        interner = self.store.interner
+        receiver_index = interner.acquire(receiver_id)
+        evicted = state.history.append(time_us, amount, receiver_index)
+        if evicted is not None:
+            interner.release(evicted[2])
         
         # Update receiver relationship tracking
-        if sender_id not in self.receiver_relationships:
-            self.receiver_relationships[sender_id] = {}
+        state.relationships.add(receiver_index, interner)
         
-        if receiver_id not in self.receiver_relationships[sender_id]:
-            self.receiver_relationships[sender_id][receiver_id] = 0
-        
-        self.receiver_relationships[sender_id][receiver_id] += 1
-        
-        # Keep only last 100 transactions per sender to prevent memory issues
-        if len(self.transaction_history[sender_id]) > 100:
-            self.transaction_history[sender_id] = \
-                self.transaction_history[sender_id][-100:]
+        # Update the sender's hour-of-day profile
+        state.hours.add(local_time_us(time_us, utc_offset))
     
-    def _determine_decision(self, score: int, flags: List[str]) -> tuple:
+    def _determine_decision(self, score: int, flags: List[Flag]) -> tuple:
         """
         Convert risk score to decision and explanation.
         
@@ -372,10 +682,17 @@ class FraudDetector:
                 "Transaction approved. No significant risk indicators detected."
             )
     
-    def get_flagged_accounts(self) -> set:
-        """Return list of flagged accounts (for testing/debugging)"""
-        return self.flagged_receivers
+    def get_flagged_accounts(self, cursor: Optional[str] = None, limit: int = 100) -> tuple:
+        """
+        Return one page of flagged accounts (for testing/debugging).
+        
+        Returns:
+            (account IDs, next page cursor or None, total count)
+        """
+        accounts, next_cursor = self.flagged_receivers.page(cursor, limit)
+        return accounts, next_cursor, len(self.flagged_receivers)
     
     def clear_history(self):
         """Clear transaction history (useful for testing)"""
-        self.transaction_history.clear()
+        self.store.clear_senders()
+        self.fan_in.clear()
@@ -0,0 +1,116 @@
+"""
+Hour Profile
+
+Per-sender histogram of the hours of day the sender transacts at, with
+exponential decay, so the context factor can score how unusual an hour is
+for this sender rather than for everyone. Night-shift and overseas users
+then stop drawing the generic late-night warning at their usual hours.
+
+A habit is an hour the sender comes back to on different days, so each hour
+counts at most once per day: a burst of payments at 3 AM is one data point,
+not a pattern that makes itself look normal. Hours and days are both taken
+from the transaction's local time (its timestamp's own UTC offset), so a
+day is one calendar day of the sender's clock. Each hour only counts days
+later than the last one it counted: a backdated payment is not counted, as
+it cannot be told apart from a day already counted.
+
+Decay is per counted (day, hour): each one weighs 2**(1 / HALF_LIFE) times
+more than the previous, instead of every bin shrinking on every update.
+Updates touch one bin (O(1)); the bins are rescaled in one pass when the
+weight grows large, once every couple of thousand updates. Shares of the
+total are unaffected by the scale.
+
+The profile is updated with every stored transaction and never reads the
+history ring, so history trimming, eviction and replay leave it intact.
+24 float32 bins plus the last day counted per bin: about 500 bytes per
+sender.
+"""
+
+from array import array
+from typing import Iterable, Tuple
+
+# Counted (day, hour) pairs after which one's weight has halved
+HALF_LIFE = 50
+
+_GROWTH = 2 ** (1 / HALF_LIFE)
+# Rescale the bins once the newest weight passes this (float32 bins stay far from overflow)
+_RESCALE_AT = 1e15
+_MICROSECONDS_PER_HOUR = 3_600_000_000
+_MICROSECONDS_PER_DAY = 24 * _MICROSECONDS_PER_HOUR
+
+
+class HourProfile:
+    """Decayed 24-bin hour-of-day histogram for one sender"""
+
+    __slots__ = ("_bins", "_days", "_total", "_scale")
+
+    def __init__(self):
+        self._bins = array("f", bytes(24 * 4))
+        # Per bin, 1 + the local day it was last counted on (0 = never)
+        self._days = array("I", bytes(24 * 4))
+        self._total = 0.0
+        # Weight of the next transaction (grows instead of the old bins decaying)
+        self._scale = 1.0
+
+    @property
+    def weight(self) -> float:
+        """Decayed number of (day, hour) pairs profiled (tends to HALF_LIFE / ln 2 for a regular sender)"""
+        return self._total / self._scale
+
+    def add(self, local_time_us: int):
+        """
+        Record a transaction at a local time (epoch microseconds shifted by
+        the timestamp's UTC offset), counted once per day per hour
+        """
+        hour = local_time_us // _MICROSECONDS_PER_HOUR % 24
+        # Clamped, not negative: days before 1970 share the first slot (unsigned, 0 = never)
+        day = max(local_time_us // _MICROSECONDS_PER_DAY + 1, 1)
+        if day <= self._days[hour]:
+            return
+        self._days[hour] = day
+        scale = self._scale * _GROWTH
+        if scale > _RESCALE_AT:
+            bins = self._bins
+            for index in range(24):
+                bins[index] /= scale
+            self._total /= scale
+            scale = 1.0
+        self._scale = scale
+        self._bins[hour] += scale
+        self._total += scale
+
+    def share(self, hour: int) -> float:
+        """
+        Decayed share of activity at `hour` and the hours either side of it
+        (01:50 and 02:10 are one habit); 0.0 with no profile.
+        """
+        if self._total == 0.0:
+            return 0.0
+        bins = self._bins
+        return (bins[hour - 1] + bins[hour] + bins[(hour + 1) % 24]) / self._total
+
+    def to_state(self) -> Tuple[bytes, bytes, float, float]:
+        return self._bins.tobytes(), self._days.tobytes(), self._total, self._scale
+
+    @classmethod
+    def from_state(cls, state: Tuple[bytes, bytes, float, float]) -> "HourProfile":
+        profile = cls()
+        bins, days, profile._total, profile._scale = state
+        profile._bins = array("f")
+        profile._bins.frombytes(bins)
+        profile._days = array("I")
+        profile._days.frombytes(days)
+        return profile
+
+    @classmethod
+    def from_times(cls, times_us: Iterable[int]) -> "HourProfile":
+        """Profile of past transaction times, oldest first, at their UTC hours (seeds older saved states)"""
+        profile = cls()
+        for time_us in times_us:
+            profile.add(time_us)
+        return profile
+
+
+def local_time_us(time_us: int, utc_offset: int) -> int:
+    """Epoch-microsecond time shifted by a UTC offset in minutes (the time on the sender's clock)"""
+    return time_us + utc_offset * 60_000_000
@@ -0,0 +1,106 @@
+"""
+Idempotency Keys
+
+Bounded LRU + TTL cache from client-supplied Idempotency-Key values to the
+payment they created. A retried request with the same key gets the
+original payment back without being scored again, so retries neither
+inflate the sender's velocity history nor create duplicate payments.
+
+Entries hold a future of the payment: a duplicate that arrives while the
+original is still being processed waits on it instead of starting a second
+payment. Keys still in flight are never evicted, by size or by age, so
+the cache may exceed `max_entries` by the requests in progress. Like the
+settlement queue, the cache lives on the event loop and
+is not thread-safe; it is per process, so with several workers route
+retries of a key to the same worker (or accept one payment per worker).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Request fields a key is bound to: (amount, sender_id, receiver_id, timestamp)
+Fingerprint = Tuple[float, str, str, str]
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body"""
+
+
+class IdempotencyCache:
+    """Idempotency key -> (expiry, fingerprint, payment future), least recently used first"""
+
+    def __init__(self, max_entries: int = 100_000, ttl_s: int = 86_400):
+        """
+        Args:
+            max_entries: Completed keys kept at most; least recently used keys are dropped first
+            ttl_s: Seconds a key is honoured after its first use
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, Tuple[float, Fingerprint, asyncio.Future]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, fingerprint: Fingerprint) -> Optional[asyncio.Future]:
+        """
+        Future of the payment created under `key`, None if the key is new or expired
+
+        Raises:
+            IdempotencyKeyReused: If the key was used with a different fingerprint
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, original, future = entry
+        if expires_at <= time.monotonic() and future.done():
+            del self._entries[key]
+            return None
+        if original != fingerprint:
+            raise IdempotencyKeyReused(f"Idempotency key '{key}' was already used with a different request")
+        self._entries.move_to_end(key)
+        return future
+
+    def begin(self, key: str, fingerprint: Fingerprint) -> asyncio.Future:
+        """Register `key` as in flight; resolve the returned future with the payment"""
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = (time.monotonic() + self.ttl_s, fingerprint, future)
+        self._entries.move_to_end(key)
+        self._evict()
+        return future
+
+    def abandon(self, key: str, future: asyncio.Future, error: BaseException):
+        """Forget a key whose request failed (a retry runs again) and fail its waiters"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is future:
+            del self._entries[key]
+        if not future.done():
+            future.set_exception(error)
+            # Nobody may be waiting; don't log "exception was never retrieved"
+            future.exception()
+
+    def clear(self):
+        self._entries.clear()
+
+    def _evict(self):
+        entries = self._entries
+        # Least recently used completed keys; in-flight ones have requests waiting on them
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            evicted = []
+            for key, (_, _, future) in entries.items():
+                if future.done():
+                    evicted.append(key)
+                    if len(evicted) == excess:
+                        break
+            for key in evicted:
+                del entries[key]
+        # Expired keys at the cold end; the rest expire lazily when looked up
+        now = time.monotonic()
+        while entries:
+            expires_at, _, future = next(iter(entries.values()))
+            if expires_at > now or not future.done():
+                break
+            entries.popitem(last=False)
@@ -0,0 +1,362 @@
+"""
+Transaction Journal
+
+Durable persistence for the in-memory state store: every stored transaction
+is appended to a compact binary log, and a binary snapshot of all sender
+state is written periodically. On startup the latest snapshot is loaded and
+the log written after it is replayed, so behavioral history survives
+deploys and crashes.
+
+Layout of the journal directory:
+    snapshot.bin            latest complete snapshot (replaced atomically)
+    log.<first_seq>.bin     log segments; a new one starts at every snapshot
+
+Segments start with a format magic. Segments written before records
+carried the timestamp's UTC offset have none; they are still replayed,
+with every transaction at UTC.
+
+Log appends are group-committed: records are buffered in memory and a
+background thread writes and fsyncs them every `fsync_interval_ms` (or as
+soon as the buffer grows past `flush_bytes`). A crash loses at most the last
+interval of transactions.
+
+Every record carries a sequence number, and each SenderState remembers the
+last sequence applied to it. Snapshots are taken sender by sender while
+traffic continues, so replay skips records a sender's snapshot already
+contains.
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.models.schemas import MAX_ID_BYTES
+from app.services.state_store import InMemoryStateStore, SenderState
+
+logger = logging.getLogger(__name__)
+
+# Log record: crc32 of the rest, then seq, time_us, amount, UTC offset in
+# minutes, sender length, receiver length and the UTF-8 IDs (44 bytes + IDs
+# per transaction)
+_CRC = struct.Struct("<I")
+_RECORD = struct.Struct("<QqdhHH")
+_SEGMENT_MAGIC = b"FDLOG002"
+# Records of segments without a magic: no UTC offset
+_RECORD_V1 = struct.Struct("<QqdHH")
+# Longest sender or receiver ID a record can hold (MAX_ID_BYTES, imported
+# above, is the uint16 length limit that requests are validated against)
+# Snapshot: magic, then start seq and sender count, then (id length, blob length, id, blob) per sender
+_SNAPSHOT_MAGIC = b"FDSNAP01"
+_SNAPSHOT_HEADER = struct.Struct("<QQ")
+_SNAPSHOT_ENTRY = struct.Struct("<HI")
+
+SNAPSHOT_FILE = "snapshot.bin"
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"log.{first_seq:020d}.bin"
+
+
+class TransactionJournal:
+    """Append-only transaction log plus periodic snapshots for an InMemoryStateStore"""
+
+    def __init__(
+        self,
+        directory: str,
+        store: InMemoryStateStore,
+        fsync_interval_ms: int = 50,
+        snapshot_interval_s: float = 300,
+        flush_bytes: int = 1 << 20
+    ):
+        self.directory = directory
+        self.store = store
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.snapshot_interval = snapshot_interval_s
+        self.flush_bytes = flush_bytes
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()           # guards seq, buffer and active segment
+        self._seq = 0
+        self._buffer = bytearray()
+        self._segment = None
+        self._segment_first_seq = 0
+        self._write_lock = threading.Lock()     # serializes flushes and segment rotation
+
+        self._flush_needed = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        # Restore statistics (exposed for monitoring)
+        self.last_restore: Dict[str, float] = {}
+        self.last_snapshot: Dict[str, float] = {}
+
+    # ---------- Restore ----------
+    def restore(self, apply: Callable[[SenderState, str, float, int, int], None]) -> Dict[str, float]:
+        """
+        Load the latest snapshot and replay the log written after it.
+
+        Args:
+            apply: Applies one logged transaction to a sender's state
+                (receiver_id, amount, time_us, utc_offset), without re-logging it
+
+        Returns:
+            Restore statistics: seconds, senders and transactions loaded
+        """
+        started = time.perf_counter()
+        snapshot_seq, senders = self._load_snapshot()
+        snapshot_done = time.perf_counter()
+
+        replayed = 0
+        last_seq = snapshot_seq
+        for seq, sender_id, receiver_id, amount, time_us, utc_offset in self._read_log():
+            last_seq = max(last_seq, seq)
+            if seq <= snapshot_seq:
+                continue
+            with self.store.sender(sender_id) as state:
+                if seq <= state.log_seq:
+                    continue
+                apply(state, receiver_id, amount, time_us, utc_offset)
+                state.log_seq = seq
+            replayed += 1
+
+        self._seq = last_seq
+        self._open_segment(last_seq + 1)
+
+        self.last_restore = {
+            "seconds": time.perf_counter() - started,
+            "snapshot_seconds": snapshot_done - started,
+            "snapshot_senders": senders,
+            "stored_transactions": sum(len(state.history) for state in self.store.senders.values()),
+            "replayed_records": replayed
+        }
+        logger.info(
+            f"Restored {senders} senders from snapshot and replayed {replayed} log records "
+            f"in {self.last_restore['seconds']:.2f}s"
+        )
+        return self.last_restore
+
+    def _load_snapshot(self) -> Tuple[int, int]:
+        """Load snapshot.bin into the store; returns (snapshot seq, senders loaded)"""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0, 0
+
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_SNAPSHOT_MAGIC):
+            raise ValueError(f"{path} is not a detector snapshot")
+
+        offset = len(_SNAPSHOT_MAGIC)
+        snapshot_seq, count = _SNAPSHOT_HEADER.unpack_from(data, offset)
+        offset += _SNAPSHOT_HEADER.size
+
+        view = memoryview(data)
+        for _ in range(count):
+            id_length, blob_length = _SNAPSHOT_ENTRY.unpack_from(data, offset)
+            offset += _SNAPSHOT_ENTRY.size
+            sender_id = str(view[offset:offset + id_length], "utf-8")
+            offset += id_length
+            self.store.import_sender(sender_id, view[offset:offset + blob_length])
+            offset += blob_length
+
+        return snapshot_seq, count
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """Log segments as (first_seq, path), oldest first"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("log.") and name.endswith(".bin"):
+                segments.append((int(name[4:-4]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _read_log(self) -> Iterator[Tuple[int, str, str, float, int, int]]:
+        """Yield (seq, sender_id, receiver_id, amount, time_us, utc_offset) for every intact record"""
+        for _, path in self._segments():
+            with open(path, "rb") as f:
+                data = f.read()
+            if data.startswith(_SEGMENT_MAGIC):
+                offset = len(_SEGMENT_MAGIC)
+                record = _RECORD
+            else:
+                offset = 0
+                record = _RECORD_V1
+            header_size = _CRC.size + record.size
+            while offset + header_size <= len(data):
+                (crc,) = _CRC.unpack_from(data, offset)
+                if record is _RECORD:
+                    seq, time_us, amount, utc_offset, sender_length, receiver_length = record.unpack_from(
+                        data, offset + _CRC.size
+                    )
+                else:
+                    seq, time_us, amount, sender_length, receiver_length = record.unpack_from(data, offset + _CRC.size)
+                    utc_offset = 0
+                end = offset + header_size + sender_length + receiver_length
+                if end > len(data) or zlib.crc32(data[offset + _CRC.size:end]) != crc:
+                    # Torn write at the tail of a segment (crash mid-flush)
+                    logger.warning(f"Ignoring incomplete record at {path}:{offset}")
+                    break
+                ids = data[offset + header_size:end]
+                yield (
+                    seq,
+                    ids[:sender_length].decode("utf-8"),
+                    ids[sender_length:].decode("utf-8"),
+                    amount,
+                    time_us,
+                    utc_offset
+                )
+                offset = end
+
+    # ---------- Logging ----------
+    def append(self, sender_id: str, receiver_id: str, amount: float, time_us: int, utc_offset: int = 0) -> int:
+        """
+        Buffer one stored transaction for the next group commit. Called
+        before the transaction is applied, so a record that cannot be
+        written leaves the sender's state untouched. `utc_offset` is the
+        timestamp's UTC offset in minutes.
+
+        Returns:
+            The record's sequence number (store it in the sender's state)
+
+        Raises:
+            ValueError: If an ID is longer than MAX_ID_BYTES
+        """
+        sender = sender_id.encode("utf-8")
+        receiver = receiver_id.encode("utf-8")
+        if len(sender) > MAX_ID_BYTES or len(receiver) > MAX_ID_BYTES:
+            raise ValueError(f"Account IDs are limited to {MAX_ID_BYTES} bytes")
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            body = _RECORD.pack(seq, time_us, amount, utc_offset, len(sender), len(receiver)) + sender + receiver
+            self._buffer += _CRC.pack(zlib.crc32(body))
+            self._buffer += body
+            if len(self._buffer) >= self.flush_bytes:
+                self._flush_needed.set()
+        return seq
+
+    def flush(self):
+        """Write buffered records to the active segment and fsync"""
+        with self._write_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+                segment = self._segment
+            if data and segment is not None:
+                segment.write(data)
+                segment.flush()
+                os.fsync(segment.fileno())
+
+    def _open_segment(self, first_seq: int):
+        """Start a new log segment whose first record will be first_seq"""
+        path = os.path.join(self.directory, _segment_name(first_seq))
+        self._segment = open(path, "ab")
+        if self._segment.tell() == 0:
+            self._segment.write(_SEGMENT_MAGIC)
+        self._segment_first_seq = first_seq
+
+    # ---------- Snapshots ----------
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Write a snapshot of every sender and drop log segments it covers.
+        Runs concurrently with scoring; each sender is packed under its own lock.
+        """
+        started = time.perf_counter()
+
+        # Rotate: everything up to snapshot_seq is in older segments
+        with self._write_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+                snapshot_seq = self._seq
+                old_segment = self._segment
+                self._open_segment(snapshot_seq + 1)
+            if old_segment is not None:
+                old_segment.write(data)
+                old_segment.flush()
+                os.fsync(old_segment.fileno())
+                old_segment.close()
+
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temp_path = path + ".tmp"
+        count = 0
+        with open(temp_path, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            f.write(_SNAPSHOT_HEADER.pack(snapshot_seq, 0))
+            for sender_id, blob in self.store.export_senders():
+                encoded = sender_id.encode("utf-8")
+                f.write(_SNAPSHOT_ENTRY.pack(len(encoded), len(blob)))
+                f.write(encoded)
+                f.write(blob)
+                count += 1
+            f.seek(len(_SNAPSHOT_MAGIC))
+            f.write(_SNAPSHOT_HEADER.pack(snapshot_seq, count))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        # Segments that start before the active one only hold records <= snapshot_seq
+        for first_seq, segment_path in self._segments():
+            if first_seq <= snapshot_seq:
+                os.remove(segment_path)
+
+        self.last_snapshot = {
+            "seconds": time.perf_counter() - started,
+            "senders": count,
+            "seq": snapshot_seq
+        }
+        return self.last_snapshot
+
+    # ---------- Background threads ----------
+    def start(self):
+        """Start the group-commit and snapshot threads"""
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._flush_loop, name="journal-flush", daemon=True),
+            threading.Thread(target=self._snapshot_loop, name="journal-snapshot", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self, snapshot: bool = True):
+        """
+        Stop background threads and flush remaining records.
+
+        Args:
+            snapshot: Also write a final snapshot, so the next start has no log to replay
+        """
+        self._stopping.set()
+        self._flush_needed.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if snapshot and self._segment is not None:
+            try:
+                self.snapshot()
+            except Exception as e:
+                # The log still holds every record: the next start replays it instead
+                logger.error(f"Final snapshot failed: {str(e)}")
+        self.flush()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _flush_loop(self):
+        while not self._stopping.is_set():
+            self._flush_needed.wait(self.fsync_interval)
+            self._flush_needed.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"Journal flush failed: {str(e)}")
+
+    def _snapshot_loop(self):
+        while not self._stopping.wait(self.snapshot_interval):
+            try:
+                stats = self.snapshot()
+                logger.info(f"Wrote snapshot of {stats['senders']} senders in {stats['seconds']:.2f}s")
+            except Exception as e:
+                # Keep the thread alive: the next interval retries
+                logger.error(f"Snapshot failed: {str(e)}")
@@ -0,0 +1,286 @@
+"""
+Metrics
+
+Prometheus-style counters, histograms and gauges, rendered in the text
+exposition format by the /metrics endpoint.
+
+Counters and histograms are sharded per thread: each thread updates its own
+plain dict without taking a lock, and a scrape sums the shards. Updates on
+the scoring hot path are therefore a few dict operations, and threads never
+contend. When a thread exits (threadpool workers come and go), its shard is
+folded into a shared one, so shards stay as many as live threads. Gauges are callbacks evaluated at scrape time.
+
+Factor latency is timed on one evaluation in every `factor_sample_every`, so
+the histograms keep their shape while most calls pay nothing for it.
+"""
+
+import itertools
+import threading
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Route template of the request being handled, set by MetricsMiddleware.
+# Work outside a request (CLI replay, journal restore) is labelled "internal".
+current_route: ContextVar[str] = ContextVar("current_route", default="internal")
+
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FACTOR_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+SETTLEMENT_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+
+
+class _ShardOwner:
+    """Held only by a thread's local storage: collected when the thread exits"""
+
+    __slots__ = ("__weakref__",)
+
+
+class _ShardedMetric:
+    """Per-thread dict shards, merged when scraped"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._local = threading.local()
+        # Live threads' shards by id, and the merged shards of threads that have exited
+        self._shards: Dict[int, dict] = {}
+        self._retired: dict = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            owner = self._local.owner = _ShardOwner()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(owner, self._retire, shard)
+            return shard
+
+    def _retire(self, shard: dict):
+        """Fold an exited thread's shard into the retired totals"""
+        with self._shards_lock:
+            self._shards.pop(id(shard), None)
+            self._merge(self._retired, shard)
+
+    def _merge(self, into: dict, shard: dict):
+        """Add a shard's values into another (the shard is not modified)"""
+        raise NotImplementedError
+
+    def _snapshots(self) -> List[dict]:
+        # dict.copy() is atomic under the GIL, so owners keep writing while we read
+        with self._shards_lock:
+            return [shard.copy() for shard in self._shards.values()] + [self._retired.copy()]
+
+    def _merged(self) -> dict:
+        merged: dict = {}
+        for shard in self._snapshots():
+            self._merge(merged, shard)
+        return merged
+
+    def _label_text(self, labels: Labels, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_ShardedMetric):
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        return self._merged()
+
+    def _merge(self, into: dict, shard: dict):
+        for labels, value in shard.items():
+            into[labels] = into.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{self._label_text(labels)} {_number(value)}")
+        return lines
+
+
+class Histogram(_ShardedMetric):
+    """Fixed-bucket histogram with labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...]):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Labels, value: float):
+        self.observe_many(((labels, value),))
+
+    def observe_many(self, observations: Iterable[Tuple[Labels, float]]):
+        """Record several (labels, value) pairs with one shard lookup"""
+        shard = self._shard()
+        buckets = self.buckets
+        for labels, value in observations:
+            row = shard.get(labels)
+            if row is None:
+                # One count per bucket, one for +Inf, then the running sum
+                row = shard[labels] = [0] * (len(buckets) + 1) + [0.0]
+            row[bisect_left(buckets, value)] += 1
+            row[-1] += value
+
+    def _merge(self, into: dict, shard: dict):
+        for labels, row in list(shard.items()):
+            total = into.get(labels)
+            if total is None:
+                into[labels] = list(row)
+            else:
+                for index, value in enumerate(row):
+                    total[index] += value
+
+    def render(self) -> List[str]:
+        merged: Dict[Labels, list] = self._merged()
+        lines = super().render()
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, row in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_number(row[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time (omitted while it returns None)"""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Optional[float]]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        value = self.read()
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {_number(value)}"]
+
+
+class FraudMetrics:
+    """All instruments exposed by the API, plus the hooks the services call"""
+
+    def __init__(self, factor_sample_every: int = 16):
+        self.factor_sample_every = max(1, factor_sample_every)
+        self._evaluations = itertools.count()
+
+        self.requests = Counter(
+            "http_requests_total", "HTTP requests handled", ("route", "method", "status")
+        )
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "HTTP request latency", ("route", "method"), REQUEST_BUCKETS
+        )
+        self.decisions = Counter(
+            "fraud_decisions_total", "Fraud decisions made, by route and decision", ("route", "decision")
+        )
+        self.factor_seconds = Histogram(
+            "fraud_factor_duration_seconds",
+            f"Latency of each factor stage (1 in {self.factor_sample_every} evaluations sampled)",
+            ("factor",),
+            FACTOR_BUCKETS
+        )
+        self.settlement_seconds = Histogram(
+            "payment_settlement_duration_seconds", "Time from queueing a payment to its settlement",
+            ("outcome",), SETTLEMENT_BUCKETS
+        )
+        self.gauges: List[Gauge] = []
+        # Callback returning {"senders", "transactions", "bytes", "interned_receivers"} for the state gauges, plus
+        # eviction counts ("evicted_budget", "evicted_idle", "spilled", "reloaded") when bounded
+        self._state_stats: Optional[Callable[[], Dict[str, int]]] = None
+
+    # ---------- Hot-path hooks ----------
+    def sample_factors(self) -> bool:
+        """True for the evaluations whose factor stages should be timed"""
+        return next(self._evaluations) % self.factor_sample_every == 0
+
+    def observe_factors(self, timings: List[Tuple[Labels, float]]):
+        """Record one sampled evaluation's ((factor,), seconds) stage timings"""
+        self.factor_seconds.observe_many(timings)
+
+    def record_decision(self, decision: str, count: int = 1):
+        # Counter.inc inlined: this runs on every evaluation
+        shard = self.decisions._shard()
+        key = (current_route.get(), decision)
+        shard[key] = shard.get(key, 0) + count
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float):
+        self.requests.inc((route, method, str(status)))
+        self.request_seconds.observe((route, method), seconds)
+
+    def observe_settlement(self, seconds: float, settled: bool):
+        self.settlement_seconds.observe(("settled" if settled else "failed",), seconds)
+
+    # ---------- Gauges ----------
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], Optional[float]]):
+        self.gauges.append(Gauge(name, help_text, read))
+
+    def track_state(self, stats: Callable[[], Dict[str, int]]):
+        """Report detector state size from `stats` (called once per scrape)"""
+        self._state_stats = stats
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in (self.requests, self.request_seconds, self.decisions, self.factor_seconds,
+                       self.settlement_seconds):
+            lines.extend(metric.render())
+
+        if self._state_stats is not None:
+            stats = self._state_stats()
+            for key, name, help_text in (
+                ("senders", "fraud_tracked_senders", "Senders with stored detector state"),
+                ("transactions", "fraud_stored_transactions", "Transactions held in sender histories"),
+                ("bytes", "fraud_state_estimated_bytes", "Estimated size of sender state in bytes"),
+                ("interned_receivers", "fraud_interned_receivers", "Receiver IDs interned for senders in memory"),
+            ):
+                if key in stats:
+                    lines.extend(Gauge(name, help_text, lambda: stats[key]).render())
+            if "evicted_budget" in stats:
+                lines.append("# HELP fraud_evicted_senders_total Senders evicted from memory, by reason")
+                lines.append("# TYPE fraud_evicted_senders_total counter")
+                for reason in ("budget", "idle"):
+                    lines.append(f'fraud_evicted_senders_total{{reason="{reason}"}} {stats["evicted_" + reason]}')
+            if "spilled" in stats:
+                lines.extend(Gauge("fraud_spilled_senders", "Evicted senders held in the spill file",
+                                   lambda: stats["spilled"]).render())
+                lines.append("# HELP fraud_reloaded_senders_total Spilled senders loaded back into memory")
+                lines.append("# TYPE fraud_reloaded_senders_total counter")
+                lines.append(f"fraud_reloaded_senders_total {stats['reloaded']}")
+
+        for gauge in self.gauges:
+            lines.extend(gauge.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
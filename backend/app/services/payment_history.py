@@ -0,0 +1,260 @@
+"""
+Payment History
+
+Bounded, indexed in-memory payment history used by the memory state backend.
+
+Every payment gets a sequence number when first stored. Sequence order is
+insertion order, which is also processed-time order, so:
+
+- entries expire (TTL) and are evicted (size cap) from the oldest end in
+  O(1) amortized time;
+- secondary indexes by sender and by status are sorted lists of sequence
+  numbers, appended at the tail and trimmed at the head;
+- the processed-time index is a sorted list of processed_at strings aligned
+  with the sequence numbers, searched with bisect.
+
+Lookups by payment_id are a dict access. A listing page costs O(log n) to
+locate plus time proportional to the page size, never the store size.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.models.schemas import PaymentResult
+
+
+class _SeqIndex:
+    """Sorted sequence numbers with an O(1) trimmed head"""
+
+    __slots__ = ("seqs", "head")
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        # Entries before `head` have been removed
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.head
+
+    def add(self, seq: int):
+        if not self.seqs or seq > self.seqs[-1]:
+            self.seqs.append(seq)
+        else:
+            # Re-indexed after a status change: recent payments land near the tail
+            insort(self.seqs, seq, self.head)
+
+    def discard(self, seq: int):
+        seqs = self.seqs
+        if self.head < len(seqs) and seqs[self.head] == seq:
+            self.head += 1
+            # Compact once half the list is dead: amortized O(1), at most 2x the live size
+            if self.head * 2 >= len(seqs):
+                del seqs[:self.head]
+                self.head = 0
+            return
+        i = bisect_left(seqs, seq, self.head)
+        if i < len(seqs) and seqs[i] == seq:
+            del seqs[i]
+
+    def descending(self, lower: int, upper: int) -> Iterator[int]:
+        """Sequence numbers in [lower, upper), newest first"""
+        seqs = self.seqs
+        lo = bisect_left(seqs, lower, self.head)
+        for i in range(bisect_left(seqs, upper, lo) - 1, lo - 1, -1):
+            yield seqs[i]
+
+
+class PaymentHistory:
+    """
+    Payment store with TTL and size-based eviction.
+
+    Thread-safe: payments are written from request handlers and from the
+    settlement callback.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_s: float = 86_400):
+        """
+        Args:
+            max_entries: Maximum payments kept; the oldest are evicted first (0 = unbounded)
+            ttl_s: Seconds a payment is kept after it is first stored (0 = forever)
+        """
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+
+        # Format: {"payment_id": [seq, PaymentResult]}
+        self._entries: Dict[str, list] = {}
+        # Per-sequence columns; list index = seq - _base, live from _head
+        self._ids: List[str] = []
+        self._stored_at: List[float] = []
+        self._processed_at: List[str] = []
+        self._base = 0
+        self._head = 0
+        # Secondary indexes. Format: {"sender_id" / "status": _SeqIndex}
+        self._by_sender: Dict[str, _SeqIndex] = {}
+        self._by_status: Dict[str, _SeqIndex] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, result: PaymentResult):
+        """Insert a payment, or replace it by payment_id keeping its position"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(result.payment_id)
+            if entry is not None:
+                seq, previous = entry
+                entry[1] = result
+                if previous.sender_id != result.sender_id:
+                    self._unindex(self._by_sender, previous.sender_id, seq)
+                    self._index(self._by_sender, result.sender_id, seq)
+                if previous.status != result.status:
+                    self._unindex(self._by_status, previous.status, seq)
+                    self._index(self._by_status, result.status, seq)
+                return
+
+            seq = self._base + len(self._ids)
+            self._entries[result.payment_id] = [seq, result]
+            self._ids.append(result.payment_id)
+            self._stored_at.append(time.monotonic())
+            # Kept non-decreasing so the time index stays sorted even if the clock steps back
+            processed_at = result.processed_at
+            if self._processed_at and processed_at < self._processed_at[-1]:
+                processed_at = self._processed_at[-1]
+            self._processed_at.append(processed_at)
+            self._index(self._by_sender, result.sender_id, seq)
+            self._index(self._by_status, result.status, seq)
+
+            if self.max_entries:
+                while len(self._entries) > self.max_entries:
+                    self._evict_oldest()
+
+    def get(self, payment_id: str) -> Optional[PaymentResult]:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(payment_id)
+            return entry[1] if entry is not None else None
+
+    def page(
+        self,
+        sender_id: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[PaymentResult], Optional[str]]:
+        """
+        One page of payments, newest first.
+
+        Args:
+            sender_id: Only this sender's payments
+            status: Only payments currently in this status
+            since: Only payments processed at or after this ISO time (UTC, "Z")
+            until: Only payments processed before this ISO time
+            cursor: next_cursor returned with the previous page
+            limit: Maximum payments returned
+
+        Returns:
+            (payments, next_cursor), next_cursor None on the last page
+        """
+        upper = parse_cursor(cursor)
+        with self._lock:
+            self._expire()
+            lower = self._base + self._head
+            end = self._base + len(self._ids)
+            if since is not None:
+                lower = self._base + bisect_left(self._processed_at, since, self._head)
+            if until is not None:
+                end = min(end, self._base + bisect_left(self._processed_at, until, self._head))
+            if upper is not None:
+                end = min(end, upper)
+
+            # Walk the most selective index; a sender + status query filters the sender's payments
+            if sender_id is not None:
+                index = self._by_sender.get(sender_id)
+                candidates = index.descending(lower, end) if index is not None else iter(())
+            elif status is not None:
+                index = self._by_status.get(status)
+                candidates = index.descending(lower, end) if index is not None else iter(())
+                status = None
+            else:
+                candidates = iter(range(end - 1, lower - 1, -1))
+
+            payments: List[PaymentResult] = []
+            last_seq = None
+            for seq in candidates:
+                result = self._entries[self._ids[seq - self._base]][1]
+                if status is not None and result.status != status:
+                    continue
+                if len(payments) == limit:
+                    return payments, str(last_seq)
+                payments.append(result)
+                last_seq = seq
+            return payments, None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._base += len(self._ids)
+            self._ids.clear()
+            self._stored_at.clear()
+            self._processed_at.clear()
+            self._head = 0
+            self._by_sender.clear()
+            self._by_status.clear()
+
+    # ========== Internal ==========
+
+    @staticmethod
+    def _index(indexes: Dict[str, _SeqIndex], key: str, seq: int):
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = _SeqIndex()
+        index.add(seq)
+
+    @staticmethod
+    def _unindex(indexes: Dict[str, _SeqIndex], key: str, seq: int):
+        index = indexes.get(key)
+        if index is None:
+            return
+        index.discard(seq)
+        if not index:
+            # Drop empty per-sender indexes so evicted senders free their memory
+            del indexes[key]
+
+    def _expire(self):
+        """Evict payments older than the TTL (oldest first, stops at the first live one)"""
+        if not self.ttl_s:
+            return
+        cutoff = time.monotonic() - self.ttl_s
+        while self._head < len(self._ids) and self._stored_at[self._head] < cutoff:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        head = self._head
+        seq = self._base + head
+        _, result = self._entries.pop(self._ids[head])
+        self._unindex(self._by_sender, result.sender_id, seq)
+        self._unindex(self._by_status, result.status, seq)
+
+        self._ids[head] = None
+        self._head = head = head + 1
+        if head * 2 >= len(self._ids):
+            del self._ids[:head]
+            del self._stored_at[:head]
+            del self._processed_at[:head]
+            self._base += head
+            self._head = 0
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decode a payment page cursor (a sequence number / rowid)"""
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise ValueError(f"Invalid payment cursor '{cursor}'")
@@ -5,13 +5,24 @@ Handles payment processing with integrated fraud detection.
 Simulates payment execution for demonstration purposes.
 """
 
+import asyncio
 import uuid
 import time
-from datetime import datetime
-from typing import Dict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
-from app.models.schemas import TransactionRequest, PaymentResult
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.schemas import TransactionRequest, TransactionResponse, PaymentResult
+from app.services.evaluation_context import parse_timestamp
 from app.services.fraud_detector import FraudDetector
+from app.services.idempotency import IdempotencyCache
+from app.services.metrics import FraudMetrics
+from app.services.profiling import timed_phase
+from app.services.scoring_pool import ScoringPool
+from app.services.settlement import SettlementQueue
+from app.services.state_store import StateStore
 
 
 class PaymentService:
@@ -21,55 +32,86 @@ class PaymentService:
     Workflow:
     1. Run fraud detection on transaction
     2. If high risk (block) -> Reject payment
-    3. If low/medium risk (approve/warn) -> Process payment
-    4. Return payment result with unique ID
+    3. If low/medium risk (approve/warn) -> Queue payment for settlement
+    4. Return payment result with unique ID (status "pending" until settled)
     """
     
-    _instance = None
-    
-    def __new__(cls):
-        """Singleton pattern to maintain payment history"""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
-    
-    def __init__(self):
-        """Initialize payment service with fraud detector"""
-        if self._initialized:
-            return
-            
-        self.fraud_detector = FraudDetector()
-        self.payment_history: Dict[str, PaymentResult] = {}
-        self._initialized = True
+    def __init__(self, fraud_detector: FraudDetector | None = None, store: StateStore | None = None,
+                 metrics: FraudMetrics | None = None, scoring_pool: ScoringPool | None = None):
+        """
+        Initialize payment service with fraud detector.
+        
+        Args:
+            fraud_detector: Detector to score payments with (shared with the
+                evaluation routes when provided through dependency injection)
+            store: State store holding payment history (defaults to the detector's store)
+            metrics: Receives settlement latencies when provided
+            scoring_pool: Worker processes to score payments in; process_payment_async
+                uses it instead of the detector when provided
+        """
+        self.fraud_detector = fraud_detector if fraud_detector is not None else FraudDetector()
+        self.scoring_pool = scoring_pool
+        self.store = store if store is not None else self.fraud_detector.store
+        self.settlement = SettlementQueue(
+            on_settled=self._complete_settlement_async,
+            workers=settings.settlement_workers,
+            delay_seconds=settings.settlement_delay_ms / 1000,
+            observe=metrics.observe_settlement if metrics is not None else None
+        )
+        # Idempotency-Key -> payment created under it
+        self.idempotency = IdempotencyCache(settings.idempotency_max_entries, settings.idempotency_ttl_s)
     
-    def process_payment(self, transaction: TransactionRequest) -> PaymentResult:
+    def process_payment(self, transaction: TransactionRequest,
+                        fraud_check: TransactionResponse | None = None) -> PaymentResult:
         """
         Process a payment with fraud detection.
         
+        Must be called from the event loop: approved payments are queued for
+        asynchronous settlement and returned immediately with status "pending".
+        Use wait_for_settlement() or get_payment() for the final status.
+        The payment is stored on the calling thread; request handlers use
+        process_payment_async(), which stores it in the threadpool.
+        
         Args:
             transaction: Transaction details to process
+            fraud_check: Assessment of the transaction when already scored
+                (scored with the in-process detector when omitted)
             
         Returns:
             PaymentResult with status and details
         """
         # Step 1: Run fraud detection
-        fraud_check = self.fraud_detector.evaluate_transaction(
-            amount=transaction.amount,
-            sender_id=transaction.sender_id,
-            receiver_id=transaction.receiver_id,
-            timestamp=transaction.timestamp
-        )
+        if fraud_check is None:
+            with timed_phase("scoring"):
+                fraud_check = self.fraud_detector.evaluate_transaction(
+                    amount=transaction.amount,
+                    sender_id=transaction.sender_id,
+                    receiver_id=transaction.receiver_id,
+                    timestamp=transaction.timestamp
+                )
+        
+        result = self._payment_result(transaction, fraud_check)
+        
+        # Store in payment history
+        with timed_phase("payment-store"):
+            self.store.put_payment(result)
         
+        self._queue_settlement(result)
+        return result
+    
+    def _payment_result(self, transaction: TransactionRequest, fraud_check: TransactionResponse) -> PaymentResult:
+        """Build the payment for a scored transaction: blocked, or pending settlement"""
         # Generate unique identifiers
         payment_id = str(uuid.uuid4())
         transaction_id = f"txn_{int(time.time() * 1000)}"
-        processed_at = datetime.utcnow().isoformat() + "Z"
+        # Fixed width so processed_at strings sort chronologically
+        processed_at = datetime.utcnow().isoformat(timespec="microseconds") + "Z"
         
-        # Step 2: Determine if payment should be blocked
+        # Step 2: Determine if payment should be blocked (results are built
+        # from validated request fields and detector output: no re-validation)
         if fraud_check.decision == "block":
             # High risk - reject payment
-            result = PaymentResult(
+            result = PaymentResult.trusted(
                 payment_id=payment_id,
                 status="blocked",
                 transaction_id=transaction_id,
@@ -83,13 +125,10 @@ class PaymentService:
                 flags=fraud_check.flags
             )
         else:
-            # Low or medium risk - process payment
-            # Simulate payment processing delay (0.5-1 second)
-            time.sleep(0.5)
-            
-            result = PaymentResult(
+            # Low or medium risk - queue payment for settlement
+            result = PaymentResult.trusted(
                 payment_id=payment_id,
-                status="success",
+                status="pending",
                 transaction_id=transaction_id,
                 sender_id=transaction.sender_id,
                 receiver_id=transaction.receiver_id,
@@ -97,18 +136,128 @@ class PaymentService:
                 risk_score=fraud_check.risk_score,
                 decision=fraud_check.decision,
                 processed_at=processed_at,
-                message="Payment processed successfully",
+                message="Payment accepted and awaiting settlement",
                 flags=fraud_check.flags if fraud_check.flags else None
             )
         
-        # Store in payment history
-        self.payment_history[payment_id] = result
+        return result
+    
+    def _queue_settlement(self, result: PaymentResult):
+        """Queue a stored pending payment for settlement (on the event loop)"""
+        if result.status == "pending":
+            with timed_phase("settlement-queue"):
+                self.settlement.submit(result.payment_id)
+    
+    async def process_payment_async(self, transaction: TransactionRequest) -> PaymentResult:
+        """
+        process_payment, scored in the scoring pool when there is one (else in
+        the threadpool) and stored in the threadpool: a SQLite store can wait
+        on its lock, which must not stall the event loop.
+        """
+        with timed_phase("scoring"):
+            if self.scoring_pool is not None:
+                fraud_check = await self.scoring_pool.evaluate_transaction_async(
+                    amount=transaction.amount,
+                    sender_id=transaction.sender_id,
+                    receiver_id=transaction.receiver_id,
+                    timestamp=transaction.timestamp
+                )
+            else:
+                # Off the event loop: a shared state store can wait on its lock
+                fraud_check = await run_in_threadpool(
+                    self.fraud_detector.evaluate_transaction,
+                    amount=transaction.amount,
+                    sender_id=transaction.sender_id,
+                    receiver_id=transaction.receiver_id,
+                    timestamp=transaction.timestamp
+                )
         
+        result = self._payment_result(transaction, fraud_check)
+        with timed_phase("payment-store"):
+            await run_in_threadpool(self.store.put_payment, result)
+        self._queue_settlement(result)
         return result
     
+    async def process_payment_once(self, transaction: TransactionRequest,
+                                   idempotency_key: str) -> Tuple[PaymentResult, bool]:
+        """
+        Process a payment at most once per idempotency key.
+        
+        A repeated key returns the payment created by the first request (with
+        its current status) without scoring the transaction again; a repeat
+        that arrives while the first request is still in flight waits for it.
+        A request that fails with an error or is cancelled does not consume its key.
+        
+        Args:
+            transaction: Transaction details to process
+            idempotency_key: Client-chosen key identifying this payment attempt
+            
+        Returns:
+            (PaymentResult, replayed), replayed True when the key was seen before
+            
+        Raises:
+            IdempotencyKeyReused: If the key was used for a different transaction
+        """
+        fingerprint = (transaction.amount, transaction.sender_id, transaction.receiver_id, transaction.timestamp)
+        future = self.idempotency.get(idempotency_key, fingerprint)
+        if future is not None:
+            original = await asyncio.shield(future)
+            # Latest status; the original once it has left payment history
+            latest = await run_in_threadpool(self.store.get_payment, original.payment_id)
+            return latest or original, True
+        
+        future = self.idempotency.begin(idempotency_key, fingerprint)
+        try:
+            result = await self.process_payment_async(transaction)
+        except BaseException as e:
+            # Cancelled too (client gone): the key must not stay in flight, or retries wait forever
+            if not isinstance(e, Exception):
+                e = RuntimeError("The original request with this idempotency key was cancelled")
+            self.idempotency.abandon(idempotency_key, future, e)
+            raise
+        future.set_result(result)
+        return result, False
+    
+    async def wait_for_settlement(self, payment_id: str, timeout: float) -> PaymentResult | None:
+        """
+        Wait up to `timeout` seconds for a pending payment to settle.
+        
+        Args:
+            payment_id: Unique payment identifier
+            timeout: Maximum time to wait, in seconds
+            
+        Returns:
+            Latest PaymentResult (still "pending" if the timeout expired), None if unknown
+        """
+        future = self.settlement.pending_future(payment_id)
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                pass
+        
+        return await run_in_threadpool(self.store.get_payment, payment_id)
+    
+    async def _complete_settlement_async(self, payment_id: str, settled: bool):
+        """_complete_settlement in the threadpool (called by settler tasks on the event loop)"""
+        await run_in_threadpool(self._complete_settlement, payment_id, settled)
+    
+    def _complete_settlement(self, payment_id: str, settled: bool):
+        """Record the final status of a settled payment"""
+        result = self.store.get_payment(payment_id)
+        if result is None:
+            return
+        
+        if settled:
+            update = {"status": "success", "message": "Payment processed successfully"}
+        else:
+            update = {"status": "failed", "message": "Payment settlement failed"}
+        
+        self.store.put_payment(result.model_copy(update=update))
+    
     def get_payment(self, payment_id: str) -> PaymentResult | None:
         """
-        Retrieve payment details by ID.
+        Retrieve payment details by ID (reads the store: call it off the event loop).
         
         Args:
             payment_id: Unique payment identifier
@@ -116,13 +265,52 @@ class PaymentService:
         Returns:
             PaymentResult if found, None otherwise
         """
-        return self.payment_history.get(payment_id)
+        return self.store.get_payment(payment_id)
     
-    def get_all_payments(self) -> list[PaymentResult]:
+    def list_payments(
+        self,
+        sender_id: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[PaymentResult], Optional[str]]:
         """
-        Get all processed payments.
+        Get one page of stored payments, newest first (reads the store: call
+        it off the event loop).
         
+        Args:
+            sender_id: Only this sender's payments
+            status: Only payments currently in this status
+            since: Only payments processed at or after this ISO timestamp
+            until: Only payments processed before this ISO timestamp
+            cursor: next_cursor from the previous page
+            limit: Maximum payments per page
+            
         Returns:
-            List of all payment results
+            (payments, next_cursor), next_cursor None on the last page
+            
+        Raises:
+            ValueError: If a timestamp or the cursor is malformed
         """
-        return list(self.payment_history.values())
+        return self.store.list_payments(
+            sender_id=sender_id,
+            status=status,
+            since=_processed_at_bound(since),
+            until=_processed_at_bound(until),
+            cursor=cursor,
+            limit=limit
+        )
+
+
+def _processed_at_bound(timestamp: Optional[str]) -> Optional[str]:
+    """Normalise an ISO timestamp to the UTC processed_at format for comparison"""
+    if timestamp is None:
+        return None
+    parsed = parse_timestamp(timestamp)
+    if parsed is None:
+        raise ValueError(f"Invalid timestamp '{timestamp}'")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec="microseconds") + "Z"
@@ -0,0 +1,190 @@
+"""
+Profiling
+
+Two tools for finding out where time goes:
+
+- RequestTimer: per-request breakdown, returned as a Server-Timing header
+  when a request opts in (see ServerTimingMiddleware). Services add phases
+  to the timer of the current request through the `current_timer`
+  contextvar, which is None (and costs one lookup) for every other request.
+- SamplingProfiler: background thread that samples the stacks of all
+  threads every few milliseconds and periodically writes the aggregated
+  counts as folded stacks ("frame;frame;frame count" per line), the input
+  format of flamegraph.pl, speedscope and most flame-graph viewers.
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Timer of the request being handled, when it asked for Server-Timing
+current_timer: ContextVar[Optional["RequestTimer"]] = ContextVar("current_timer", default=None)
+
+# Shared no-op context for untimed requests
+_UNTIMED = nullcontext()
+
+
+class RequestTimer:
+    """Named phases of one request, rendered as a Server-Timing header"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Set by server_timed: before the handler is request parsing and
+        # validation, after it the framework's response handling
+        self.handler_started: Optional[float] = None
+        self.handler_finished: Optional[float] = None
+        self.phases: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    def add_factors(self, timings: Iterable[Tuple[Tuple[str, ...], float]]):
+        """Add ((factor,), seconds) stage timings as factor-<name> phases"""
+        for (name,), seconds in timings:
+            self.phases.append((f"factor-{name}", seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def header(self, response_started: float) -> str:
+        """
+        Server-Timing value (durations in milliseconds)
+
+        Args:
+            response_started: perf_counter() when the response headers were sent
+        """
+        entries = []
+        if self.handler_started is not None:
+            entries.append(("validation", self.handler_started - self.started))
+        entries.extend(self.phases)
+        if self.handler_finished is not None:
+            entries.append(("response", response_started - self.handler_finished))
+        entries.append(("total", response_started - self.started))
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in entries)
+
+
+def timed_phase(name: str):
+    """Time a block into the current request's timer (no-op when there is none)"""
+    timer = current_timer.get()
+    return _UNTIMED if timer is None else timer.phase(name)
+
+
+def server_timed(endpoint):
+    """Route decorator marking where the handler starts and ends for RequestTimer"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timer = current_timer.get()
+        if timer is None:
+            return await endpoint(*args, **kwargs)
+        timer.handler_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timer.handler_finished = time.perf_counter()
+    return wrapper
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running server.
+
+    Every `interval_ms` the stacks of all other threads are captured with
+    sys._current_frames() and counted by their folded form. Every `flush_s`
+    the counts so far are written to `path` (replaced atomically), so the
+    file always holds a complete profile since start. Threads idling in the
+    event loop or a queue show up as wide frames under their wait call;
+    zoom into the scoring frames in the viewer. The sampler needs the GIL,
+    so under CPU load samples arrive about every sys.getswitchinterval()
+    (5 ms by default) rather than every interval.
+    """
+
+    def __init__(self, path: str, interval_ms: int = 10, flush_s: int = 60):
+        """
+        Args:
+            path: Folded-stack output file
+            interval_ms: Milliseconds between samples
+            flush_s: Seconds between writes of the aggregated profile
+        """
+        self.path = path
+        self.interval = max(1, interval_ms) / 1000
+        self.flush_s = max(1, flush_s)
+        self.samples = 0
+        self._counts: Dict[str, int] = {}
+        self._labels: Dict[object, str] = {}
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start sampling in a background thread"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler writing to {self.path} every {self.flush_s}s")
+
+    def close(self):
+        """Stop sampling and write the final profile"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.write()
+
+    def sample(self):
+        """Record the current stack of every thread except the profiler's own"""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts = self._counts
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = [names.get(ident, "thread")]
+            frames = []
+            while frame is not None:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.extend(reversed(frames))
+            folded = ";".join(stack)
+            counts[folded] = counts.get(folded, 0) + 1
+        self.samples += 1
+
+    def write(self):
+        """Write the aggregated folded stacks to `path`"""
+        lines = [f"{stack} {count}\n" for stack, count in sorted(self._counts.items())]
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.error(f"Writing profile to {self.path} failed: {str(e)}")
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_s
+        while not self._stopping.wait(self.interval):
+            self.sample()
+            if time.monotonic() >= next_flush:
+                self.write()
+                next_flush = time.monotonic() + self.flush_s
+
+    def _label(self, code) -> str:
+        # One label per code object, e.g. fraud_detector:FraudDetector._evaluate_context
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = self._labels[code] = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+        return label
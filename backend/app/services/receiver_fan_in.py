@@ -0,0 +1,170 @@
+"""
+Receiver Fan-In
+
+Reverse index from receiver to the senders that recently paid it, answering
+"how many distinct senders paid this receiver in the last N minutes" without
+scanning any sender's history. Many unrelated senders paying one fresh
+account in a short window is the typical pattern of a money-mule account.
+
+Time is split into buckets (window / BUCKETS wide) of transaction time,
+like the velocity checks. Times ahead of the server clock are clamped to
+it, so a request dated years ahead cannot pin a receiver's senders in a
+bucket that never expires. Each receiver keeps a {sender: newest bucket}
+map, and one queue of (bucket, receiver, sender) events, in arrival order,
+drives expiry for all receivers: an expired event removes its sender
+unless the sender paid the receiver again since, and a receiver with no
+senders left is dropped. Every event is queued once and expired once, a
+few per stored payment, so the cost is O(1) amortized with no pauses.
+
+Counts are taken against each payment's own window: only senders whose
+bucket falls within `window_s` of the payment's time are counted, so
+expiry lag never inflates them and a backdated payment is judged by its
+own time. Payments older than the window of the newest one seen are not
+recorded.
+
+Receivers paid for `established_s` without a window-long gap (a steady
+merchant) are exempt: their count is 0. Mule accounts are the fresh ones.
+
+Memory is bounded:
+- per receiver, at most MAX_SENDERS senders are tracked (the count saturates
+  there, far above any threshold worth scoring), so a large merchant costs
+  at most MAX_SENDERS entries plus MAX_SENDERS * BUCKETS queued events
+- at most `max_receivers` receivers are tracked at once; while at the limit,
+  receivers not yet tracked are ignored until expiry frees room
+
+The index is per process and starts empty on restart. With a scoring pool
+each worker only sees the senders of its partition, and with several API
+processes each sees its own requests, so counts are a fraction of the
+receiver's real fan-in there.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Buckets per window (expiry granularity: window / BUCKETS)
+BUCKETS = 60
+# Distinct senders tracked per receiver; counts saturate here
+MAX_SENDERS = 256
+# Expired events removed at most per stored payment
+_EXPIRE_BATCH = 16
+
+
+class ReceiverFanIn:
+    """Distinct recent senders per receiver, in bounded memory"""
+
+    def __init__(self, window_s: int = 0, threshold: int = 10, max_receivers: int = 100_000,
+                 established_s: int = 3600):
+        """
+        Args:
+            window_s: Length of the fan-in window in seconds (0 disables the index)
+            threshold: Distinct senders in the window at which fan-in is scored
+            max_receivers: Receivers tracked at most
+            established_s: Receivers paid continuously this long are not scored (0 scores all)
+        """
+        self.window_s = window_s
+        self.threshold = threshold
+        self.max_receivers = max(1, max_receivers)
+        self._bucket_us = max(1, window_s * 1_000_000 // BUCKETS)
+        self._established_buckets = established_s * 1_000_000 // self._bucket_us if established_s else 0
+        # Receiver -> {sender: newest bucket it paid in}
+        self._receivers: Dict[str, Dict[str, int]] = {}
+        # Receiver -> [first, last] bucket of its current run of payments without a window-long gap
+        self._runs: Dict[str, List[int]] = {}
+        # Flat bucket, receiver, sender triples, oldest first (no tuple per event:
+        # long-lived tuples would make the garbage collector run more often)
+        self._events: deque = deque()
+        self._latest = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._receivers)
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_s > 0
+
+    def count(self, receiver_id: str, sender_id: str, time_us: Optional[int]) -> int:
+        """
+        Distinct senders that paid receiver_id within the window ending at
+        time_us, including sender_id (so a payment is counted before it is
+        stored). Capped at MAX_SENDERS; 0 when disabled, time_us is None or
+        the receiver is established.
+        """
+        if time_us is None or not self.enabled:
+            return 0
+        with self._lock:
+            senders = self._receivers.get(receiver_id)
+            if senders is None:
+                return 1
+            bucket = self._bucket(time_us)
+            horizon = bucket - BUCKETS + 1
+            first, last = self._runs[receiver_id]
+            if self._established_buckets and last >= horizon and bucket - first >= self._established_buckets:
+                return 0
+            recent = sum(1 for paid in senders.values() if paid >= horizon)
+            if senders.get(sender_id, horizon - 1) < horizon:
+                recent += 1
+        return min(recent, MAX_SENDERS)
+
+    def add(self, receiver_id: str, sender_id: str, time_us: int):
+        """Record a stored payment from sender_id to receiver_id"""
+        if not self.enabled:
+            return
+        with self._lock:
+            bucket = self._bucket(time_us)
+            if bucket > self._latest:
+                self._latest = bucket
+            horizon = self._latest - BUCKETS + 1
+
+            receivers = self._receivers
+            events = self._events
+            senders = receivers.get(receiver_id)
+            if bucket < horizon:
+                pass  # older than the window of the newest payment: would expire at once
+            elif senders is None:
+                if len(receivers) < self.max_receivers:
+                    receivers[receiver_id] = {sender_id: bucket}
+                    self._runs[receiver_id] = [bucket, bucket]
+                    events.append(bucket)
+                    events.append(receiver_id)
+                    events.append(sender_id)
+            else:
+                run = self._runs[receiver_id]
+                if bucket - run[1] >= BUCKETS:
+                    # Quiet for a whole window: a new run starts
+                    run[0] = bucket
+                if bucket > run[1]:
+                    run[1] = bucket
+                if senders.get(sender_id, horizon - 1) < bucket and (sender_id in senders or len(senders) < MAX_SENDERS):
+                    senders[sender_id] = bucket
+                    events.append(bucket)
+                    events.append(receiver_id)
+                    events.append(sender_id)
+
+            # Expire a few of the oldest events (inlined: this runs on every stored payment).
+            # Backdated events queued behind newer ones expire once they reach the front
+            for _ in range(_EXPIRE_BATCH):
+                if not events or events[0] >= horizon:
+                    break
+                expired = events.popleft()
+                receiver_id = events.popleft()
+                sender_id = events.popleft()
+                senders = receivers.get(receiver_id)
+                if senders is not None and senders.get(sender_id) == expired:
+                    del senders[sender_id]
+                    if not senders:
+                        del receivers[receiver_id]
+                        del self._runs[receiver_id]
+
+    def clear(self):
+        with self._lock:
+            self._receivers.clear()
+            self._runs.clear()
+            self._events.clear()
+            self._latest = 0
+
+    def _bucket(self, time_us: int) -> int:
+        """Bucket of a transaction time, clamped to the server clock"""
+        return min(time_us, time.time_ns() // 1000) // self._bucket_us
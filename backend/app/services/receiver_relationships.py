@@ -0,0 +1,236 @@
+"""
+Receiver Relationships
+
+Bounded record of the receivers one sender has paid, answering the two
+questions the recipient factor asks: "is this receiver known" and "how many
+known receivers". It replaces an unbounded {receiver_id: count} dict.
+
+- Top-K counters (space-saving): up to TOP_K receivers with transaction
+  counts, as interned IDs in typed arrays. While the sender has paid at most
+  TOP_K distinct receivers the counters are exact and nothing else is kept,
+  so the usual sender answers exactly as the dict did.
+- Membership filter: past TOP_K, every receiver also goes into a small Bloom
+  filter sized for FILTER_CAPACITY receivers. When it fills up it becomes
+  the previous generation and a fresh one starts; the generation before
+  that is dropped.
+
+Memory per sender is bounded: TOP_K counters plus two FILTER_BYTES filters
+(about 2.4 KB of heap), however many receivers the sender pays.
+
+Error bounds of the "new recipient" check, once past TOP_K receivers:
+
+- A receiver paid before is always reported known while it is a top-K
+  receiver or was first paid within the last FILTER_CAPACITY (at least) new
+  receivers; older ones are forgotten and reported new, like transactions
+  that fall out of the history ring.
+- A new receiver is wrongly reported known with probability at most
+  1 - (1 - p)^2 (one test per generation), where p is the false-positive
+  rate of a full generation: about 0.4% for FILTER_CAPACITY receivers in
+  FILTER_BYTES with FILTER_HASHES bits per receiver (measured with
+  benchmarks/bench_relationships.py), so under 0.8% in the worst case.
+- The known-receiver count is exact up to TOP_K. Past it, false positives
+  are not counted and forgotten receivers count again when paid again, so
+  it is an estimate; the factor only compares it against small thresholds.
+  Counts of top-K receivers overestimate by at most (transactions / TOP_K),
+  the classic space-saving bound.
+"""
+
+import hashlib
+import sys
+from array import array
+from typing import Optional, Tuple
+
+from app.services.sender_history import ReceiverInterner
+
+# Receivers counted per sender (exact tracking up to this many)
+TOP_K = 32
+# Receivers per filter generation, and its size: 16 bits per receiver
+FILTER_CAPACITY = 256
+FILTER_BYTES = 512
+# Bits set per receiver, all within one 64-bit word of the filter
+FILTER_HASHES = 5
+
+_FILTER_WORDS = FILTER_BYTES // 8
+
+
+class ReceiverFilter:
+    """
+    Register-blocked Bloom filter over receiver IDs: each ID sets a few bits
+    of a single 64-bit word, so a test is one word load and a mask compare.
+    IDs are hashed as strings, so a filter can be stored and reloaded in
+    another process.
+    """
+
+    __slots__ = ("count", "_words")
+
+    def __init__(self, words: Optional[array] = None, count: int = 0):
+        self._words = words if words is not None else array("Q", bytes(FILTER_BYTES))
+        # Receivers added (IDs that looked present already are not counted)
+        self.count = count
+
+    @staticmethod
+    def probe(receiver_id: str) -> Tuple[int, int]:
+        """(word, bit mask) for a receiver ID, shared by every filter"""
+        h = int.from_bytes(hashlib.blake2b(receiver_id.encode("utf-8"), digest_size=8).digest(), "little")
+        # FILTER_HASHES 6-bit slices pick the bits, unrolled
+        mask = 1 << (h & 63) | 1 << (h >> 6 & 63) | 1 << (h >> 12 & 63) | 1 << (h >> 18 & 63) | 1 << (h >> 24 & 63)
+        return (h >> 30) % _FILTER_WORDS, mask
+
+    def has(self, probe: Tuple[int, int]) -> bool:
+        word, mask = probe
+        return self._words[word] & mask == mask
+
+    def add(self, probe: Tuple[int, int]) -> bool:
+        """Set a probe's bits; returns False if they were all set already (present, or a false positive)"""
+        word, mask = probe
+        current = self._words[word]
+        if current & mask == mask:
+            return False
+        self._words[word] = current | mask
+        self.count += 1
+        return True
+
+    def to_state(self) -> Tuple[bytes, int]:
+        return self._words.tobytes(), self.count
+
+    @classmethod
+    def from_state(cls, state: Optional[Tuple[bytes, int]]) -> Optional["ReceiverFilter"]:
+        if state is None:
+            return None
+        data, count = state
+        words = array("Q")
+        words.frombytes(data)
+        return cls(words, count)
+
+
+# Heap held by one filter: the word array plus the object
+_FILTER_HEAP_BYTES = sys.getsizeof(array("Q", bytes(FILTER_BYTES))) + 56
+
+
+class ReceiverRelationships:
+    """Top-K receiver counters plus a two-generation membership filter for one sender"""
+
+    __slots__ = ("_receivers", "_counts", "distinct", "_filter", "_previous")
+
+    def __init__(self):
+        self._receivers = array("I")   # interned receiver IDs
+        self._counts = array("I")      # transactions per receiver
+        self.distinct = 0              # distinct receivers paid (estimated past TOP_K)
+        self._filter: Optional[ReceiverFilter] = None
+        self._previous: Optional[ReceiverFilter] = None
+
+    def __len__(self) -> int:
+        return self.distinct
+
+    @property
+    def transactions(self) -> int:
+        """Transactions recorded (space-saving keeps the counters summing to it)"""
+        return sum(self._counts)
+
+    @property
+    def size_bytes(self) -> int:
+        """Heap held by the counter arrays and filters (bounded by TOP_K and two filters)"""
+        size = sys.getsizeof(self._receivers) + sys.getsizeof(self._counts)
+        if self._filter is not None:
+            size += _FILTER_HEAP_BYTES
+        if self._previous is not None:
+            size += _FILTER_HEAP_BYTES
+        return size
+
+    def knows(self, receiver_id: str, interner: ReceiverInterner) -> bool:
+        """Whether the sender has paid receiver_id (see the module docstring for error bounds)"""
+        index = interner.get(receiver_id)
+        # Held by this sender once found in _receivers, so lookup() confirms it was not reused
+        if index is not None and index in self._receivers and interner.lookup(index) == receiver_id:
+            return True
+        if self._filter is None:
+            return False
+        probe = ReceiverFilter.probe(receiver_id)
+        return self._filter.has(probe) or (self._previous is not None and self._previous.has(probe))
+
+    def count(self, receiver_id: str, interner: ReceiverInterner) -> int:
+        """Transactions to receiver_id if it is a top-K receiver (an upper bound past TOP_K), else 0"""
+        index = interner.get(receiver_id)
+        if index is None or index not in self._receivers or interner.lookup(index) != receiver_id:
+            return 0
+        return self._counts[self._receivers.index(index)]
+
+    def add(self, receiver_index: int, interner: ReceiverInterner):
+        """Record one transaction to a held interned receiver (a counter takes its own reference)"""
+        receivers = self._receivers
+        if receiver_index in receivers:
+            self._counts[receivers.index(receiver_index)] += 1
+            return
+
+        if len(receivers) < TOP_K:
+            interner.retain(receiver_index)
+            receivers.append(receiver_index)
+            self._counts.append(1)
+            self.distinct += 1
+            return
+
+        if self._filter is None:
+            # First receiver past TOP_K: from now on the filter remembers every receiver
+            self._filter = ReceiverFilter()
+            for known in interner.lookup_many(receivers):
+                self._remember(ReceiverFilter.probe(known))
+        probe = ReceiverFilter.probe(interner.lookup(receiver_index))
+        if self._remember(probe) and (self._previous is None or not self._previous.has(probe)):
+            self.distinct += 1
+
+        # Space-saving: the new receiver takes over the smallest counter, inheriting its count.
+        # The evicted receiver stays known through the filter.
+        counts = self._counts
+        slot = counts.index(min(counts))
+        interner.retain(receiver_index)
+        interner.release(receivers[slot])
+        receivers[slot] = receiver_index
+        counts[slot] += 1
+
+    def _remember(self, probe: Tuple[int, int]) -> bool:
+        """Add a receiver to the current filter generation; False if it was (or looked) already there"""
+        if self._filter.count >= FILTER_CAPACITY:
+            self._previous = self._filter
+            self._filter = ReceiverFilter()
+        return self._filter.add(probe)
+
+    def release(self, interner: ReceiverInterner):
+        """Drop the counters' receiver references (the sender is leaving memory)"""
+        interner.release_many(self._receivers)
+
+    def to_state(self, interner: ReceiverInterner) -> tuple:
+        """
+        Plain-data snapshot (see from_state). Receivers are written as IDs,
+        since interned integers are process-local; filters hash the IDs
+        themselves, so they are written as-is.
+        """
+        filters = tuple(bloom.to_state() if bloom is not None else None for bloom in (self._filter, self._previous))
+        return (interner.lookup_many(self._receivers), self._counts.tobytes(), self.distinct) + filters
+
+    @classmethod
+    def from_state(cls, state: tuple, interner: ReceiverInterner) -> "ReceiverRelationships":
+        """Rebuild from to_state() output, interning receivers locally"""
+        receivers, counts, distinct, current, previous = state
+        relationships = cls()
+        relationships._receivers = interner.acquire_many(receivers)
+        relationships._counts.frombytes(counts)
+        relationships.distinct = distinct
+        relationships._filter = ReceiverFilter.from_state(current)
+        relationships._previous = ReceiverFilter.from_state(previous)
+        return relationships
+
+    @classmethod
+    def from_counts(cls, counts: dict, interner: ReceiverInterner) -> "ReceiverRelationships":
+        """Convert a {receiver_id: count} dict (state format 2): the TOP_K busiest keep their counts"""
+        relationships = cls()
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        for receiver_id, count in ranked[:TOP_K]:
+            relationships._receivers.append(interner.acquire(receiver_id))
+            relationships._counts.append(count)
+        if len(ranked) > TOP_K:
+            # Least busy first, so the busiest land in the newest generation
+            relationships._filter = ReceiverFilter()
+            for receiver_id, _ in reversed(ranked):
+                relationships._remember(ReceiverFilter.probe(receiver_id))
+        relationships.distinct = len(ranked)
+        return relationships
@@ -0,0 +1,135 @@
+"""
+Running Amount Statistics
+
+Per-sender aggregate of the amounts in the sender's history window.
+Provides mean, sample standard deviation and maximum in O(1) per query
+and O(1) amortized per update, so scoring cost no longer grows with the
+length of a sender's history.
+
+Sums are kept as exact integers (scaled by a power of two), which makes
+the mean and standard deviation bit-for-bit identical to
+``statistics.mean`` / ``statistics.stdev`` over the same window.
+"""
+
+import math
+import sys
+from array import array
+
+# Extra precision bits for the round-to-odd square root (same as CPython's statistics module)
+_SQRT_BIT_WIDTH = 2 * sys.float_info.mant_dig + 3
+
+
+def _integer_sqrt_of_frac_rto(n: int, m: int) -> int:
+    """Square root of n/m, rounded to the nearest integer using round-to-odd."""
+    a = math.isqrt(n // m)
+    return a | (a * a * m != n)
+
+
+def _float_sqrt_of_frac(n: int, m: int) -> float:
+    """Square root of n/m as a float, correctly rounded."""
+    q = (n.bit_length() - m.bit_length() - _SQRT_BIT_WIDTH) // 2
+    if q >= 0:
+        numerator = _integer_sqrt_of_frac_rto(n, m << 2 * q) << q
+        denominator = 1
+    else:
+        numerator = _integer_sqrt_of_frac_rto(n << -2 * q, m)
+        denominator = 1 << -q
+    return numerator / denominator
+
+
+class RunningAmountStats:
+    """
+    Incremental mean / variance / max over a FIFO window of amounts.
+
+    Callers push every stored amount and evict the oldest one whenever
+    the history window is trimmed, mirroring the history list exactly.
+    """
+
+    __slots__ = ("count", "_sum", "_sum_sq", "_shift", "_next_seq", "_max_seqs", "_max_values")
+
+    def __init__(self):
+        self.count = 0
+        # Sum and sum of squares in units of 2**-_shift (exact integers)
+        self._sum = 0
+        self._sum_sq = 0
+        self._shift = 0
+        # Monotonic queue of (sequence, amount) for the sliding-window maximum,
+        # kept as two packed arrays (its length is bounded by the window size)
+        self._next_seq = 0
+        self._max_seqs = array("q")
+        self._max_values = array("d")
+
+    def _scaled(self, amount: float) -> int:
+        """Convert amount to an exact integer in units of 2**-_shift, widening the scale if needed"""
+        numerator, denominator = amount.as_integer_ratio()
+        exponent = denominator.bit_length() - 1
+        if exponent > self._shift:
+            widen = exponent - self._shift
+            self._sum <<= widen
+            self._sum_sq <<= 2 * widen
+            self._shift = exponent
+        return numerator << (self._shift - exponent)
+
+    def push(self, amount: float):
+        """Add the newest amount to the window"""
+        value = self._scaled(amount)
+        self.count += 1
+        self._sum += value
+        self._sum_sq += value * value
+
+        max_seqs, max_values = self._max_seqs, self._max_values
+        while max_values and max_values[-1] <= amount:
+            max_values.pop()
+            max_seqs.pop()
+        max_seqs.append(self._next_seq)
+        max_values.append(amount)
+        self._next_seq += 1
+
+    def evict_oldest(self, amount: float):
+        """Remove the oldest amount from the window (must be the value pushed earliest)"""
+        value = self._scaled(amount)
+        oldest_seq = self._next_seq - self.count
+        self.count -= 1
+        self._sum -= value
+        self._sum_sq -= value * value
+
+        if self._max_seqs and self._max_seqs[0] == oldest_seq:
+            del self._max_seqs[0]
+            del self._max_values[0]
+
+    def mean(self) -> float:
+        """Arithmetic mean of the window (requires count >= 1)"""
+        return self._sum / (self.count << self._shift)
+
+    def stdev(self) -> float:
+        """Sample standard deviation of the window (requires count >= 2)"""
+        n = self.count
+        numerator = n * self._sum_sq - self._sum * self._sum
+        denominator = (n * (n - 1)) << (2 * self._shift)
+        return _float_sqrt_of_frac(numerator, denominator)
+
+    def max(self) -> float:
+        """Largest amount in the window (requires count >= 1)"""
+        return self._max_values[0]
+
+    def clear(self):
+        """Reset to an empty window"""
+        self.__init__()
+
+    def to_state(self) -> tuple:
+        """Plain-data snapshot of the aggregate (see from_state)"""
+        return (
+            self.count, self._sum, self._sum_sq, self._shift, self._next_seq,
+            self._max_seqs.tobytes(), self._max_values.tobytes()
+        )
+
+    @classmethod
+    def from_state(cls, state: tuple) -> "RunningAmountStats":
+        """Rebuild an aggregate from to_state() output"""
+        stats = cls.__new__(cls)
+        stats.count, stats._sum, stats._sum_sq, stats._shift, stats._next_seq, max_seqs, max_values = state
+        stats._max_seqs = array("q")
+        stats._max_seqs.frombytes(max_seqs)
+        stats._max_values = array("d")
+        stats._max_values.frombytes(max_values)
+        return stats
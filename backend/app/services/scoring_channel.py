@@ -0,0 +1,160 @@
+"""
+WebSocket Scoring Channel
+
+One connection's scoring session for high-volume clients (gateways sending
+a continuous stream of authorizations). Each text or binary message is a
+ScoringMessage: a TransactionRequest plus an `id`. Each reply is the
+TransactionResponse with the same `id`, or {"id": ..., "error": "..."} for
+a message that is not a valid ScoringMessage. The handshake is paid once
+per connection instead of once per transaction.
+
+Clients pipeline: they send without waiting for replies. Transactions are
+scored in the order they arrive on the connection, so velocity and history
+signals match /evaluate-transaction called once per message in order.
+Replies are matched by `id`: with a scoring pool they can arrive out of
+order across senders.
+
+Flow control: at most `max_in_flight` transactions per connection are
+received but not yet answered. At the limit the channel stops reading the
+socket until replies have been written, so a client that sends faster
+than it is scored, or reads its replies slower, is held back by TCP
+instead of growing server memory.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Optional, Set, Union
+
+from pydantic import ValidationError
+from pydantic_core import to_json
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket
+
+from app.models.schemas import ScoringMessage, TransactionResponse
+from app.services.fraud_detector import FraudDetector
+from app.services.scoring_pool import ScoringPool
+from app.services.stream_scoring import ThroughputReport, error_message
+
+logger = logging.getLogger(__name__)
+
+
+class ScoringChannel:
+    """Scores the transactions of one WebSocket connection, pipelined and flow-controlled"""
+
+    def __init__(self, websocket: WebSocket, detector: FraudDetector, pool: Optional[ScoringPool] = None,
+                 max_in_flight: int = 256, fast: Optional[bool] = None, compact: bool = False):
+        """
+        Args:
+            websocket: Accepted connection
+            detector: Detector scoring the transactions (when there is no pool)
+            pool: Scoring pool to send the transactions to instead, when configured
+            max_in_flight: Transactions received but not yet answered, at most
+            fast: Fast-decision mode for every transaction on the connection
+            compact: Reply with the codes-and-numbers form of each response
+        """
+        self.websocket = websocket
+        self.detector = detector
+        self.pool = pool
+        self.fast = fast
+        self.compact = compact
+        self.report = ThroughputReport()
+        self._window = asyncio.Semaphore(max(1, max_in_flight))
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        # Transactions waiting on the pool (held so they are not garbage-collected mid-flight)
+        self._scoring: Set[asyncio.Task] = set()
+
+    async def run(self):
+        """Serve the connection until the client disconnects"""
+        writer = asyncio.create_task(self._write())
+        try:
+            while True:
+                await self._window.acquire()
+                if writer.done():
+                    break
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("text")
+                await self._receive(data if data is not None else message.get("bytes") or b"")
+        finally:
+            for task in self._scoring:
+                task.cancel()
+            writer.cancel()
+            await asyncio.gather(writer, *self._scoring, return_exceptions=True)
+
+    async def _receive(self, data: Union[str, bytes]):
+        """Parse one message and score it (or send it to the pool), or queue its error reply"""
+        self.report.received += 1
+        try:
+            request = ScoringMessage.model_validate_json(data)
+        except ValidationError as e:
+            self.report.errors += 1
+            self._outgoing.put_nowait(json.dumps({"id": _message_id(data), "error": error_message(e)}))
+            return
+
+        if self.pool is None:
+            # In the threadpool, off the event loop (a shared state store can wait on its
+            # lock); the next message is read once this one is scored, keeping arrival order
+            try:
+                result = await run_in_threadpool(
+                    self.detector.evaluate_transaction,
+                    request.amount, request.sender_id, request.receiver_id, request.timestamp, self.fast
+                )
+            except ValueError as e:
+                self.report.errors += 1
+                self._outgoing.put_nowait(json.dumps({"id": request.id, "error": str(e)}))
+                return
+            self._reply(request.id, result)
+        else:
+            # Tasks start in creation order, so transactions reach the pool in arrival order
+            task = asyncio.create_task(self._score_remote(request))
+            self._scoring.add(task)
+            task.add_done_callback(self._scoring.discard)
+
+    async def _score_remote(self, request: ScoringMessage):
+        try:
+            result = await self.pool.evaluate_transaction_async(
+                request.amount, request.sender_id, request.receiver_id, request.timestamp, self.fast
+            )
+        except ValueError as e:
+            self.report.errors += 1
+            self._outgoing.put_nowait(json.dumps({"id": request.id, "error": str(e)}))
+            return
+        except RuntimeError as e:
+            logger.error(f"Scoring pool failed on a WebSocket transaction: {e}")
+            self.report.errors += 1
+            self._outgoing.put_nowait(json.dumps({"id": request.id, "error": "Scoring failed"}))
+            return
+        self._reply(request.id, result)
+
+    def _reply(self, message_id: Union[str, int], result: TransactionResponse):
+        """Queue the response with its correlation ID spliced in front of the serialized body"""
+        self.report.scored += 1
+        self.report.blocked += result.decision == "block"
+        if self.compact:
+            body = to_json(result.to_compact()).decode()
+        else:
+            body = result.model_dump_json(exclude_none=True)
+        self._outgoing.put_nowait('{"id":' + json.dumps(message_id) + "," + body[1:])
+
+    async def _write(self):
+        """Send replies as they are ready; each sent reply frees a slot in the window"""
+        outgoing = self._outgoing
+        send_text = self.websocket.send_text
+        try:
+            while True:
+                await send_text(await outgoing.get())
+                self._window.release()
+        finally:
+            # Wake the reader if it is waiting for a slot, so it sees the writer has stopped
+            self._window.release()
+
+
+def _message_id(data: Union[str, bytes]):
+    """Correlation ID of a message that failed validation, when it has one"""
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    return message.get("id") if isinstance(message, dict) else None
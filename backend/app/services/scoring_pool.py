@@ -0,0 +1,573 @@
+"""
+Scoring Pool
+
+Multi-process execution mode for FraudDetector. Scoring is pure Python and
+CPU-bound, so one process uses one core whatever the host has. The pool
+runs `workers` processes, each owning a hash partition of senders with its
+own detector and in-memory state: a sender always lands on the same
+process, so no state or locks are shared between them.
+
+Callers (the API process) send requests to the owning partition over a
+duplex pipe as marshal-encoded tuples and get marshal-encoded results back.
+Each partition serves its pipe in FIFO order, which preserves per-sender
+ordering: two requests from one sender are scored in the order they were
+sent, exactly as in a single process. Many requests can be in flight per
+partition (pipelined); a reader thread per partition resolves them in
+order. Batches are split by partition, scored in parallel and merged back
+into request order.
+
+Messages are coalesced both ways: requests made on the event loop in one
+iteration go to a worker as one message, the worker answers everything
+waiting on its pipe in one reply, and the reader resolves a reply's
+futures with one event-loop callback. Under load this amortizes the pipe
+writes and wake-ups that otherwise dominate the cost of a request. Pipe
+writes are made by a writer thread per partition, so a worker that falls
+behind (a full pipe) never blocks the event loop.
+
+Factor stage timings are taken in the worker when the caller asks for them
+(a request with a Server-Timing breakdown, or one sampled for the factor
+histograms) and sent back with the reply, so they are recorded in the
+caller's metrics and request timer as with the in-process detector.
+
+Cross-sender signals see only their own partition: receiver fan-in counts
+the senders of one partition, so it under-counts with several workers.
+"""
+
+import asyncio
+import logging
+import marshal
+import multiprocessing
+import os
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.models.flags import NO_RISK_INDICATORS, Flag
+from app.models.schemas import TransactionRequest, TransactionResponse
+from app.services.fraud_detector import FraudDetector
+from app.services.metrics import FraudMetrics, Labels
+from app.services.profiling import current_timer
+
+logger = logging.getLogger(__name__)
+
+# Request kinds (first element of every request; a message is a tuple of requests)
+_EVALUATE = 0      # (kind, fast, timed, amount, sender_id, receiver_id, timestamp)
+_BATCH = 1         # (kind, fast, timed, ((amount, sender_id, receiver_id, timestamp), ...))
+_STATS = 2         # (kind,)
+_CLOSE = 3         # (kind,)
+
+# Reply status (a reply message is a tuple of (status, value), one per request;
+# scoring values are (result, timings), timings None unless the request was timed)
+_OK = 0
+_VALUE_ERROR = 1
+_ERROR = 2
+
+# Seconds a worker gets to flush its journal on close before it is terminated
+_CLOSE_TIMEOUT_S = 30
+
+
+def partition_of(sender_id: str, partitions: int) -> int:
+    """Partition owning a sender; stable across processes and restarts (unlike hash())"""
+    return zlib.crc32(sender_id.encode("utf-8")) % partitions
+
+
+def build_partition_detector(partition: int, partitions: int) -> FraudDetector:
+    """
+    Detector for one partition, configured from the application settings
+    (the worker inherits the environment). Persistence and spill files get
+    a per-partition suffix that includes the partition count, so changing
+    SCORING_WORKERS starts from fresh state instead of misrouting senders.
+    """
+    from app.config import settings
+    from app.services.flagged_accounts import FlaggedAccountStore
+    from app.services.journal import TransactionJournal
+    from app.services.receiver_fan_in import ReceiverFanIn
+    from app.services.state_store import InMemoryStateStore, SenderSpill, create_state_store
+
+    suffix = f"partition-{partition}-of-{partitions}"
+    spill = None
+    if settings.sender_spill_path and settings.state_backend == "memory":
+        spill = SenderSpill(f"{settings.sender_spill_path}.{suffix}")
+        if not settings.persistence_dir:
+            spill.clear()
+    store = create_state_store(
+        settings.state_backend,
+        settings.state_path,
+        payment_max_entries=settings.payment_max_entries,
+        payment_ttl_s=settings.payment_ttl_s,
+        max_senders=settings.sender_max_count,
+        max_bytes=settings.sender_memory_budget_mb * 1024 * 1024,
+        idle_ttl_s=settings.sender_idle_ttl_s,
+        spill=spill
+    )
+    journal = None
+    if settings.persistence_dir and isinstance(store, InMemoryStateStore):
+        journal = TransactionJournal(
+            os.path.join(settings.persistence_dir, suffix),
+            store,
+            fsync_interval_ms=settings.log_fsync_interval_ms,
+            snapshot_interval_s=settings.snapshot_interval_s
+        )
+    flagged = FlaggedAccountStore(settings.flagged_accounts_path, settings.flagged_reload_interval_s)
+    flagged.start()
+    detector = FraudDetector(
+        store=store,
+        journal=journal,
+        flagged_receivers=flagged,
+        stages=[name.strip() for name in settings.scoring_stages.split(",") if name.strip()],
+        fast_decisions=settings.fast_decisions,
+        fan_in=ReceiverFanIn(
+            settings.fan_in_window_s, settings.fan_in_threshold, settings.fan_in_max_receivers,
+            settings.fan_in_established_s
+        )
+    )
+    if journal is not None:
+        journal.restore(detector._apply_transaction)
+        journal.start()
+    return detector
+
+
+def _encode_response(result: TransactionResponse) -> tuple:
+    """Plain tuple of a response (marshal takes no NamedTuples or models)"""
+    return (
+        result.decision,
+        result.reason,
+        result.risk_score,
+        result.risk_level,
+        tuple(tuple(flag) if isinstance(flag, Flag) else flag for flag in result.flags),
+        tuple(result.skipped_factors) if result.skipped_factors is not None else None
+    )
+
+
+def _decode_flag(flag):
+    if not isinstance(flag, tuple):
+        return flag
+    # The shared instance: compact responses recognize it by identity
+    return NO_RISK_INDICATORS if flag[0] == NO_RISK_INDICATORS.code else Flag(*flag)
+
+
+def _decode_response(values: tuple) -> TransactionResponse:
+    decision, reason, risk_score, risk_level, flags, skipped = values
+    return TransactionResponse.trusted(
+        decision=decision,
+        reason=reason,
+        risk_score=risk_score,
+        risk_level=risk_level,
+        flags=[_decode_flag(flag) for flag in flags],
+        skipped_factors=list(skipped) if skipped is not None else None
+    )
+
+
+class _StageTimings:
+    """Stands in for the request timer in a worker: collects the detector's factor and history timings"""
+
+    __slots__ = ("factors", "history")
+
+    def __init__(self):
+        self.factors: List[Tuple[Labels, float]] = []
+        self.history = 0.0
+
+    def add_factors(self, timings):
+        self.factors.extend(timings)
+
+    def add(self, name: str, seconds: float):
+        self.history += seconds
+
+    def encode(self) -> tuple:
+        return tuple(self.factors), self.history
+
+
+def _evaluate(detector: FraudDetector, request: tuple):
+    kind = request[0]
+    if kind == _EVALUATE:
+        _, fast, _, amount, sender_id, receiver_id, timestamp = request
+        return _encode_response(detector.evaluate_transaction(amount, sender_id, receiver_id, timestamp, fast))
+    _, fast, _, items = request
+    transactions = [
+        TransactionRequest.model_construct(
+            amount=amount, sender_id=sender_id, receiver_id=receiver_id, timestamp=timestamp
+        )
+        for amount, sender_id, receiver_id, timestamp in items
+    ]
+    return tuple(_encode_response(result) for result in detector.evaluate_batch(transactions, fast))
+
+
+def _score(detector: FraudDetector, request: tuple):
+    """Reply value for one request"""
+    if request[0] == _STATS:
+        return dict(detector.store.state_stats(), fan_in_receivers=len(detector.fan_in))
+    if not request[2]:
+        return _evaluate(detector, request), None
+    timings = _StageTimings()
+    token = current_timer.set(timings)
+    try:
+        return _evaluate(detector, request), timings.encode()
+    finally:
+        current_timer.reset(token)
+
+
+def _serve(conn, partition: int, partitions: int, factory: Callable[[int, int], FraudDetector]):
+    """
+    Worker process: score requests from `conn` in arrival order until closed.
+    Everything already waiting on the pipe is answered in one reply message.
+    """
+    detector = factory(partition, partitions)
+    recv_bytes = conn.recv_bytes
+    poll = conn.poll
+    conn.send_bytes(marshal.dumps(()))
+    running = True
+    while running:
+        try:
+            requests = list(marshal.loads(recv_bytes()))
+            while poll():
+                requests.extend(marshal.loads(recv_bytes()))
+        except EOFError:
+            break
+        replies = []
+        for request in requests:
+            if request[0] == _CLOSE:
+                running = False
+                break
+            try:
+                replies.append((_OK, _score(detector, request)))
+            except ValueError as e:
+                replies.append((_VALUE_ERROR, str(e)))
+            except Exception as e:
+                logger.exception(f"Scoring partition {partition} failed")
+                replies.append((_ERROR, str(e)))
+        if replies:
+            conn.send_bytes(marshal.dumps(tuple(replies)))
+
+    if detector.journal is not None:
+        detector.journal.close()
+    detector.flagged_receivers.close()
+    detector.store.close()
+
+
+def _settle(future, status: int, value):
+    if status == _OK:
+        future.set_result(value)
+    elif status == _VALUE_ERROR:
+        future.set_exception(ValueError(value))
+    else:
+        future.set_exception(RuntimeError(value))
+
+
+def _fail(futures: list, error: RuntimeError):
+    """Fail requests that will get no reply, each on its own loop when it has one"""
+    for future in futures:
+        if isinstance(future, Future):
+            future.set_exception(error)
+        elif not future.get_loop().is_closed():
+            future.get_loop().call_soon_threadsafe(_settle_on_loop, [(future, _ERROR, str(error))])
+
+
+def _settle_on_loop(replies: list):
+    """Resolve one reply message's asyncio futures (one loop callback per message, not per future)"""
+    for future, status, value in replies:
+        if not future.done():
+            _settle(future, status, value)
+
+
+class _Partition:
+    """Parent-side end of one worker: its pipe and the requests awaiting replies, oldest first"""
+
+    __slots__ = ("index", "process", "conn", "pending", "outbox", "flush_scheduled", "stopped", "closing",
+                 "lock", "wake", "reader", "writer")
+
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        # concurrent.futures.Future (threads) or asyncio.Future (event loop) per request
+        self.pending: deque = deque()
+        # Requests not sent yet, in `pending` order: the writer sends them as one message
+        self.outbox: List[tuple] = []
+        self.flush_scheduled = False
+        # Set by the reader once the worker has gone: later requests fail at once
+        self.stopped = False
+        # Set by close(): the writer sends what is left, then exits
+        self.closing = False
+        # Guards pending and the outbox, so the order of `pending` is the order on the pipe
+        self.lock = threading.Lock()
+        # Wakes the writer when the outbox has requests to send
+        self.wake = threading.Condition(self.lock)
+        self.reader = threading.Thread(target=self._read, name=f"scoring-partition-{index}", daemon=True)
+        self.writer = threading.Thread(target=self._write, name=f"scoring-partition-{index}-writer", daemon=True)
+
+    def submit(self, request: tuple) -> Future:
+        """Queue a request for the writer to send now (with any buffered before it); for threads"""
+        future = Future()
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError(f"Scoring partition {self.index} is not running")
+            self.pending.append(future)
+            self.outbox.append(request)
+            self.wake.notify()
+        return future
+
+    def submit_async(self, request: tuple) -> asyncio.Future:
+        """
+        Buffer a request from the event loop; the buffer is sent when the
+        loop next runs callbacks, so requests made in one iteration share a
+        message. The order of calls is the order on the pipe.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.stopped:
+                future.set_exception(RuntimeError(f"Scoring partition {self.index} is not running"))
+                return future
+            self.pending.append(future)
+            self.outbox.append(request)
+            if not self.flush_scheduled:
+                self.flush_scheduled = True
+                loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        """Hand the loop iteration's requests to the writer (a loop callback: never blocks on the pipe)"""
+        with self.lock:
+            self.flush_scheduled = False
+            if self.outbox:
+                self.wake.notify()
+
+    def close(self):
+        """Send the close request after everything queued; the writer exits once it is sent"""
+        with self.lock:
+            # Not a request: the worker does not reply to it
+            self.outbox.append((_CLOSE,))
+            self.closing = True
+            self.wake.notify()
+
+    def _write(self):
+        """
+        Send the outbox as one message whenever it has requests; blocks only
+        while the pipe is full, holding no lock meanwhile. Requests that can
+        no longer be sent are failed by the reader, which sees the worker go.
+        """
+        while True:
+            with self.lock:
+                while not self.outbox and not self.closing:
+                    self.wake.wait()
+                if not self.outbox:
+                    return
+                message = marshal.dumps(tuple(self.outbox))
+                self.outbox.clear()
+                closing = self.closing
+            try:
+                self.conn.send_bytes(message)
+            except OSError:
+                return
+            if closing:
+                return
+
+    def _read(self):
+        """Resolve pending requests as their replies arrive (the worker answers in order)"""
+        pending = self.pending
+        while True:
+            try:
+                replies = marshal.loads(self.conn.recv_bytes())
+            except (EOFError, OSError):
+                break
+            on_loop: Dict[asyncio.AbstractEventLoop, list] = {}
+            for status, value in replies:
+                future = pending.popleft()
+                if isinstance(future, Future):
+                    _settle(future, status, value)
+                else:
+                    on_loop.setdefault(future.get_loop(), []).append((future, status, value))
+            for loop, settled in on_loop.items():
+                loop.call_soon_threadsafe(_settle_on_loop, settled)
+
+        # Under the lock, so no request is queued behind the ones failed here
+        with self.lock:
+            self.stopped = True
+            stranded = list(pending)
+            pending.clear()
+        _fail(stranded, RuntimeError(f"Scoring partition {self.index} stopped"))
+
+
+class ScoringPool:
+    """Worker processes scoring transactions, each owning a hash partition of senders"""
+
+    def __init__(self, workers: int, factory: Callable[[int, int], FraudDetector] = build_partition_detector,
+                 metrics: Optional[FraudMetrics] = None):
+        """
+        Args:
+            workers: Number of worker processes (partitions)
+            factory: Builds a partition's detector in its worker, from (partition,
+                partitions); must be importable by name (workers are spawned)
+            metrics: Records the decisions returned by the workers when provided
+        """
+        if workers < 1:
+            raise ValueError("A scoring pool needs at least one worker")
+        self.workers = workers
+        self.factory = factory
+        self.metrics = metrics
+        self._partitions: List[_Partition] = []
+
+    def __len__(self) -> int:
+        return self.workers
+
+    def start(self):
+        """
+        Spawn the workers and wait until each has restored its partition's
+        journal, as the in-process detector is restored before serving
+        """
+        # Spawned rather than forked: the API process runs threads that a fork would copy mid-flight
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_serve,
+                args=(child_conn, index, self.workers, self.factory),
+                name=f"scoring-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._partitions.append(_Partition(index, process, parent_conn))
+        for partition in self._partitions:
+            try:
+                partition.conn.recv_bytes()  # ready: state restored
+            except EOFError:
+                self.close()
+                raise RuntimeError(f"Scoring worker {partition.index} failed to start")
+            partition.reader.start()
+            partition.writer.start()
+        logger.info(f"Started scoring pool with {self.workers} worker processes")
+
+    def close(self):
+        """Let each worker finish its queued requests and flush its journal, then stop it"""
+        for partition in self._partitions:
+            if partition.writer.is_alive():
+                partition.close()
+            else:
+                # Never started (failed start): nothing queued to send first
+                try:
+                    partition.conn.send_bytes(marshal.dumps(((_CLOSE,),)))
+                except OSError:
+                    pass
+        for partition in self._partitions:
+            partition.process.join(_CLOSE_TIMEOUT_S)
+            if partition.process.is_alive():
+                logger.warning(f"Scoring worker {partition.index} did not stop; terminating it")
+                partition.process.terminate()
+            if partition.writer.is_alive():
+                partition.writer.join(_CLOSE_TIMEOUT_S)
+            partition.conn.close()
+            if partition.reader.is_alive():
+                partition.reader.join()
+        self._partitions = []
+
+    # ---------- Scoring ----------
+    # Replies are decoded by the caller, so decisions and factor timings are
+    # recorded in the caller's context (with its route label and request
+    # timer), not on the reader thread
+    def evaluate_transaction(self, amount: float, sender_id: str, receiver_id: str, timestamp: str,
+                             fast: Optional[bool] = None) -> TransactionResponse:
+        """Blocking FraudDetector.evaluate_transaction equivalent (from threads, not the event loop)"""
+        partition = self._partitions[partition_of(sender_id, self.workers)]
+        sampled = self._sample_factors()
+        timed = sampled or current_timer.get() is not None
+        future = partition.submit((_EVALUATE, fast, timed, amount, sender_id, receiver_id, timestamp))
+        return self._scored(future.result(), sampled)
+
+    async def evaluate_transaction_async(self, amount: float, sender_id: str, receiver_id: str, timestamp: str,
+                                         fast: Optional[bool] = None) -> TransactionResponse:
+        """
+        evaluate_transaction for the event loop: other requests are served
+        while the worker scores. The request is queued before the first
+        await, so calls are ordered as they are made.
+        """
+        partition = self._partitions[partition_of(sender_id, self.workers)]
+        sampled = self._sample_factors()
+        timed = sampled or current_timer.get() is not None
+        future = partition.submit_async((_EVALUATE, fast, timed, amount, sender_id, receiver_id, timestamp))
+        return self._scored(await future, sampled)
+
+    def evaluate_batch(self, transactions: Sequence[TransactionRequest],
+                       fast: Optional[bool] = None) -> List[TransactionResponse]:
+        """
+        Blocking FraudDetector.evaluate_batch equivalent (from threads, not
+        the event loop). The batch is split by partition and the parts are
+        scored in parallel; each partition applies its part in order, so
+        results match FraudDetector.evaluate_batch. A sampled batch has all
+        its items' factor stages timed (the detector samples item by item).
+        """
+        parts, slots = self._split(transactions)
+        sampled = self._sample_factors()
+        timed = sampled or current_timer.get() is not None
+        futures = [self._partitions[index].submit((_BATCH, fast, timed, part)) for index, part in parts.items()]
+        return self._merge(len(transactions), slots, [future.result() for future in futures], sampled)
+
+    async def evaluate_batch_async(self, transactions: Sequence[TransactionRequest],
+                                   fast: Optional[bool] = None) -> List[TransactionResponse]:
+        """evaluate_batch for the event loop"""
+        parts, slots = self._split(transactions)
+        sampled = self._sample_factors()
+        timed = sampled or current_timer.get() is not None
+        futures = [self._partitions[index].submit_async((_BATCH, fast, timed, part)) for index, part in parts.items()]
+        return self._merge(len(transactions), slots, await asyncio.gather(*futures), sampled)
+
+    def state_stats(self) -> Dict[str, int]:
+        """Sender state statistics summed over all partitions, plus the fan-in receivers tracked"""
+        futures = [partition.submit((_STATS,)) for partition in self._partitions]
+        totals: Dict[str, int] = {}
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def _split(self, transactions: Sequence[TransactionRequest]) -> Tuple[Dict[int, tuple], List[List[int]]]:
+        """Batch items per partition, in order, and the request slots they came from"""
+        parts: Dict[int, list] = {}
+        slots: Dict[int, List[int]] = {}
+        for slot, tx in enumerate(transactions):
+            index = partition_of(tx.sender_id, self.workers)
+            part = parts.get(index)
+            if part is None:
+                part = parts[index] = []
+                slots[index] = []
+            part.append((tx.amount, tx.sender_id, tx.receiver_id, tx.timestamp))
+            slots[index].append(slot)
+        return {index: tuple(part) for index, part in parts.items()}, list(slots.values())
+
+    def _merge(self, count: int, slots: List[List[int]], replies: list, sampled: bool) -> List[TransactionResponse]:
+        results: List[Optional[TransactionResponse]] = [None] * count
+        for part_slots, (encoded, timings) in zip(slots, replies):
+            for slot, values in zip(part_slots, encoded):
+                results[slot] = self._response(values)
+            self._record_timings(timings, sampled)
+        return results
+
+    def _sample_factors(self) -> bool:
+        return self.metrics is not None and self.metrics.sample_factors()
+
+    def _scored(self, reply: tuple, sampled: bool) -> TransactionResponse:
+        """Response of an evaluate reply, its factor timings recorded"""
+        encoded, timings = reply
+        result = self._response(encoded)
+        self._record_timings(timings, sampled)
+        return result
+
+    def _record_timings(self, timings: Optional[tuple], sampled: bool):
+        """Factor timings from a worker, into the request timer and (when sampled) the factor histograms"""
+        if timings is None:
+            return
+        factors, history = timings
+        timer = current_timer.get()
+        if timer is not None:
+            timer.add_factors(factors)
+            timer.add("history", history)
+        if sampled:
+            self.metrics.observe_factors(factors)
+
+    def _response(self, values: tuple) -> TransactionResponse:
+        result = _decode_response(values)
+        if self.metrics is not None:
+            self.metrics.record_decision(result.decision)
+        return result
@@ -0,0 +1,210 @@
+"""
+Sender History
+
+Compact per-sender transaction history: a fixed-capacity ring buffer backed
+by typed arrays (epoch microseconds, amounts and interned receiver IDs)
+instead of a list of dicts. Once full, the oldest slot is overwritten in
+place, so trimming never copies the list.
+
+The ring also maintains the derived per-sender indexes the risk factors read:
+running amount statistics and the sorted velocity window.
+"""
+
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.running_stats import RunningAmountStats
+from app.services.velocity_window import VelocityWindow
+
+# Maximum transactions kept per sender
+DEFAULT_HISTORY_CAPACITY = 100
+
+
+class ReceiverInterner:
+    """
+    Maps receiver IDs to small integers so each ID string is stored once.
+    Shared by all senders; lookups are lock-free, taking and dropping
+    references is locked.
+
+    Reference-counted, so it stays bounded by the receivers senders in
+    memory still hold: every stored integer ID (a history slot, a top-K
+    counter) holds one reference, released when it is overwritten or its
+    sender leaves memory. An ID whose last reference is released is
+    forgotten and its integer reused.
+    """
+
+    __slots__ = ("_ids", "_names", "_refs", "_free", "_lock")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[Optional[str]] = []
+        self._refs: List[int] = []
+        # Released integers, reused before new ones are assigned
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Receiver IDs currently interned"""
+        return len(self._ids)
+
+    def acquire(self, receiver_id: str) -> int:
+        """Return the integer ID for receiver_id, assigning one if new; the caller holds one reference"""
+        with self._lock:
+            return self._acquire(receiver_id)
+
+    def acquire_many(self, receiver_ids: List[str]) -> array:
+        """Integer IDs for a list of receiver IDs, as a packed array, one reference each"""
+        with self._lock:
+            return array("I", [self._acquire(receiver_id) for receiver_id in receiver_ids])
+
+    def retain(self, index: int):
+        """Take another reference to an integer ID the caller already holds"""
+        with self._lock:
+            self._refs[index] += 1
+
+    def release(self, index: int):
+        """Drop one reference; the receiver ID is forgotten with its last one"""
+        with self._lock:
+            self._release(index)
+
+    def release_many(self, indexes: Iterable[int]):
+        with self._lock:
+            for index in indexes:
+                self._release(index)
+
+    def get(self, receiver_id: str) -> Optional[int]:
+        """
+        Return the integer ID for receiver_id, or None if it is not interned.
+        Unreferenced by the caller, so it may be reused concurrently: confirm
+        with lookup() once the caller's own state is known to hold it.
+        """
+        return self._ids.get(receiver_id)
+
+    def lookup(self, index: int) -> str:
+        """Return the receiver ID for a held integer ID"""
+        return self._names[index]
+
+    def lookup_many(self, indexes: Iterable[int]) -> List[str]:
+        """Receiver IDs for a sequence of held integer IDs"""
+        return list(map(self._names.__getitem__, indexes))
+
+    def _acquire(self, receiver_id: str) -> int:
+        index = self._ids.get(receiver_id)
+        if index is None:
+            if self._free:
+                index = self._free.pop()
+                self._names[index] = receiver_id
+            else:
+                index = len(self._names)
+                self._names.append(receiver_id)
+                self._refs.append(0)
+            self._ids[receiver_id] = index
+        self._refs[index] += 1
+        return index
+
+    def _release(self, index: int):
+        refs = self._refs[index] - 1
+        self._refs[index] = refs
+        if refs == 0:
+            del self._ids[self._names[index]]
+            self._names[index] = None
+            self._free.append(index)
+
+
+class SenderHistory:
+    """
+    Ring buffer of one sender's most recent transactions.
+
+    Arrays grow with the sender's activity up to `capacity` and then wrap,
+    so a sender with few transactions only pays for what it stores.
+    """
+
+    __slots__ = ("capacity", "_times", "_amounts", "_receivers", "_head", "amount_stats", "velocity")
+
+    def __init__(self, capacity: int = DEFAULT_HISTORY_CAPACITY):
+        self.capacity = capacity
+        self._times = array("q")       # epoch microseconds
+        self._amounts = array("d")     # amounts
+        self._receivers = array("I")   # interned receiver IDs
+        self._head = 0                 # index of the oldest slot once full
+
+        self.amount_stats = RunningAmountStats()
+        self.velocity = VelocityWindow()
+
+    def __len__(self) -> int:
+        return len(self._amounts)
+
+    def append(self, time_us: int, amount: float, receiver_index: int) -> Optional[Tuple[int, float, int]]:
+        """
+        Store a transaction, overwriting the oldest one when full. The ring
+        keeps the caller's reference to receiver_index.
+
+        Returns:
+            The evicted (time_us, amount, receiver_index), or None; the caller
+            releases the evicted receiver's reference
+        """
+        evicted = None
+
+        if len(self._amounts) < self.capacity:
+            self._times.append(time_us)
+            self._amounts.append(amount)
+            self._receivers.append(receiver_index)
+        else:
+            head = self._head
+            evicted = (self._times[head], self._amounts[head], self._receivers[head])
+            self._times[head] = time_us
+            self._amounts[head] = amount
+            self._receivers[head] = receiver_index
+            self._head = (head + 1) % self.capacity
+
+            self.amount_stats.evict_oldest(evicted[1])
+            self.velocity.remove(evicted[0])
+
+        self.amount_stats.push(amount)
+        self.velocity.add(time_us)
+
+        return evicted
+
+    def count_recent(self, current_us: int, hours: int = 1) -> int:
+        """Number of stored transactions within `hours` before current_us"""
+        return self.velocity.count_recent(current_us, hours)
+
+    def entries(self) -> Iterator[Tuple[int, float, int]]:
+        """Yield (time_us, amount, receiver_index) from oldest to newest"""
+        size = len(self._amounts)
+        for offset in range(size):
+            index = (self._head + offset) % size
+            yield self._times[index], self._amounts[index], self._receivers[index]
+
+    def release(self, interner: ReceiverInterner):
+        """Drop the ring's receiver references (the sender is leaving memory)"""
+        interner.release_many(self._receivers)
+
+    def to_state(self, interner: ReceiverInterner) -> tuple:
+        """
+        Plain-data snapshot of the ring and its derived indexes (see from_state).
+        Receivers are written as IDs, since interned integers are process-local.
+        """
+        return (
+            self.capacity,
+            self._head,
+            self._times.tobytes(),
+            self._amounts.tobytes(),
+            interner.lookup_many(self._receivers),
+            self.amount_stats.to_state(),
+            self.velocity.to_state()
+        )
+
+    @classmethod
+    def from_state(cls, state: tuple, interner: ReceiverInterner) -> "SenderHistory":
+        """Rebuild a history from to_state() output, interning receivers locally"""
+        capacity, head, times, amounts, receivers, stats, velocity = state
+        history = cls(capacity)
+        history._head = head
+        history._times.frombytes(times)
+        history._amounts.frombytes(amounts)
+        history._receivers = interner.acquire_many(receivers)
+        history.amount_stats = RunningAmountStats.from_state(stats)
+        history.velocity = VelocityWindow.from_state(velocity)
+        return history
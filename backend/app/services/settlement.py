@@ -0,0 +1,116 @@
+"""
+Settlement Pipeline
+
+Asynchronous settlement stage for approved payments. Payments are queued
+and settled by a fixed pool of concurrent settler tasks running on the
+event loop, so a slow settlement never blocks request handling.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+async def simulate_settlement(payment_id: str, delay_seconds: float) -> bool:
+    """
+    Simulate settling a payment with the downstream processor.
+
+    Returns:
+        True if the payment settled successfully
+    """
+    await asyncio.sleep(delay_seconds)
+    return True
+
+
+class SettlementQueue:
+    """
+    Background queue of payments awaiting settlement.
+
+    Settler tasks are started on the running event loop on first use (or
+    explicitly via start()) and await `on_settled(payment_id, settled)` for
+    every payment they finish. If given, `observe(seconds, settled)` receives
+    each payment's time from submit() to completion.
+    """
+
+    def __init__(
+        self,
+        on_settled: Callable[[str, bool], Awaitable[None]],
+        workers: int = 32,
+        delay_seconds: float = 0.5,
+        settle: Callable[[str, float], Awaitable[bool]] = simulate_settlement,
+        observe: Optional[Callable[[float, bool], None]] = None
+    ):
+        self.on_settled = on_settled
+        self.observe = observe
+        self.workers = workers
+        self.delay_seconds = delay_seconds
+        self.settle = settle
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Completion futures of payments not yet settled
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def start(self):
+        """Start settler tasks on the running event loop (no-op if already running there)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._pending.clear()
+        self._tasks = [
+            loop.create_task(self._settler(), name=f"settler-{n}")
+            for n in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel settler tasks (payments still queued stay pending)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def submit(self, payment_id: str) -> asyncio.Future:
+        """Queue a payment for settlement; returns a future resolved with the settlement outcome"""
+        self.start()
+        future = self._loop.create_future()
+        self._pending[payment_id] = future
+        self._queue.put_nowait((payment_id, time.perf_counter()))
+        return future
+
+    def pending_future(self, payment_id: str) -> Optional[asyncio.Future]:
+        """Completion future for a payment still awaiting settlement, if any"""
+        return self._pending.get(payment_id)
+
+    def queued(self) -> int:
+        """Number of payments waiting for a free settler"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _settler(self):
+        """Settle queued payments one at a time, forever"""
+        while True:
+            payment_id, queued_at = await self._queue.get()
+            try:
+                settled = await self.settle(payment_id, self.delay_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Settlement failed for payment {payment_id}: {str(e)}")
+                settled = False
+
+            try:
+                await self.on_settled(payment_id, settled)
+                if self.observe is not None:
+                    self.observe(time.perf_counter() - queued_at, settled)
+            finally:
+                future = self._pending.pop(payment_id, None)
+                if future is not None and not future.done():
+                    future.set_result(settled)
+                self._queue.task_done()
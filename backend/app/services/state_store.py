@@ -0,0 +1,723 @@
+"""
+State Store
+
+Storage backends for per-sender detector state and payment history.
+
+- InMemoryStateStore: process-local dictionaries (the default). Fastest,
+  but each uvicorn worker sees only its own requests.
+- SQLiteStateStore: a shared SQLite database in WAL mode. Every worker
+  process on the host reads and writes the same sender state, so velocity
+  and history checks see all traffic regardless of which worker served it.
+
+Detector code accesses a sender through `store.sender(sender_id)`, which
+yields a mutable SenderState and makes the read-modify-write atomic for
+that sender (a striped lock in memory, a write transaction in SQLite).
+"""
+
+import marshal
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.models.schemas import PaymentResult
+from app.services.hour_profile import HourProfile
+from app.services.payment_history import PaymentHistory, parse_cursor
+from app.services.receiver_relationships import ReceiverRelationships
+from app.services.sender_history import DEFAULT_HISTORY_CAPACITY, ReceiverInterner, SenderHistory
+from app.services.striped_lock import StripedLock
+
+# Bumped whenever the packed SenderState layout changes
+STATE_FORMAT_VERSION = 4
+# Version 3 had no hour profile, version 2 also stored relationships as a
+# {receiver_id: count} dict; both still readable
+_NO_HOUR_PROFILE_VERSION = 3
+_DICT_RELATIONSHIPS_VERSION = 2
+
+# Heap estimates for in-memory sender state (measured with benchmarks/suite.py):
+# an empty SenderState with its ring buffer, stats, hour profile and dict
+# slot, then each stored transaction (ring arrays + velocity window). Receiver
+# relationships report their own (bounded) size.
+SENDER_BASE_BYTES = 1400
+HISTORY_ENTRY_BYTES = 28
+
+# Senders evicted at most per sender() call, so eviction never stalls a request
+_EVICT_BATCH = 8
+# Seconds between checks of the least recently active sender's idle time
+_IDLE_CHECK_INTERVAL_S = 1.0
+
+
+class SenderState:
+    """Everything the detector tracks for one sender"""
+
+    __slots__ = ("history", "relationships", "hours", "log_seq", "last_active")
+
+    def __init__(self, history: Optional[SenderHistory] = None,
+                 relationships: Optional[ReceiverRelationships] = None, log_seq: int = 0,
+                 hours: Optional[HourProfile] = None):
+        # Ring buffer of recent transactions with running stats and velocity window
+        self.history = history if history is not None else SenderHistory(DEFAULT_HISTORY_CAPACITY)
+        # Known receivers: top-K counters plus a membership filter, bounded per sender
+        self.relationships = relationships if relationships is not None else ReceiverRelationships()
+        # Decayed hour-of-day histogram of all stored transactions (not just those in the ring)
+        self.hours = hours if hours is not None else HourProfile()
+        # Sequence number of the last journal record applied (0 when not journaled)
+        self.log_seq = log_seq
+        # time.monotonic() of the last access, for idle expiry (not persisted)
+        self.last_active = 0.0
+
+
+def estimate_sender_bytes(state: SenderState) -> int:
+    """Heap estimate for one in-memory sender (see SENDER_BASE_BYTES)"""
+    return SENDER_BASE_BYTES + len(state.history) * HISTORY_ENTRY_BYTES + state.relationships.size_bytes
+
+
+def pack_sender_state(state: SenderState, interner: ReceiverInterner) -> bytes:
+    """Serialize a SenderState to a compact binary blob"""
+    return marshal.dumps(
+        (
+            STATE_FORMAT_VERSION,
+            state.history.to_state(interner),
+            state.relationships.to_state(interner),
+            state.log_seq,
+            state.hours.to_state()
+        ),
+        4
+    )
+
+
+def release_sender_state(state: SenderState, interner: ReceiverInterner):
+    """Drop a sender's interned receiver references when its state leaves memory"""
+    state.history.release(interner)
+    state.relationships.release(interner)
+
+
+def unpack_sender_state(blob: bytes, interner: ReceiverInterner) -> SenderState:
+    """Deserialize a blob produced by pack_sender_state (this or an earlier format)"""
+    version, history, relationships, log_seq, *rest = marshal.loads(blob)
+    if version in (STATE_FORMAT_VERSION, _NO_HOUR_PROFILE_VERSION):
+        relationships = ReceiverRelationships.from_state(relationships, interner)
+    elif version == _DICT_RELATIONSHIPS_VERSION:
+        relationships = ReceiverRelationships.from_counts(relationships, interner)
+    else:
+        raise ValueError(f"Unsupported sender state format version {version}")
+    history = SenderHistory.from_state(history, interner)
+    if version == STATE_FORMAT_VERSION:
+        hours = HourProfile.from_state(rest[0])
+    else:
+        # Seed the profile from the transactions still in the ring (UTC hours)
+        hours = HourProfile.from_times(time_us for time_us, _, _ in history.entries())
+    return SenderState(history, relationships, log_seq, hours)
+
+
+class StateStore(ABC):
+    """Interface shared by FraudDetector and PaymentService state backends"""
+
+    def __init__(self):
+        # Receiver IDs in history rings and counters are interned to process-local
+        # integers, held by the senders in memory (see release_sender_state)
+        self.interner = ReceiverInterner()
+
+    # ---------- Sender state ----------
+    @abstractmethod
+    def sender(self, sender_id: str) -> ContextManager[SenderState]:
+        """
+        Context manager yielding the sender's state (created empty if unseen).
+        Changes made inside the block are persisted atomically on exit.
+        """
+
+    def session(self) -> ContextManager[None]:
+        """Group several sender() calls into one round trip / transaction"""
+        return nullcontext()
+
+    def prefetch(self, sender_ids: Iterable[str]):
+        """Load several senders at once inside a session (no-op where loads are free)"""
+
+    @abstractmethod
+    def sender_count(self) -> int:
+        """Number of senders with stored state"""
+
+    @abstractmethod
+    def clear_senders(self):
+        """Remove all sender state"""
+
+    def state_stats(self) -> Dict[str, int]:
+        """
+        Size of the stored sender state for monitoring: "senders", and where
+        cheap to compute, "transactions" (history entries) and "bytes"
+        """
+        return {"senders": self.sender_count()}
+
+    # ---------- Payments ----------
+    @abstractmethod
+    def put_payment(self, result: PaymentResult):
+        """Insert or replace a payment by payment_id"""
+
+    @abstractmethod
+    def get_payment(self, payment_id: str) -> Optional[PaymentResult]:
+        """Look up a payment by ID"""
+
+    @abstractmethod
+    def list_payments(
+        self,
+        sender_id: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[PaymentResult], Optional[str]]:
+        """
+        One page of stored payments, newest first, optionally filtered by
+        sender, status and processed time ([since, until), UTC ISO strings).
+        Returns (payments, next_cursor); next_cursor is None on the last page.
+        """
+
+    @abstractmethod
+    def payment_count(self) -> int:
+        """Number of stored payments"""
+
+    @abstractmethod
+    def clear_payments(self):
+        """Remove all payments"""
+
+    # ---------- Lifecycle ----------
+    def close(self):
+        """Release any resources held by the store"""
+
+
+class SenderSpill:
+    """
+    Local SQLite file holding the packed state of senders evicted from
+    memory, until their next transaction loads them back.
+
+    Writes are buffered and committed _FLUSH_EVERY at a time, since a commit
+    costs far more than the row: up to that many of the latest evictions
+    (and reloads) are lost on a crash. Commits are not fsynced (WAL,
+    synchronous=NORMAL).
+    """
+
+    _FLUSH_EVERY = 64
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        # Not yet committed: evicted states, and reloaded senders whose rows are to be deleted
+        self._puts: Dict[str, bytes] = {}
+        self._deletes: set = set()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS senders (sender_id TEXT PRIMARY KEY, state BLOB NOT NULL) WITHOUT ROWID"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._flush()
+            return self._conn.execute("SELECT COUNT(*) FROM senders").fetchone()[0]
+
+    def put(self, sender_id: str, blob: bytes):
+        with self._lock:
+            self._deletes.discard(sender_id)
+            self._puts[sender_id] = blob
+            if len(self._puts) + len(self._deletes) >= self._FLUSH_EVERY:
+                self._flush()
+
+    def take(self, sender_id: str) -> Optional[bytes]:
+        """Remove and return a sender's packed state, or None if it was not spilled"""
+        with self._lock:
+            blob = self._puts.pop(sender_id, None)
+            if blob is None and sender_id not in self._deletes:
+                row = self._conn.execute("SELECT state FROM senders WHERE sender_id = ?", (sender_id,)).fetchone()
+                if row is None:
+                    return None
+                blob = row[0]
+            if blob is None:
+                return None
+            # An older row may be committed even when the latest state was still buffered
+            self._deletes.add(sender_id)
+            if len(self._puts) + len(self._deletes) >= self._FLUSH_EVERY:
+                self._flush()
+            return blob
+
+    def flush(self):
+        """Commit buffered writes now"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._puts and not self._deletes:
+            return
+        conn = self._conn
+        conn.execute("BEGIN")
+        conn.executemany("DELETE FROM senders WHERE sender_id = ?", ((sender_id,) for sender_id in self._deletes))
+        conn.executemany("INSERT OR REPLACE INTO senders (sender_id, state) VALUES (?, ?)", self._puts.items())
+        conn.execute("COMMIT")
+        self._puts.clear()
+        self._deletes.clear()
+
+    def clear(self):
+        with self._lock:
+            self._puts.clear()
+            self._deletes.clear()
+            self._conn.execute("DELETE FROM senders")
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+
+class InMemoryStateStore(StateStore):
+    """
+    Process-local store; per-sender atomicity via lock striping.
+
+    Optionally bounded: past `max_senders` senders or `max_bytes` of
+    estimated state, and for senders idle longer than `idle_ttl_s`, the
+    least recently active senders are evicted, a few per sender() call (so
+    there is never a full sweep). Evicted senders are dropped, or written to
+    `spill` and loaded back on their next transaction.
+    """
+
+    def __init__(self, payment_max_entries: int = 100_000, payment_ttl_s: float = 86_400, max_senders: int = 0,
+                 max_bytes: int = 0, idle_ttl_s: float = 0, spill: Optional[SenderSpill] = None):
+        """
+        Args:
+            payment_max_entries: Payments kept at most (0 for no limit)
+            payment_ttl_s: Seconds a payment is kept (0 for no limit)
+            max_senders: Senders kept in memory at most (0 for no limit)
+            max_bytes: Estimated bytes of sender state kept at most (0 for no limit)
+            idle_ttl_s: Evict senders inactive for this many seconds (0 to keep them)
+            spill: Where evicted senders go (dropped when None)
+        """
+        super().__init__()
+        # Format: {"sender_id": SenderState}, least recently active first when bounded
+        self.senders: Dict[str, SenderState] = OrderedDict()
+        # Bounded payment history indexed by ID, sender, status and processed time
+        self.payments = PaymentHistory(payment_max_entries, payment_ttl_s)
+        # Unrelated senders almost never share a stripe
+        self.sender_locks = StripedLock()
+
+        self.max_senders = max_senders
+        self.max_bytes = max_bytes
+        self.idle_ttl_s = idle_ttl_s
+        self.spill = spill
+        self.bounded = bool(max_senders or max_bytes or idle_ttl_s)
+        # Estimated bytes of resident sender state (tracked only with max_bytes)
+        self.resident_bytes = 0
+        self.evictions = {"budget": 0, "idle": 0}
+        self.reloads = 0
+        self._budget_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._next_idle_check = 0.0
+
+    @contextmanager
+    def sender(self, sender_id: str) -> Iterator[SenderState]:
+        if not self.bounded:
+            with self.sender_locks.for_key(sender_id):
+                state = self.senders.get(sender_id)
+                if state is None:
+                    state = self.senders[sender_id] = SenderState()
+                yield state
+            return
+
+        with self.sender_locks.for_key(sender_id):
+            state = self.senders.get(sender_id)
+            if state is None:
+                state = self.senders[sender_id] = self._load(sender_id)
+                before = 0
+            else:
+                self.senders.move_to_end(sender_id)
+                before = estimate_sender_bytes(state) if self.max_bytes else 0
+            try:
+                yield state
+            finally:
+                now = state.last_active = time.monotonic()
+                if self.max_bytes:
+                    with self._budget_lock:
+                        self.resident_bytes += estimate_sender_bytes(state) - before
+        if self._over_budget() or (self.idle_ttl_s and now >= self._next_idle_check):
+            self._evict(now)
+
+    def _load(self, sender_id: str) -> SenderState:
+        """State of a sender not in memory: reloaded from the spill file, or new"""
+        blob = self.spill.take(sender_id) if self.spill is not None else None
+        if blob is None:
+            return SenderState()
+        with self._budget_lock:
+            self.reloads += 1
+        return unpack_sender_state(blob, self.interner)
+
+    def _over_budget(self) -> bool:
+        return bool(
+            (self.max_senders and len(self.senders) > self.max_senders)
+            or (self.max_bytes and self.resident_bytes > self.max_bytes)
+        )
+
+    def _evict(self, now: float):
+        """
+        Evict up to _EVICT_BATCH least recently active senders that are over
+        budget or idle. Stops at a sender in use (its lock is taken): it is
+        about to become the most recently active one.
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            for _ in range(_EVICT_BATCH):
+                try:
+                    sender_id, state = next(iter(self.senders.items()))
+                except (StopIteration, RuntimeError):
+                    # Empty, or reordered by another thread while peeking
+                    return
+                if self._over_budget():
+                    reason = "budget"
+                elif self.idle_ttl_s and now - state.last_active > self.idle_ttl_s:
+                    reason = "idle"
+                else:
+                    # The oldest sender is within the TTL, so every other one is too
+                    self._next_idle_check = now + _IDLE_CHECK_INTERVAL_S
+                    return
+
+                lock = self.sender_locks.for_key(sender_id)
+                if not lock.acquire(blocking=False):
+                    return
+                try:
+                    if self.senders.get(sender_id) is not state:
+                        continue
+                    if self.spill is not None:
+                        self.spill.put(sender_id, pack_sender_state(state, self.interner))
+                    del self.senders[sender_id]
+                    release_sender_state(state, self.interner)
+                finally:
+                    lock.release()
+                if self.max_bytes:
+                    with self._budget_lock:
+                        self.resident_bytes -= estimate_sender_bytes(state)
+                self.evictions[reason] += 1
+        finally:
+            self._evict_lock.release()
+
+    def sender_count(self) -> int:
+        return len(self.senders)
+
+    def clear_senders(self):
+        self.senders.clear()
+        self.interner = ReceiverInterner()
+        with self._budget_lock:
+            self.resident_bytes = 0
+        if self.spill is not None:
+            self.spill.clear()
+
+    def state_stats(self) -> Dict[str, int]:
+        # Unlocked read: a sender updated mid-scan is counted before or after, never torn
+        senders = transactions = estimated = 0
+        for state in list(self.senders.values()):
+            senders += 1
+            transactions += len(state.history)
+            estimated += estimate_sender_bytes(state)
+        stats = {
+            "senders": senders,
+            "transactions": transactions,
+            "bytes": estimated,
+            "interned_receivers": len(self.interner)
+        }
+        if self.bounded:
+            stats["evicted_budget"] = self.evictions["budget"]
+            stats["evicted_idle"] = self.evictions["idle"]
+        if self.spill is not None:
+            stats["spilled"] = len(self.spill)
+            stats["reloaded"] = self.reloads
+        return stats
+
+    def export_senders(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Yield (sender_id, packed state) for every sender in memory, each packed
+        under its own lock. Spilled senders stay in the spill file, which is
+        committed first so a snapshot never depends on buffered evictions.
+        """
+        if self.spill is not None:
+            self.spill.flush()
+        for sender_id in list(self.senders):
+            with self.sender_locks.for_key(sender_id):
+                state = self.senders.get(sender_id)
+                if state is None:
+                    continue
+                blob = pack_sender_state(state, self.interner)
+            yield sender_id, blob
+
+    def import_sender(self, sender_id: str, blob: bytes):
+        """
+        Install a packed state (from export_senders) for a sender. Bounds
+        apply as to any other sender: restoring a snapshot larger than
+        max_senders or max_bytes evicts (or spills) the oldest senders.
+        """
+        state = unpack_sender_state(blob, self.interner)
+        now = state.last_active = time.monotonic()
+        previous = self.senders.get(sender_id)
+        self.senders[sender_id] = state
+        if previous is not None:
+            self.senders.move_to_end(sender_id)
+            release_sender_state(previous, self.interner)
+        if self.max_bytes:
+            with self._budget_lock:
+                self.resident_bytes += estimate_sender_bytes(state)
+                if previous is not None:
+                    self.resident_bytes -= estimate_sender_bytes(previous)
+        if self._over_budget():
+            self._evict(now)
+
+    def put_payment(self, result: PaymentResult):
+        self.payments.put(result)
+
+    def get_payment(self, payment_id: str) -> Optional[PaymentResult]:
+        return self.payments.get(payment_id)
+
+    def list_payments(self, sender_id=None, status=None, since=None, until=None, cursor=None, limit=100):
+        return self.payments.page(sender_id, status, since, until, cursor, limit)
+
+    def payment_count(self) -> int:
+        return len(self.payments)
+
+    def clear_payments(self):
+        self.payments.clear()
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Host-wide store shared by all worker processes through one SQLite file.
+
+    Sender state is kept as one packed blob per sender. A session is a single
+    write transaction (BEGIN IMMEDIATE): senders are read once, mutated in
+    memory and written back together with one executemany at commit.
+
+    Payments are paged by rowid (insertion order; upserts keep it) through
+    indexes on sender, status and processed time. Expired and excess
+    payments are deleted every _EVICT_EVERY writes.
+    """
+
+    # SQLite's default bound-parameter limit is 999 on older builds
+    _PREFETCH_CHUNK = 500
+    # Payment writes between eviction passes
+    _EVICT_EVERY = 256
+
+    def __init__(self, path: str, busy_timeout_ms: int = 10000, payment_max_entries: int = 100_000,
+                 payment_ttl_s: float = 86_400):
+        super().__init__()
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.payment_max_entries = payment_max_entries
+        self.payment_ttl_s = payment_ttl_s
+        self._payment_writes = 0
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS senders (
+                sender_id TEXT PRIMARY KEY,
+                state BLOB NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS payments (
+                payment_id TEXT PRIMARY KEY,
+                sender_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                processed_at TEXT NOT NULL,
+                result TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS payments_by_sender ON payments (sender_id);
+            CREATE INDEX IF NOT EXISTS payments_by_status ON payments (status);
+            CREATE INDEX IF NOT EXISTS payments_by_time ON payments (processed_at);
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One autocommit connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.session = None
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        conn = self._connection()
+        if self._local.session is not None:
+            # Nested: join the enclosing transaction
+            yield
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        states = self._local.session = {}
+        try:
+            yield
+            conn.executemany(
+                "INSERT INTO senders (sender_id, state) VALUES (?, ?) "
+                "ON CONFLICT(sender_id) DO UPDATE SET state = excluded.state",
+                [(sender_id, pack_sender_state(state, self.interner)) for sender_id, state in states.items()]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.session = None
+            # States live for one session only
+            for state in states.values():
+                release_sender_state(state, self.interner)
+
+    def prefetch(self, sender_ids: Iterable[str]):
+        conn = self._connection()
+        cache = self._local.session
+        if cache is None:
+            return
+
+        missing = [sender_id for sender_id in set(sender_ids) if sender_id not in cache]
+        for start in range(0, len(missing), self._PREFETCH_CHUNK):
+            chunk = missing[start:start + self._PREFETCH_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT sender_id, state FROM senders WHERE sender_id IN ({placeholders})", chunk
+            )
+            for sender_id, blob in rows:
+                cache[sender_id] = unpack_sender_state(blob, self.interner)
+            for sender_id in chunk:
+                cache.setdefault(sender_id, SenderState())
+
+    @contextmanager
+    def sender(self, sender_id: str) -> Iterator[SenderState]:
+        with self.session():
+            cache = self._local.session
+            state = cache.get(sender_id)
+            if state is None:
+                row = self._local.conn.execute(
+                    "SELECT state FROM senders WHERE sender_id = ?", (sender_id,)
+                ).fetchone()
+                state = unpack_sender_state(row[0], self.interner) if row else SenderState()
+                cache[sender_id] = state
+            yield state
+
+    def sender_count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM senders").fetchone()[0]
+
+    def clear_senders(self):
+        self._connection().execute("DELETE FROM senders")
+
+    def state_stats(self) -> Dict[str, int]:
+        # History lengths are inside the packed blobs; report their stored size instead
+        senders, stored = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM senders"
+        ).fetchone()
+        return {"senders": senders, "bytes": stored}
+
+    def put_payment(self, result: PaymentResult):
+        conn = self._connection()
+        # Upsert rather than REPLACE so a status update keeps the payment's rowid (its page position)
+        conn.execute(
+            "INSERT INTO payments (payment_id, sender_id, status, processed_at, result) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(payment_id) DO UPDATE SET sender_id = excluded.sender_id, status = excluded.status, "
+            "result = excluded.result",
+            (result.payment_id, result.sender_id, result.status, result.processed_at, result.model_dump_json())
+        )
+        self._payment_writes += 1
+        if self._payment_writes % self._EVICT_EVERY == 0:
+            self._evict_payments(conn)
+
+    def _payment_cutoff(self) -> Optional[str]:
+        """Oldest processed_at still within the TTL, or None without a TTL"""
+        if not self.payment_ttl_s:
+            return None
+        return (datetime.utcnow() - timedelta(seconds=self.payment_ttl_s)).isoformat(timespec="microseconds") + "Z"
+
+    def _evict_payments(self, conn: sqlite3.Connection):
+        cutoff = self._payment_cutoff()
+        if cutoff is not None:
+            conn.execute("DELETE FROM payments WHERE processed_at < ?", (cutoff,))
+        if self.payment_max_entries:
+            # Rows are only deleted from the old end, so live rowids are (nearly) contiguous
+            conn.execute(
+                "DELETE FROM payments WHERE rowid <= (SELECT MAX(rowid) FROM payments) - ?",
+                (self.payment_max_entries,)
+            )
+
+    def get_payment(self, payment_id: str) -> Optional[PaymentResult]:
+        row = self._connection().execute(
+            "SELECT result, processed_at FROM payments WHERE payment_id = ?", (payment_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        cutoff = self._payment_cutoff()
+        if cutoff is not None and row[1] < cutoff:
+            return None
+        return PaymentResult.model_validate_json(row[0])
+
+    def list_payments(self, sender_id=None, status=None, since=None, until=None, cursor=None, limit=100):
+        conditions = []
+        params: list = []
+        upper = parse_cursor(cursor)
+        cutoff = self._payment_cutoff()
+        if cutoff is not None and (since is None or since < cutoff):
+            since = cutoff
+        for clause, value in (
+            ("sender_id = ?", sender_id),
+            ("status = ?", status),
+            ("processed_at >= ?", since),
+            ("processed_at < ?", until),
+            ("rowid < ?", upper)
+        ):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT rowid, result FROM payments {where}ORDER BY rowid DESC LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+
+        payments = [PaymentResult.model_validate_json(result) for _, result in rows[:limit]]
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return payments, next_cursor
+
+    def payment_count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+
+    def clear_payments(self):
+        self._connection().execute("DELETE FROM payments")
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_state_store(backend: str, path: str, payment_max_entries: int = 100_000,
+                       payment_ttl_s: float = 86_400, max_senders: int = 0, max_bytes: int = 0,
+                       idle_ttl_s: float = 0, spill: Optional[SenderSpill] = None) -> StateStore:
+    """
+    Build the configured state store ("memory" or "sqlite"). The sender
+    budget and spill apply to the memory backend; SQLite keeps state on disk.
+    """
+    if backend == "memory":
+        return InMemoryStateStore(payment_max_entries, payment_ttl_s, max_senders, max_bytes, idle_ttl_s, spill)
+    if backend == "sqlite":
+        return SQLiteStateStore(path, payment_max_entries=payment_max_entries, payment_ttl_s=payment_ttl_s)
+    raise ValueError(f"Unknown state backend '{backend}' (expected 'memory' or 'sqlite')")
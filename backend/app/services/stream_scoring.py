@@ -0,0 +1,202 @@
+"""
+Streaming Scoring
+
+Generator pipeline for scoring newline-delimited JSON transactions, shared
+by the /api/evaluate-stream endpoint and the `python -m app.replay` CLI:
+
+    raw bytes -> LineSplitter -> chunks of lines -> score_chunk -> NDJSON bytes
+
+Every stage pulls from the one before it and holds at most one chunk of
+transactions, so memory stays constant whatever the input size. Scoring a
+chunk goes through FraudDetector.evaluate_batch, which applies items in
+input order, so results are identical to one call per transaction.
+"""
+
+import json
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from pydantic_core import to_json
+
+from app.models.schemas import TransactionRequest
+from app.services.fraud_detector import FraudDetector
+from app.services.scoring_pool import ScoringPool
+
+# Longest accepted input line; longer lines are reported and skipped
+MAX_LINE_BYTES = 64 * 1024
+
+
+class ThroughputReport:
+    """Running counters for one stream"""
+
+    __slots__ = ("received", "scored", "errors", "blocked", "started")
+
+    def __init__(self):
+        self.received = 0
+        self.scored = 0
+        self.errors = 0
+        self.blocked = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, float]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "received": self.received,
+            "scored": self.scored,
+            "errors": self.errors,
+            "blocked": self.blocked,
+            "elapsed_s": round(elapsed, 3),
+            "transactions_per_s": round(self.scored / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+class LineSplitter:
+    """
+    Splits arbitrary byte chunks into numbered lines.
+
+    Blank lines are skipped (but counted). A line longer than max_line_bytes
+    is not buffered: it is returned as None so the caller can report it.
+    """
+
+    def __init__(self, max_line_bytes: int = MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._line_no = 0
+        # Discarding the rest of an oversized line
+        self._skipping = False
+
+    def feed(self, data: bytes) -> List[Tuple[int, Optional[bytes]]]:
+        """Lines completed by `data`, as (line number, line or None if oversized)"""
+        lines = []
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            self._emit(lines, data[start:end])
+            start = end + 1
+
+        if start < len(data):
+            if not self._skipping:
+                self._buffer += data[start:]
+                if len(self._buffer) > self.max_line_bytes:
+                    self._line_no += 1
+                    lines.append((self._line_no, None))
+                    self._buffer.clear()
+                    self._skipping = True
+        return lines
+
+    def close(self) -> List[Tuple[int, Optional[bytes]]]:
+        """The final line if the input did not end with a newline"""
+        lines = []
+        if self._buffer and not self._skipping:
+            self._emit(lines, b"")
+        self._buffer.clear()
+        self._skipping = False
+        return lines
+
+    def _emit(self, lines: list, tail: bytes):
+        if self._skipping:
+            # End of an oversized line that was already reported
+            self._skipping = False
+            return
+        if self._buffer:
+            self._buffer += tail
+            line = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            line = tail
+        self._line_no += 1
+        if len(line) > self.max_line_bytes:
+            lines.append((self._line_no, None))
+        elif line.strip():
+            lines.append((self._line_no, line))
+
+
+def score_chunk(
+    detector: Union[FraudDetector, ScoringPool],
+    lines: List[Tuple[int, Optional[bytes]]],
+    report: ThroughputReport,
+    fast: Optional[bool] = None,
+    compact: bool = False
+) -> bytes:
+    """
+    Score one chunk of numbered NDJSON lines.
+    
+    Args:
+        detector: Detector, or scoring pool, whose evaluate_batch scores the chunk
+        compact: Write the codes-and-numbers form of each response
+
+    Returns:
+        One NDJSON output line per input line, in input order: the
+        TransactionResponse, or {"line": n, "error": "..."} for a line that
+        is not a valid TransactionRequest
+    """
+    outputs: List[Optional[bytes]] = []
+    transactions: List[TransactionRequest] = []
+    slots: List[int] = []
+    for line_no, line in lines:
+        report.received += 1
+        try:
+            if line is None:
+                raise ValueError(f"Line exceeds {MAX_LINE_BYTES} bytes")
+            transaction = TransactionRequest.model_validate_json(line)
+        except (ValidationError, ValueError) as e:
+            report.errors += 1
+            message = error_message(e)
+            outputs.append(json.dumps({"line": line_no, "error": message}).encode())
+            continue
+        slots.append(len(outputs))
+        outputs.append(None)
+        transactions.append(transaction)
+
+    for slot, result in zip(slots, detector.evaluate_batch(transactions, fast=fast)):
+        if compact:
+            outputs[slot] = to_json(result.to_compact())
+        else:
+            outputs[slot] = result.model_dump_json(exclude_none=True).encode()
+        report.blocked += result.decision == "block"
+    report.scored += len(transactions)
+
+    return b"\n".join(outputs) + b"\n" if outputs else b""
+
+
+def chunked(lines: List[Tuple[int, Optional[bytes]]], chunk_size: int) -> Iterator[List[Tuple[int, Optional[bytes]]]]:
+    """Split the lines completed by one input block into scoring chunks"""
+    for start in range(0, len(lines), chunk_size):
+        yield lines[start:start + chunk_size]
+
+
+def score_stream(
+    detector: FraudDetector,
+    data: Iterable[bytes],
+    report: ThroughputReport,
+    chunk_size: int = 500,
+    fast: Optional[bool] = None
+) -> Iterator[bytes]:
+    """
+    Score an NDJSON byte stream block by block (synchronous pipeline).
+
+    Lines are scored as soon as the block completing them arrives, and the
+    next block is only read once the consumer has taken the output, so a
+    slow consumer holds back the reader and memory is bounded by one block.
+
+    Yields:
+        NDJSON output bytes, one chunk at a time
+    """
+    splitter = LineSplitter()
+    for block in data:
+        for chunk in chunked(splitter.feed(block), chunk_size):
+            yield score_chunk(detector, chunk, report, fast)
+    for chunk in chunked(splitter.close(), chunk_size):
+        yield score_chunk(detector, chunk, report, fast)
+
+
+def error_message(error: ValueError) -> str:
+    """First validation problem of a rejected line or message, prefixed with its field"""
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        location = ".".join(str(part) for part in first["loc"])
+        return f"{location}: {first['msg']}" if location else first["msg"]
+    return str(error)
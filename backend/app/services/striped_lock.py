@@ -0,0 +1,26 @@
+"""
+Striped Locking
+
+A fixed pool of locks indexed by key hash. Operations on the same key
+always take the same lock, while unrelated keys almost never contend,
+without keeping one lock object per key.
+"""
+
+import threading
+from typing import List
+
+
+class StripedLock:
+    """Maps keys (e.g. sender IDs) onto one of `stripes` locks"""
+
+    __slots__ = ("_locks",)
+
+    def __init__(self, stripes: int = 256):
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(stripes)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def for_key(self, key: str) -> threading.Lock:
+        """Return the lock guarding `key`"""
+        return self._locks[hash(key) % len(self._locks)]
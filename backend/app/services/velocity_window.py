@@ -0,0 +1,80 @@
+"""
+Velocity Window
+
+Time-ordered index of a sender's stored transaction times, used to answer
+"how many transactions in the last N hours" with a binary search instead
+of scanning the sender's whole history.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta, timezone
+
+_EPOCH_AWARE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+MICROSECONDS_PER_HOUR = 3600 * 1_000_000
+
+
+def to_epoch_us(timestamp: datetime) -> int:
+    """
+    Convert a datetime to integer microseconds since the Unix epoch.
+
+    Integer microseconds keep comparisons exact (same resolution as datetime).
+    Naive datetimes are treated as UTC.
+    """
+    if timestamp.tzinfo is None:
+        return (timestamp - _EPOCH_NAIVE) // _MICROSECOND
+    return (timestamp - _EPOCH_AWARE) // _MICROSECOND
+
+
+class VelocityWindow:
+    """
+    Sorted multiset of transaction times (epoch microseconds) for one sender.
+
+    Times are kept sorted on insert, so out-of-order and backdated
+    transactions are placed correctly and window counts stay exact.
+    """
+
+    __slots__ = ("_times",)
+
+    def __init__(self):
+        # Packed int64 array: 8 bytes per stored time
+        self._times = array("q")
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def add(self, time_us: int):
+        """Insert a transaction time"""
+        insort(self._times, time_us)
+
+    def remove(self, time_us: int):
+        """Remove one occurrence of a transaction time (used when history is trimmed)"""
+        index = bisect_left(self._times, time_us)
+        if index < len(self._times) and self._times[index] == time_us:
+            del self._times[index]
+
+    def count_after(self, threshold_us: int) -> int:
+        """Number of stored times strictly later than threshold_us"""
+        return len(self._times) - bisect_right(self._times, threshold_us)
+
+    def count_recent(self, current_us: int, hours: int = 1) -> int:
+        """Number of stored times within `hours` before current_us (or later)"""
+        return self.count_after(current_us - hours * MICROSECONDS_PER_HOUR)
+
+    def clear(self):
+        """Remove all stored times"""
+        del self._times[:]
+
+    def to_state(self) -> bytes:
+        """Packed sorted times (see from_state)"""
+        return self._times.tobytes()
+
+    @classmethod
+    def from_state(cls, state: bytes) -> "VelocityWindow":
+        """Rebuild a window from to_state() output"""
+        window = cls()
+        window._times.frombytes(state)
+        return window
@@ -0,0 +1,65 @@
+"""
+Batch Evaluation Benchmark
+
+Compares throughput of scoring N transactions through the single-item
+route (/api/evaluate-transaction, one request each) against one call to
+the bulk route (/api/evaluate-transactions), both in-process via
+FastAPI's TestClient.
+
+Usage (TestClient needs httpx: pip install "httpx<0.28"):
+    python -m benchmarks.bench_batch [N]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_fraud_detector
+from app.main import app
+from app.services.fraud_detector import FraudDetector
+
+
+def generate(count: int, seed: int = 11) -> list:
+    """Seeded synthetic transactions over 500 senders"""
+    rng = random.Random(seed)
+    start = datetime(2026, 2, 15, 8, 0)
+    return [
+        {
+            "amount": round(rng.uniform(5, 20000), 2),
+            "sender_id": f"user_{rng.randrange(500)}",
+            "receiver_id": rng.choice(["merchant_1", "merchant_2", "merchant_3", "flagged_account_1"]),
+            "timestamp": (start + timedelta(seconds=37 * n)).isoformat() + "Z"
+        }
+        for n in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    transactions = generate(count)
+    client = TestClient(app)
+
+    detector = FraudDetector()
+    app.dependency_overrides[get_fraud_detector] = lambda: detector
+    started = time.perf_counter()
+    single = [client.post("/api/evaluate-transaction", json=tx).json() for tx in transactions]
+    single_elapsed = time.perf_counter() - started
+
+    detector = FraudDetector()
+    started = time.perf_counter()
+    bulk = client.post("/api/evaluate-transactions", json=transactions).json()
+    bulk_elapsed = time.perf_counter() - started
+
+    assert single == bulk, "bulk results differ from sequential results"
+
+    print(f"transactions: {count}")
+    print(f"single-item route: {count / single_elapsed:>10,.0f} tx/s ({single_elapsed:.2f}s)")
+    print(f"bulk route:        {count / bulk_elapsed:>10,.0f} tx/s ({bulk_elapsed:.2f}s)")
+    print(f"speedup:           {single_elapsed / bulk_elapsed:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Concurrency Stress Benchmark
+
+Hammers one shared FraudDetector from multiple threads, with senders
+deliberately shared between threads, then checks that no updates were
+lost: every sender's relationship counters, history ring, running
+statistics and velocity window must account for exactly the
+transactions submitted for it. Reports throughput per thread count.
+
+Usage:
+    python -m benchmarks.bench_concurrency [ops_per_thread]
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app.services.fraud_detector import FraudDetector
+
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+SENDERS = 64
+
+
+def worker(detector: FraudDetector, seed: int, ops: int, submitted: Counter, submitted_lock: threading.Lock,
+           barrier: threading.Barrier):
+    """Submit `ops` transactions over a sender pool shared with all other threads"""
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1, 9, 0)
+    local = Counter()
+    barrier.wait()
+    for n in range(ops):
+        sender_id = f"sender_{rng.randrange(SENDERS)}"
+        detector.evaluate_transaction(
+            amount=round(rng.uniform(5, 5000), 2),
+            sender_id=sender_id,
+            receiver_id=f"merchant_{rng.randrange(8)}",
+            timestamp=(start + timedelta(seconds=rng.randrange(86400))).isoformat() + "Z"
+        )
+        local[sender_id] += 1
+    with submitted_lock:
+        submitted.update(local)
+
+
+def verify(detector: FraudDetector, submitted: Counter):
+    """Raise AssertionError if any sender's state lost an update"""
+    for sender_id, count in submitted.items():
+        state = detector.store.senders[sender_id]
+        relationships = state.relationships.transactions
+        history = state.history
+        expected_len = min(count, history.capacity)
+        assert relationships == count, f"{sender_id}: {relationships} relationship updates, expected {count}"
+        assert len(history) == expected_len, f"{sender_id}: history {len(history)}, expected {expected_len}"
+        assert history.amount_stats.count == expected_len, f"{sender_id}: stats out of step"
+        assert len(history.velocity) == expected_len, f"{sender_id}: velocity window out of step"
+
+
+def main():
+    ops_per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # Switch threads often to maximise interleaving
+    sys.setswitchinterval(1e-6)
+
+    print(f"{'threads':>7} | {'total ops':>9} | {'ops/sec':>10} | lost updates")
+    print(f"{'-' * 7}-+-{'-' * 9}-+-{'-' * 10}-+-------------")
+    for thread_count in THREAD_COUNTS:
+        detector = FraudDetector()
+        submitted = Counter()
+        submitted_lock = threading.Lock()
+        barrier = threading.Barrier(thread_count + 1)
+        threads = [
+            threading.Thread(target=worker, args=(detector, seed, ops_per_thread, submitted, submitted_lock, barrier))
+            for seed in range(thread_count)
+        ]
+        for thread in threads:
+            thread.start()
+
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        verify(detector, submitted)
+        total = thread_count * ops_per_thread
+        print(f"{thread_count:>7} | {total:>9} | {total / elapsed:>10,.0f} | none")
+
+
+if __name__ == "__main__":
+    main()
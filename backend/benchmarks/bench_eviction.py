@@ -0,0 +1,76 @@
+"""
+Sender Budget Benchmark
+
+Scores a stream in which new senders keep arriving (a large seeded sender
+population, so most senders are seen once or twice) against:
+
+- an unbounded memory store (the default)
+- a sender-count budget, and an estimated-bytes budget, dropping evicted senders
+- the same count budget spilling evicted senders to a local SQLite file
+
+and reports throughput, resident senders and estimated bytes, evictions,
+reloads, and the responses that differ from the unbounded store (history
+lost to eviction; none with a spill).
+
+Usage:
+    python -m benchmarks.bench_eviction [transactions] [senders]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from app.services.fraud_detector import FraudDetector
+from app.services.state_store import InMemoryStateStore, SenderSpill
+from benchmarks.workload import TransactionGenerator
+
+SEED = 20260302
+
+
+def run(transactions: list, store: InMemoryStateStore):
+    detector = FraudDetector(store=store)
+    started = time.perf_counter()
+    scores = [detector.evaluate_transaction(*transaction).risk_score for transaction in transactions]
+    return time.perf_counter() - started, scores
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    senders = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    logging.disable(logging.INFO)
+    transactions = TransactionGenerator(SEED, senders, "normal").take(count)
+    budget = senders // 10
+
+    unbounded = InMemoryStateStore()
+    _, baseline = run(transactions, unbounded)
+    full_bytes = unbounded.state_stats()["bytes"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        configs = (
+            ("unbounded", lambda: InMemoryStateStore()),
+            (f"max {budget:,} senders", lambda: InMemoryStateStore(max_senders=budget)),
+            (f"max {full_bytes // 10 / 1e6:.1f} MB", lambda: InMemoryStateStore(max_bytes=full_bytes // 10)),
+            (f"max {budget:,} + spill", lambda: InMemoryStateStore(
+                max_senders=budget, spill=SenderSpill(os.path.join(directory, "spill.db"))
+            )),
+        )
+        print(f"{count:,} transactions over {senders:,} senders\n")
+        print(f"{'store':>20} | {'tx/s':>7} | {'resident':>8} | {'MB':>6} | {'evicted':>7} | {'reloaded':>8} | "
+              f"{'changed':>7}")
+        print(f"{'-' * 20}-+-{'-' * 7}-+-{'-' * 8}-+-{'-' * 6}-+-{'-' * 7}-+-{'-' * 8}-+-{'-' * 7}")
+        for label, build in configs:
+            store = build()
+            elapsed, scores = run(transactions, store)
+            stats = store.state_stats()
+            changed = sum(score != expected for score, expected in zip(scores, baseline))
+            print(
+                f"{label:>20} | {count / elapsed:>7,.0f} | {stats['senders']:>8,} | {stats['bytes'] / 1e6:>6.1f} | "
+                f"{stats.get('evicted_budget', 0):>7,} | {stats.get('reloaded', 0):>8,} | {changed / count:>7.1%}"
+            )
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
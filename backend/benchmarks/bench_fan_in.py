@@ -0,0 +1,75 @@
+"""
+Receiver Fan-In Benchmark
+
+Feeds the fan-in index three kinds of receivers and reports, per kind, the
+cost of add() and count(), the largest distinct-sender count seen, and the
+entries held once the stream ends:
+
+- spread: payments to 2,000 merchants, as in the synthetic workload
+- hot: every payment to one merchant, from many distinct senders (the
+  per-receiver cap keeps its memory bounded)
+- mule: a fresh account paid by 40 distinct senders within five minutes,
+  inside ordinary traffic
+
+Usage:
+    python -m benchmarks.bench_fan_in [payments]
+"""
+
+import random
+import sys
+import time
+
+from app.services.receiver_fan_in import MAX_SENDERS, ReceiverFanIn
+from app.services.velocity_window import to_epoch_us
+from benchmarks.workload import START
+
+SEED = 20260302
+GAP_US = 500_000
+
+
+def stream(kind: str, count: int) -> list:
+    rng = random.Random(SEED)
+    start_us = to_epoch_us(START)
+    payments = []
+    for n in range(count):
+        receiver = "merchant_hot" if kind == "hot" else f"merchant_{rng.randrange(2000)}"
+        payments.append((receiver, f"sender_{rng.randrange(100_000)}", start_us + n * GAP_US))
+    if kind == "mule":
+        middle = count // 2
+        for n in range(40):
+            index = middle + n * 15
+            payments[index] = ("mule_account", f"victim_{n}", payments[index][2])
+    return payments
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"{count:,} payments, {GAP_US / 1e6:.1f}s apart, 10-minute window, cap {MAX_SENDERS} senders\n")
+    print(f"{'receivers':>9} | {'add us':>6} | {'count us':>8} | {'max fan-in':>10} | {'tracked':>7} | {'events':>7}")
+    print(f"{'-' * 9}-+-{'-' * 6}-+-{'-' * 8}-+-{'-' * 10}-+-{'-' * 7}-+-{'-' * 7}")
+    for kind in ("spread", "hot", "mule"):
+        payments = stream(kind, count)
+        fan_in = ReceiverFanIn(window_s=600)
+
+        peak = 0
+        started = time.perf_counter()
+        for receiver_id, sender_id, time_us in payments:
+            fan_in.add(receiver_id, sender_id, time_us)
+        add_us = (time.perf_counter() - started) / count * 1e6
+
+        fan_in.clear()
+        counting = 0.0
+        for receiver_id, sender_id, time_us in payments:
+            started = time.perf_counter()
+            senders = fan_in.count(receiver_id, sender_id, time_us)
+            counting += time.perf_counter() - started
+            peak = max(peak, senders if kind != "mule" or receiver_id == "mule_account" else 0)
+            fan_in.add(receiver_id, sender_id, time_us)
+
+        tracked = sum(len(senders) for senders in fan_in._receivers.values())
+        print(f"{kind:>9} | {add_us:>6.2f} | {counting / count * 1e6:>8.2f} | {peak:>10,} | {tracked:>7,} | "
+              f"{len(fan_in._events) // 3:>7,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Fast-Decision Benchmark
+
+Replays synthetic attack traffic (mostly obvious blocks: flagged receivers,
+night-time bursts, self-transfers, round amounts, mixed with ordinary
+payments) through two detectors, one scoring every factor and one in
+fast-decision mode, and reports per-call latency percentiles. Decisions
+are checked to be identical.
+
+Usage:
+    python -m benchmarks.bench_fast_decision [transactions] [attack_share]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.services.fraud_detector import FraudDetector
+
+FLAGGED = ["flagged_account_1", "flagged_account_2", "suspicious_merchant", "blocked_user_999"]
+
+
+def attack_replay(count: int, attack_share: float) -> list:
+    rng = random.Random(13)
+    start = datetime(2026, 3, 1)
+    transactions = []
+    for n in range(count):
+        when = start + timedelta(seconds=20 * n)
+        if rng.random() < attack_share:
+            sender_id = f"mule_{rng.randrange(300)}"
+            receiver_id = rng.choice(FLAGGED + [sender_id])
+            if rng.random() < 0.6:
+                amount = float(rng.choice([5000, 9000, 25000, 75000]))
+            else:
+                amount = round(rng.uniform(900, 90000), 2)
+            when = when.replace(hour=rng.choice([1, 2, 3, 4, 23]))
+        else:
+            sender_id = f"customer_{rng.randrange(3000)}"
+            receiver_id = f"merchant_{rng.randrange(60)}"
+            amount = round(rng.uniform(5, 400), 2)
+        transactions.append((amount, sender_id, receiver_id, when.isoformat() + "Z"))
+    return transactions
+
+
+def replay(transactions: list) -> tuple:
+    """
+    Score every transaction with both detectors, alternating call by call so
+    background load affects both modes equally.
+
+    Returns:
+        (sorted latencies in us per mode, decision mismatches, skipped stages, blocked count)
+    """
+    detectors = {"all factors": (FraudDetector(), False), "fast decision": (FraudDetector(), True)}
+    latencies = {label: [] for label in detectors}
+    mismatches = 0
+    skipped = 0
+    blocked = 0
+    for n, (amount, sender_id, receiver_id, timestamp) in enumerate(transactions):
+        order = list(detectors) if n % 2 == 0 else list(reversed(detectors))
+        decisions = []
+        for label in order:
+            detector, fast = detectors[label]
+            started = time.perf_counter_ns()
+            result = detector.evaluate_transaction(amount, sender_id, receiver_id, timestamp, fast=fast)
+            latencies[label].append((time.perf_counter_ns() - started) / 1000)
+            decisions.append(result.decision)
+            skipped += len(result.skipped_factors or [])
+        mismatches += decisions[0] != decisions[1]
+        blocked += decisions[0] == "block"
+    return {label: sorted(values) for label, values in latencies.items()}, mismatches, skipped, blocked
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    attack_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    transactions = attack_replay(count, attack_share)
+
+    latencies, mismatches, skipped, blocked = replay(transactions)
+
+    print(f"{count:,} transactions, {attack_share:.0%} attack traffic, {blocked / count:.0%} blocked\n")
+    print(f"{'mode':>14} | {'p50 us':>8} | {'p90 us':>8} | {'p99 us':>8} | {'mean us':>8}")
+    print(f"{'-' * 14}-+-{'-' * 8}-+-{'-' * 8}-+-{'-' * 8}-+-{'-' * 8}")
+    for label, values in latencies.items():
+        print(
+            f"{label:>14} | {percentile(values, 0.5):>8.1f} | {percentile(values, 0.9):>8.1f} | "
+            f"{percentile(values, 0.99):>8.1f} | {sum(values) / count:>8.1f}"
+        )
+    print(f"\nStages skipped per call: {skipped / count:.2f}; decision mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
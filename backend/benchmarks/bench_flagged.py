@@ -0,0 +1,99 @@
+"""
+Flagged Account Lookup Benchmark
+
+Writes a sorted deny-list of N synthetic IDs and compares the in-memory set
+with the memory-mapped list behind a Bloom filter: load time (cold, and
+with the cached .bloom sidecar), Python heap held, lookup cost for misses
+(the common case), misses with the filter bypassed, hits, and the observed
+false-positive rate.
+
+Usage:
+    python -m benchmarks.bench_flagged [accounts]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.services.flagged_accounts import FlaggedAccountStore, _SetIndex
+
+PROBES = 200_000
+
+
+class _PassAll:
+    """Stand-in filter that sends every lookup to the sorted file"""
+
+    def __contains__(self, key: bytes) -> bool:
+        return True
+
+
+def per_lookup_ns(check, keys) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        check(key)
+    return (time.perf_counter() - started) / len(keys) * 1e9
+
+
+def timed(build):
+    """(result, seconds)"""
+    started = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - started
+
+
+def heap_held(build) -> int:
+    """Python heap bytes allocated by build() and still held by its result"""
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return held
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(5)
+    ids = sorted({f"acct_{rng.getrandbits(48):012x}" for _ in range(count)})
+    misses = [f"acct_{rng.getrandbits(48):012x}" for _ in range(PROBES)]
+    hits = rng.sample(ids, min(PROBES, len(ids)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "flagged.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(ids) + "\n")
+
+        in_memory, set_seconds = timed(lambda: _SetIndex(ids))
+        _, cold_seconds = timed(lambda: FlaggedAccountStore(path))
+        mapped, warm_seconds = timed(lambda: FlaggedAccountStore(path))
+        set_bytes = heap_held(lambda: _SetIndex(ids))
+        os.remove(path + ".idx")
+        mapped_bytes = heap_held(lambda: FlaggedAccountStore(path))
+        index = mapped.accounts
+        id_set = set(ids)
+        misses = [key for key in misses if key not in id_set]
+
+        print(f"{len(ids):,} flagged accounts, {os.path.getsize(path) / 1e6:.1f} MB list file\n")
+        print(f"{'':>26} | {'in-memory set':>14} | {'mmap + Bloom':>14}")
+        print(f"{'-' * 26}-+-{'-' * 14}-+-{'-' * 14}")
+        print(f"{'load (s)':>26} | {set_seconds:>14.2f} | {cold_seconds:>14.2f}")
+        print(f"{'load, cached index (s)':>26} | {'-':>14} | {warm_seconds:>14.4f}")
+        print(f"{'Python heap held (MB)':>26} | {set_bytes / 1e6:>14.1f} | {mapped_bytes / 1e6:>14.1f}")
+        print(f"{'miss (ns)':>26} | {per_lookup_ns(in_memory.__contains__, misses):>14,.0f} | "
+              f"{per_lookup_ns(mapped.__contains__, misses):>14,.0f}")
+        bloom, index.bloom = index.bloom, _PassAll()
+        print(f"{'miss, no filter (ns)':>26} | {'-':>14} | {per_lookup_ns(mapped.__contains__, misses):>14,.0f}")
+        index.bloom = bloom
+        print(f"{'hit (ns)':>26} | {per_lookup_ns(in_memory.__contains__, hits):>14,.0f} | "
+              f"{per_lookup_ns(mapped.__contains__, hits):>14,.0f}")
+
+        false_positives = sum(1 for key in misses if key.encode() in index.bloom)
+        print(f"\nBloom filter: {index.bloom.size_bytes / 1e6:.1f} MB, {index.bloom.num_hashes} hashes, "
+              f"false-positive rate {false_positives / len(misses):.2%}")
+
+
+if __name__ == "__main__":
+    main()
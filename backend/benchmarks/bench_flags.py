@@ -0,0 +1,82 @@
+"""
+Flag Rendering and Payload Benchmark
+
+Scores the seeded attack-mix workload once, then compares per response:
+
+- eager text: messages formatted while scoring (the previous behaviour),
+  then serialized
+- lazy text: Flag codes rendered during serialization (format=text)
+- compact: codes and numbers only (format=compact)
+
+and the payload size of each format, projected to a sustained request rate.
+
+Usage:
+    python -m benchmarks.bench_flags [requests_per_second]
+"""
+
+import sys
+import time
+
+from pydantic_core import to_json
+
+from app.models.schemas import TransactionResponse
+from app.services.fraud_detector import FraudDetector
+from benchmarks.workload import TransactionGenerator
+
+TRANSACTIONS = 20_000
+SECONDS_PER_DAY = 86_400
+
+
+def us_per_response(call, responses: list) -> float:
+    started = time.perf_counter()
+    for response in responses:
+        call(response)
+    return (time.perf_counter() - started) / len(responses) * 1e6
+
+
+def preformatted(response: TransactionResponse) -> TransactionResponse:
+    """The response as the factors used to build it, messages already formatted"""
+    return response.model_copy(update={"flags": [str(flag) for flag in response.flags]})
+
+
+def text(response: TransactionResponse) -> bytes:
+    return response.model_dump_json(exclude_none=True).encode()
+
+
+def compact(response: TransactionResponse) -> bytes:
+    return to_json(response.to_compact())
+
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    detector = FraudDetector()
+    responses = [
+        detector.evaluate_transaction(*transaction)
+        for transaction in TransactionGenerator(20260302, 2_000, "attack").take(TRANSACTIONS)
+    ]
+    flagged = sum(1 for response in responses if response.risk_score > 0)
+    print(f"{TRANSACTIONS:,} responses, {flagged / TRANSACTIONS:.0%} with risk flags; projected at {rate:,} req/s\n")
+
+    format_us = us_per_response(lambda response: [str(flag) for flag in response.flags], responses)
+    print(f"Message formatting: {format_us:.2f} us/response (no longer paid while scoring)\n")
+
+    # Eager: formatting paid while scoring, then the formatted strings are serialized
+    formatted = [preformatted(response) for response in responses]
+    rows = (
+        ("eager text", format_us + us_per_response(text, formatted), formatted, text),
+        ("lazy text", us_per_response(text, responses), responses, text),
+        ("compact", us_per_response(compact, responses), responses, compact),
+    )
+
+    print(f"{'format':>11} | {'us/resp':>7} | {'bytes/resp':>10} | {'GB/day':>7} | {'CPU s/day':>9}")
+    print(f"{'-' * 11}-+-{'-' * 7}-+-{'-' * 10}-+-{'-' * 7}-+-{'-' * 9}")
+    for label, us, items, serialize in rows:
+        size = sum(len(serialize(response)) for response in items) / len(items)
+        print(
+            f"{label:>11} | {us:>7.2f} | {size:>10.0f} | {size * rate * SECONDS_PER_DAY / 1e9:>7.2f} | "
+            f"{us * rate * SECONDS_PER_DAY / 1e6:>9,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+History Depth Benchmark
+
+Measures FraudDetector.evaluate_transaction cost for senders with
+increasing amounts of stored history. Per-request cost should stay
+flat as history grows towards the 100-transaction window.
+
+Usage:
+    python -m benchmarks.bench_history_depth
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.services.fraud_detector import FraudDetector
+
+DEPTHS = [0, 5, 10, 25, 50, 75, 100]
+SENDERS_PER_DEPTH = 2000
+
+
+def build_detector(depth: int, rng: random.Random) -> tuple:
+    """Create a detector whose senders each hold `depth` stored transactions"""
+    detector = FraudDetector()
+    start = datetime(2026, 1, 1)
+    senders = [f"sender_{i}" for i in range(SENDERS_PER_DEPTH)]
+
+    for sender_id in senders:
+        for n in range(depth):
+            detector.evaluate_transaction(
+                amount=round(rng.uniform(10, 900), 2),
+                sender_id=sender_id,
+                receiver_id=f"merchant_{rng.randrange(20)}",
+                timestamp=(start + timedelta(hours=3 * n)).isoformat() + "Z"
+            )
+
+    probe_time = (start + timedelta(hours=3 * depth)).isoformat() + "Z"
+    return detector, senders, probe_time
+
+
+def run_depth(depth: int, rng: random.Random) -> float:
+    """Return mean microseconds per evaluate_transaction at this depth"""
+    detector, senders, probe_time = build_detector(depth, rng)
+
+    started = time.perf_counter()
+    for sender_id in senders:
+        detector.evaluate_transaction(
+            amount=round(rng.uniform(10, 900), 2),
+            sender_id=sender_id,
+            receiver_id="merchant_1",
+            timestamp=probe_time
+        )
+    elapsed = time.perf_counter() - started
+
+    return elapsed / len(senders) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+
+    print(f"{'history depth':>14} | {'us / request':>12}")
+    print(f"{'-' * 14}-+-{'-' * 12}")
+    for depth in DEPTHS:
+        print(f"{depth:>14} | {run_depth(depth, rng):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
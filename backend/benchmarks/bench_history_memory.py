@@ -0,0 +1,83 @@
+"""
+History Memory Benchmark
+
+Reports bytes per sender for FraudDetector.transaction_history, comparing
+the previous list-of-dicts layout with the typed-array ring buffer
+(SenderHistory, including its running statistics and velocity window).
+
+Usage:
+    python -m benchmarks.bench_history_memory
+"""
+
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.services.sender_history import ReceiverInterner, SenderHistory
+from app.services.velocity_window import to_epoch_us
+
+DEPTHS = [1, 10, 50, 100]
+SENDERS = 2000
+RECEIVERS = [f"merchant_{i}" for i in range(50)]
+
+
+def generate(depth: int, rng: random.Random) -> list:
+    """Synthetic (timestamp, amount, receiver_id) rows for one sender"""
+    start = datetime(2026, 1, 1)
+    return [
+        (start + timedelta(minutes=17 * n), round(rng.uniform(10, 900), 2), rng.choice(RECEIVERS))
+        for n in range(depth)
+    ]
+
+
+def measure(build) -> int:
+    """Bytes allocated by build() and still alive afterwards"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return size
+
+
+def dict_layout(rows_per_sender: list):
+    """Previous layout: {sender_id: [{"timestamp", "amount", "receiver_id"}, ...]}"""
+    history = {}
+    for n, rows in enumerate(rows_per_sender):
+        history[f"sender_{n}"] = [
+            {"timestamp": datetime.fromisoformat(ts.isoformat()), "amount": float(str(amount)), "receiver_id": receiver}
+            for ts, amount, receiver in rows
+        ]
+    return history
+
+
+def ring_layout(rows_per_sender: list, interner: ReceiverInterner):
+    """Current layout: {sender_id: SenderHistory}"""
+    history = {}
+    for n, rows in enumerate(rows_per_sender):
+        ring = SenderHistory()
+        for ts, amount, receiver in rows:
+            ring.append(to_epoch_us(ts), amount, interner.acquire(receiver))
+        history[f"sender_{n}"] = ring
+    return history
+
+
+def main():
+    rng = random.Random(7)
+    interner = ReceiverInterner()
+    for receiver in RECEIVERS:
+        interner.acquire(receiver)
+
+    print(f"{'depth':>6} | {'dict layout B/sender':>21} | {'ring B/sender':>14} | {'ratio':>6}")
+    print(f"{'-' * 6}-+-{'-' * 21}-+-{'-' * 14}-+-{'-' * 6}")
+    for depth in DEPTHS:
+        rows_per_sender = [generate(depth, rng) for _ in range(SENDERS)]
+        old = measure(lambda: dict_layout(rows_per_sender)) / SENDERS
+        new = measure(lambda: ring_layout(rows_per_sender, interner)) / SENDERS
+        print(f"{depth:>6} | {old:>21,.0f} | {new:>14,.0f} | {old / new:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Metrics Overhead Benchmark
+
+Part 1: cost of one Counter.inc / Histogram.observe, from one thread and
+from several threads at once (per-thread shards, so no lock contention),
+next to a lock-guarded counter for reference.
+
+Part 2: evaluate_transaction with and without metrics, alternating call by
+call on identical traffic, so the difference is the hot-path overhead
+(decision counter on every call, factor timing on 1 in N).
+
+Usage:
+    python -m benchmarks.bench_metrics [transactions]
+"""
+
+import sys
+import threading
+import time
+
+from app.services.fraud_detector import FraudDetector
+from app.services.metrics import FACTOR_BUCKETS, Counter, FraudMetrics, Histogram
+from benchmarks.workload import TransactionGenerator
+
+UPDATES = 200_000
+THREADS = 4
+
+
+class LockedCounter:
+    """Reference: one shared dict behind a lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+def ns_per_update(update, threads: int) -> float:
+    def work():
+        for _ in range(UPDATES):
+            update()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (UPDATES * threads) * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    counter = Counter("c", "", ("route", "decision"))
+    histogram = Histogram("h", "", ("factor",), FACTOR_BUCKETS)
+    locked = LockedCounter()
+    labels = ("/api/evaluate-transaction", "approve")
+    print(f"{'update':>22} | {'1 thread ns':>11} | {f'{THREADS} threads ns':>12}")
+    print(f"{'-' * 22}-+-{'-' * 11}-+-{'-' * 12}")
+    for label, update in (
+        ("sharded Counter.inc", lambda: counter.inc(labels)),
+        ("Histogram.observe", lambda: histogram.observe(("amount",), 3.2e-6)),
+        ("locked counter", lambda: locked.inc(labels)),
+    ):
+        print(f"{label:>22} | {ns_per_update(update, 1):>11.0f} | {ns_per_update(update, THREADS):>12.0f}")
+
+    transactions = TransactionGenerator(7, 5_000, "attack").take(count)
+    plain = FraudDetector()
+    instrumented = FraudDetector(metrics=FraudMetrics())
+    totals = {"without metrics": 0, "with metrics": 0}
+    clock = time.perf_counter_ns
+    for n, tx in enumerate(transactions):
+        pairs = (("without metrics", plain), ("with metrics", instrumented))
+        for label, detector in (pairs if n % 2 == 0 else pairs[::-1]):
+            started = clock()
+            detector.evaluate_transaction(*tx)
+            totals[label] += clock() - started
+
+    print()
+    for label, total in totals.items():
+        print(f"{label:>16}: {total / count / 1000:6.2f} us/call")
+    overhead = (totals["with metrics"] - totals["without metrics"]) / count
+    print(f"{'overhead':>16}: {overhead:6.0f} ns/call ({overhead / (totals['without metrics'] / count):.1%})")
+
+
+if __name__ == "__main__":
+    main()
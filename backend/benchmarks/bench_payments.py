@@ -0,0 +1,109 @@
+"""
+Payment History Benchmark
+
+Fills payment histories of increasing size and compares the previous
+unbounded dict (listing copies every payment, then filters and slices)
+with the bounded, indexed PaymentHistory: lookup by ID, a 100-payment page
+(unfiltered, by sender, by status) and the heap held once the size cap is
+reached.
+
+Usage:
+    python -m benchmarks.bench_payments [max_payments]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from app.models.schemas import PaymentResult
+from app.services.payment_history import PaymentHistory
+
+PAGE = 100
+CALLS = 200
+
+
+def generate(count: int) -> list:
+    rng = random.Random(12)
+    return [
+        PaymentResult(
+            payment_id=f"pay_{n:09d}",
+            status=rng.choice(["success", "success", "success", "blocked", "failed"]),
+            transaction_id=f"txn_{n}",
+            sender_id=f"sender_{rng.randrange(max(1, count // 50))}",
+            receiver_id=f"merchant_{rng.randrange(100)}",
+            amount=round(rng.uniform(5, 5000), 2),
+            risk_score=rng.randrange(100),
+            decision="approve",
+            processed_at=f"2026-03-01T00:00:00.{n:06d}Z" if n < 1_000_000 else "2026-03-01T00:00:01.000000Z",
+            message="Payment processed successfully"
+        )
+        for n in range(count)
+    ]
+
+
+def us_per_call(call) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        call()
+    return (time.perf_counter() - started) / CALLS * 1e6
+
+
+def dict_page(payments: dict, sender_id=None, status=None) -> list:
+    """The previous listing: copy everything, then filter and take the newest page"""
+    results = list(payments.values())
+    matching = [
+        p for p in results
+        if (sender_id is None or p.sender_id == sender_id) and (status is None or p.status == status)
+    ]
+    return matching[-PAGE:][::-1]
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    sizes = [size for size in (10_000, 50_000, 200_000, 1_000_000) if size <= largest]
+    payments = generate(sizes[-1])
+
+    print(f"{'payments':>9} | {'store':>8} | {'get us':>7} | {'page us':>8} | {'sender us':>9} | {'status us':>9}")
+    print(f"{'-' * 9}-+-{'-' * 8}-+-{'-' * 7}-+-{'-' * 8}-+-{'-' * 9}-+-{'-' * 9}")
+    for size in sizes:
+        subset = payments[:size]
+        sender_id = subset[-1].sender_id
+        probe = subset[size // 2].payment_id
+
+        unbounded = {p.payment_id: p for p in subset}
+        indexed = PaymentHistory(max_entries=0, ttl_s=0)
+        for p in subset:
+            indexed.put(p)
+
+        rows = (
+            ("dict", unbounded.get,
+             lambda: dict_page(unbounded), lambda: dict_page(unbounded, sender_id=sender_id),
+             lambda: dict_page(unbounded, status="failed")),
+            ("indexed", indexed.get,
+             lambda: indexed.page(limit=PAGE), lambda: indexed.page(sender_id=sender_id, limit=PAGE),
+             lambda: indexed.page(status="failed", limit=PAGE)),
+        )
+        for label, get, page, by_sender, by_status in rows:
+            print(
+                f"{size:>9,} | {label:>8} | {us_per_call(lambda: get(probe)):>7.2f} | {us_per_call(page):>8.1f} | "
+                f"{us_per_call(by_sender):>9.1f} | {us_per_call(by_status):>9.1f}"
+            )
+
+    # Heap held by the history structures alone (payments themselves are shared)
+    cap = sizes[0]
+    for label, store in (("unbounded", None), (f"capped at {cap:,}", PaymentHistory(max_entries=cap, ttl_s=0))):
+        tracemalloc.start()
+        if store is None:
+            store = {p.payment_id: p for p in payments}
+        else:
+            for p in payments:
+                store.put(p)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"\nIndex heap after {len(payments):,} payments, {label}: {used / 1e6:.1f} MB", end="")
+    print()
+
+
+if __name__ == "__main__":
+    main()
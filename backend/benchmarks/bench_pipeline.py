@@ -0,0 +1,83 @@
+"""
+Factor Pipeline Benchmark
+
+Part 1 compares per-call timestamp handling: the previous factor methods
+parsed the ISO timestamp three times (context, behavior, storage) and
+converted it to epoch time twice. An EvaluationContext parses it once.
+
+Part 2 reports evaluate_transaction cost with the full pipeline and with
+each stage disabled in turn, which is the cost that stage adds per call.
+
+Usage:
+    python -m benchmarks.bench_pipeline [transactions]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.services.evaluation_context import EvaluationContext, parse_timestamp
+from app.services.fraud_detector import FraudDetector
+from app.services.velocity_window import to_epoch_us
+
+REPEATS = 5
+
+
+def generate(count: int) -> list:
+    rng = random.Random(4)
+    start = datetime(2026, 3, 1)
+    return [
+        (
+            round(rng.uniform(5, 8000), 2),
+            f"sender_{rng.randrange(500)}",
+            f"merchant_{rng.randrange(40)}",
+            (start + timedelta(seconds=37 * n)).isoformat() + "Z"
+        )
+        for n in range(count)
+    ]
+
+
+def best_us_per_call(run, count: int) -> float:
+    """Fastest of REPEATS runs, in CPU microseconds per call"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.process_time()
+        run()
+        best = min(best, time.process_time() - started)
+    return best / count * 1e6
+
+
+def legacy_timestamp_work(timestamp: str):
+    """What the factor methods did separately before the evaluation context"""
+    parse_timestamp(timestamp).hour                     # transaction context
+    to_epoch_us(parse_timestamp(timestamp))             # user behavior
+    to_epoch_us(parse_timestamp(timestamp))             # storage
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    transactions = generate(count)
+
+    legacy = best_us_per_call(lambda: [legacy_timestamp_work(tx[3]) for tx in transactions], count)
+    context = best_us_per_call(lambda: [EvaluationContext(*tx) for tx in transactions], count)
+    print("Timestamp normalisation per call")
+    print(f"  3 parses + 2 epoch conversions: {legacy:6.2f} us")
+    print(f"  EvaluationContext (1 parse):    {context:6.2f} us\n")
+
+    def evaluate(stages):
+        detector = FraudDetector(stages=stages)
+        return lambda: [detector.evaluate_transaction(*tx) for tx in transactions]
+
+    full = best_us_per_call(evaluate(FraudDetector.DEFAULT_STAGES), count)
+    print(f"{'pipeline':>24} | {'us/call':>8} | {'stage cost':>10}")
+    print(f"{'-' * 24}-+-{'-' * 8}-+-{'-' * 10}")
+    print(f"{'all stages':>24} | {full:>8.2f} | {'':>10}")
+    for name in FraudDetector.DEFAULT_STAGES:
+        stages = [stage for stage in FraudDetector.DEFAULT_STAGES if stage != name]
+        without = best_us_per_call(evaluate(stages), count)
+        print(f"{'without ' + name:>24} | {without:>8.2f} | {full - without:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Scoring Pool Benchmark
+
+Scores the velocity mix (senders firing bursts, so per-sender order
+matters) in the API process and through scoring pools of 1..N worker
+processes, two ways:
+
+- batch: chunks of BATCH_SIZE through evaluate_batch, split by partition
+- pipelined: single transactions sent in order from the event loop with
+  PIPELINE_DEPTH in flight, so one sender's requests overlap in the pool
+
+Every pooled response is compared with the in-process result for the same
+transaction: any reordering within a sender changes velocity and history
+scores, so "differ" must be 0. Scaling needs free cores; the header shows
+how many this host has.
+
+Usage:
+    python -m benchmarks.bench_pool [transactions] [max_workers]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from app.models.schemas import TransactionRequest
+from app.services.fraud_detector import FraudDetector
+from app.services.scoring_pool import ScoringPool
+from benchmarks.workload import TransactionGenerator
+
+SEED = 20260302
+SENDERS = 5_000
+BATCH_SIZE = 500
+PIPELINE_DEPTH = 256
+
+
+def scores(results) -> list:
+    return [(result.decision, result.risk_score) for result in results]
+
+
+def run_batches(scorer, requests: list) -> tuple:
+    started = time.perf_counter()
+    results = []
+    for start in range(0, len(requests), BATCH_SIZE):
+        results.extend(scorer.evaluate_batch(requests[start:start + BATCH_SIZE]))
+    return time.perf_counter() - started, scores(results)
+
+
+def run_pipelined(pool: ScoringPool, transactions: list) -> tuple:
+    async def drive() -> list:
+        # One task per transaction (as per HTTP request), started in order with up to
+        # PIPELINE_DEPTH in flight; tasks run in creation order, so they queue in order
+        window = asyncio.Semaphore(PIPELINE_DEPTH)
+
+        async def send(transaction):
+            try:
+                return await pool.evaluate_transaction_async(*transaction)
+            finally:
+                window.release()
+
+        tasks = []
+        for transaction in transactions:
+            await window.acquire()
+            tasks.append(asyncio.create_task(send(transaction)))
+        return await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    results = asyncio.run(drive())
+    return time.perf_counter() - started, scores(results)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count() or 1)
+    logging.disable(logging.INFO)
+    transactions = TransactionGenerator(SEED, SENDERS, "velocity").take(count)
+    requests = [
+        TransactionRequest.model_construct(amount=amount, sender_id=sender, receiver_id=receiver, timestamp=timestamp)
+        for amount, sender, receiver, timestamp in transactions
+    ]
+
+    detector = FraudDetector()
+    started = time.perf_counter()
+    expected = scores(detector.evaluate_transaction(*transaction) for transaction in transactions)
+    sequential = time.perf_counter() - started
+    batch_elapsed, batch_scores = run_batches(FraudDetector(), requests)
+
+    print(f"{count:,} transactions (velocity mix, {SENDERS:,} senders), {os.cpu_count()} CPU(s)\n")
+    print(f"{'scorer':>18} | {'mode':>9} | {'tx/s':>7} | {'speedup':>7} | {'differ':>6}")
+    print(f"{'-' * 18}-+-{'-' * 9}-+-{'-' * 7}-+-{'-' * 7}-+-{'-' * 6}")
+    print(f"{'in-process':>18} | {'single':>9} | {count / sequential:>7,.0f} | {1:>6.2f}x | {0:>6}")
+    print(f"{'in-process':>18} | {'batch':>9} | {count / batch_elapsed:>7,.0f} | "
+          f"{sequential / batch_elapsed:>6.2f}x | {sum(a != b for a, b in zip(batch_scores, expected)):>6}")
+
+    for workers in range(1, max_workers + 1):
+        label = f"pool, {workers} worker{'s' if workers > 1 else ''}"
+        for mode in ("batch", "pipelined"):
+            # A fresh pool per run, so every run starts from empty sender state
+            pool = ScoringPool(workers)
+            pool.start()
+            try:
+                if mode == "batch":
+                    elapsed, got = run_batches(pool, requests)
+                else:
+                    elapsed, got = run_pipelined(pool, transactions)
+            finally:
+                pool.close()
+            differ = sum(a != b for a, b in zip(got, expected))
+            print(f"{label:>18} | {mode:>9} | {count / elapsed:>7,.0f} | {sequential / elapsed:>6.2f}x | {differ:>6}")
+
+
+if __name__ == "__main__":
+    main()
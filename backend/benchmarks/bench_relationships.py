@@ -0,0 +1,81 @@
+"""
+Receiver Relationship Benchmark
+
+One sender paying a growing number of distinct receivers, tracked by the
+previous unbounded {receiver_id: count} dict and by ReceiverRelationships
+(top-K counters plus a membership filter). Reports per distinct-receiver
+count:
+
+- heap held by the structure (receiver ID strings excluded: the dict
+  shares them with requests, the counters use the shared interner)
+- "new recipient" false positives: fresh receivers reported known
+- forgotten receivers: receivers paid once before, reported new
+- cost of one add() and one knows()
+
+Usage:
+    python -m benchmarks.bench_relationships
+"""
+
+import gc
+import time
+import tracemalloc
+
+from app.services.receiver_relationships import FILTER_CAPACITY, TOP_K, ReceiverRelationships
+from app.services.sender_history import ReceiverInterner
+
+DISTINCT = (8, TOP_K, 200, 1_000, 10_000, 100_000)
+PROBES = 20_000
+
+
+def heap_bytes(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main():
+    interner = ReceiverInterner()
+    names = [f"merchant_{n}" for n in range(max(DISTINCT))]
+    indexes = [interner.intern(name) for name in names]
+    fresh = [f"unseen_{n}" for n in range(PROBES)]
+
+    print(f"top-K {TOP_K}, {FILTER_CAPACITY} receivers per filter generation\n")
+    print(f"{'receivers':>9} | {'dict B':>9} | {'sketch B':>8} | {'false pos':>9} | {'forgotten':>9} | "
+          f"{'add us':>6} | {'knows us':>8}")
+    print(f"{'-' * 9}-+-{'-' * 9}-+-{'-' * 8}-+-{'-' * 9}-+-{'-' * 9}-+-{'-' * 6}-+-{'-' * 8}")
+    for distinct in DISTINCT:
+        def build_dict():
+            counts = {}
+            for name in names[:distinct]:
+                counts[name] = counts.get(name, 0) + 1
+            return counts
+
+        def build_sketch():
+            relationships = ReceiverRelationships()
+            for index in indexes[:distinct]:
+                relationships.add(index, interner)
+            return relationships
+
+        dict_bytes = heap_bytes(build_dict)
+        sketch_bytes = heap_bytes(build_sketch)
+
+        started = time.perf_counter()
+        relationships = build_sketch()
+        add_us = (time.perf_counter() - started) / distinct * 1e6
+
+        started = time.perf_counter()
+        false_positives = sum(relationships.knows(name, interner) for name in fresh)
+        knows_us = (time.perf_counter() - started) / PROBES * 1e6
+        forgotten = sum(not relationships.knows(name, interner) for name in names[:distinct])
+
+        print(f"{distinct:>9,} | {dict_bytes:>9,.0f} | {sketch_bytes:>8,.0f} | {false_positives / PROBES:>9.2%} | "
+              f"{forgotten / distinct:>9.1%} | {add_us:>6.2f} | {knows_us:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
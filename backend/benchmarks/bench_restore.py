@@ -0,0 +1,86 @@
+"""
+Warm Restart Benchmark
+
+Stores N transactions through a journaled detector, takes a snapshot partway
+through (so restart loads the snapshot and replays the log tail), then times
+restore() into a fresh store. For comparison it also times a restart that has
+only the log to replay (no snapshot).
+
+Usage:
+    python -m benchmarks.bench_restore [transactions] [tail_fraction]
+"""
+
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from app.services.evaluation_context import EvaluationContext
+from app.services.fraud_detector import FraudDetector
+from app.services.journal import TransactionJournal
+from app.services.state_store import InMemoryStateStore
+
+TRANSACTIONS_PER_SENDER = 100
+RECEIVERS = 500
+
+
+def populate(directory: str, transactions: int, snapshot_at: int):
+    """Store `transactions` through a journaled detector; snapshot after `snapshot_at` of them"""
+    store = InMemoryStateStore()
+    journal = TransactionJournal(directory, store)
+    detector = FraudDetector(store=store, journal=journal)
+    journal.restore(detector._apply_transaction)
+    journal.start()
+
+    rng = random.Random(11)
+    senders = max(1, transactions // TRANSACTIONS_PER_SENDER)
+    start = datetime(2026, 1, 1)
+    for n in range(transactions):
+        sender_id = f"sender_{rng.randrange(senders)}"
+        timestamp = (start + timedelta(minutes=n)).isoformat() + "Z"
+        context = EvaluationContext(
+            round(rng.uniform(5, 5000), 2), sender_id, f"merchant_{rng.randrange(RECEIVERS)}", timestamp
+        )
+        with store.sender(sender_id) as state:
+            detector._store_transaction(context.bind(state))
+        if n + 1 == snapshot_at:
+            journal.snapshot()
+
+    journal.close(snapshot=False)
+
+
+def timed_restore(directory: str) -> dict:
+    store = InMemoryStateStore()
+    journal = TransactionJournal(directory, store)
+    detector = FraudDetector(store=store, journal=journal)
+    stats = journal.restore(detector._apply_transaction)
+    journal.close(snapshot=False)
+    return stats
+
+
+def report(label: str, stats: dict):
+    print(
+        f"{label:>14} | {stats['seconds']:>8.2f}s | {stats['snapshot_seconds']:>8.2f}s | "
+        f"{stats['snapshot_senders']:>8,} | {stats['replayed_records']:>10,} | {stats['stored_transactions']:>12,}"
+    )
+
+
+def main():
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tail_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    print(f"{transactions:,} transactions, {tail_fraction:.0%} written after the last snapshot\n")
+    print(f"{'restart from':>14} | {'total':>9} | {'snapshot':>9} | {'senders':>8} | {'replayed':>10} | {'stored':>12}")
+    print(f"{'-' * 14}-+-{'-' * 9}-+-{'-' * 9}-+-{'-' * 8}-+-{'-' * 10}-+-{'-' * 12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        populate(directory, transactions, int(transactions * (1 - tail_fraction)))
+        report("snapshot + log", timed_restore(directory))
+
+    with tempfile.TemporaryDirectory() as directory:
+        populate(directory, transactions, snapshot_at=-1)
+        report("log only", timed_restore(directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Route Throughput Benchmark
+
+Drives the FastAPI application in-process through its ASGI interface (no
+sockets, no HTTP parsing) with the full middleware stack, and reports
+requests per second for the scoring routes. What remains is what the
+application itself spends per request: routing, body validation, scoring,
+response construction and serialization.
+
+Run it on two commits to compare them; --save/--compare keep the numbers.
+
+Usage:
+    python -m benchmarks.bench_routes [--requests N] [--rounds N] [--save FILE] [--compare FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional
+
+from app.main import app
+from benchmarks.workload import TransactionGenerator
+
+BATCH = 100
+SEED = 20260302
+
+
+def bodies(count: int, mix: str = "attack") -> List[bytes]:
+    return [
+        json.dumps({"amount": amount, "sender_id": sender, "receiver_id": receiver, "timestamp": timestamp}).encode()
+        for amount, sender, receiver, timestamp in TransactionGenerator(SEED, 5_000, mix).take(count)
+    ]
+
+
+async def call(path: str, body: bytes) -> int:
+    """One POST through the ASGI app; returns the status code"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    received = False
+    status = 0
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.sleep(3600)
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def requests_per_second(path: str, payloads: List[bytes], rounds: int) -> float:
+    """Best of `rounds` passes over equal slices of `payloads` (robust to noisy neighbours)"""
+    for body in payloads[:200]:
+        await call(path, body)
+    size = max(1, len(payloads) // rounds)
+    best = 0.0
+    for start in range(0, size * rounds, size):
+        began = time.perf_counter()
+        for body in payloads[start:start + size]:
+            status = await call(path, body)
+            if status != 200:
+                raise RuntimeError(f"{path} returned {status}")
+        best = max(best, size / (time.perf_counter() - began))
+    return best
+
+
+async def run(count: int, rounds: int) -> dict:
+    async with app.router.lifespan_context(app):
+        single = bodies(count)
+        batches = [b"[" + b",".join(chunk) + b"]" for chunk in
+                   (single[start:start + BATCH] for start in range(0, len(single), BATCH))]
+        return {
+            "evaluate-transaction": await requests_per_second("/api/evaluate-transaction", single, rounds),
+            f"evaluate-transactions x{BATCH}": await requests_per_second("/api/evaluate-transactions", batches, rounds),
+            "process-payment": await requests_per_second("/api/process-payment", bodies(count, "normal"), rounds),
+        }
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="In-process requests/s of the scoring routes")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=5, help="Timed slices per route; the fastest is reported")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare with results saved by --save")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    results = asyncio.run(run(args.requests, args.rounds))
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"{'route':>26} | {'req/s':>9} | {'before':>9} | {'change':>7}")
+    print(f"{'-' * 26}-+-{'-' * 9}-+-{'-' * 9}-+-{'-' * 7}")
+    for route, rate in results.items():
+        before = baseline.get(route)
+        change = f"{rate / before - 1:+.1%}" if before else ""
+        print(f"{route:>26} | {rate:>9,.0f} | {before or 0:>9,.0f} | {change:>7}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
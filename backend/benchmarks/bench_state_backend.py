@@ -0,0 +1,117 @@
+"""
+State Backend Benchmark
+
+Simulates N uvicorn workers on one host: N processes, each with its own
+FraudDetector, scoring a shared sender population. With the in-memory
+store every process sees only its own slice of each sender's history;
+with the SQLite store all processes share it. Reports aggregate requests
+per second by worker count, plus how many transactions each backend
+actually recorded per sender (velocity under-counting shows up here).
+
+Usage:
+    python -m benchmarks.bench_state_backend [ops_per_worker]
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.services.fraud_detector import FraudDetector
+from app.services.state_store import InMemoryStateStore, SQLiteStateStore
+
+WORKER_COUNTS = [1, 2, 4, 8]
+SENDERS = 200
+
+
+def worker(backend: str, path: str, seed: int, ops: int, start_event, results):
+    """Score `ops` transactions and report (elapsed, recorded relationship updates)"""
+    store = SQLiteStateStore(path) if backend == "sqlite" else InMemoryStateStore()
+    detector = FraudDetector(store=store)
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1, 9, 0)
+    transactions = [
+        (
+            round(rng.uniform(5, 5000), 2),
+            f"sender_{rng.randrange(SENDERS)}",
+            f"merchant_{rng.randrange(8)}",
+            (start + timedelta(seconds=rng.randrange(86400))).isoformat() + "Z"
+        )
+        for _ in range(ops)
+    ]
+
+    start_event.wait()
+    started = time.perf_counter()
+    for amount, sender_id, receiver_id, timestamp in transactions:
+        detector.evaluate_transaction(amount, sender_id, receiver_id, timestamp)
+    elapsed = time.perf_counter() - started
+
+    if backend == "memory":
+        # Per-process view: what this worker recorded for the senders it saw
+        recorded = sum(state.relationships.transactions for state in store.senders.values())
+        results.put((elapsed, recorded))
+    else:
+        results.put((elapsed, 0))
+    store.close()
+
+
+def shared_recorded(path: str) -> int:
+    """Total relationship updates recorded in the shared SQLite store"""
+    store = SQLiteStateStore(path)
+    total = 0
+    for sender_id in (f"sender_{n}" for n in range(SENDERS)):
+        with store.sender(sender_id) as state:
+            total += state.relationships.transactions
+    store.close()
+    return total
+
+
+def run(backend: str, workers: int, ops: int) -> tuple:
+    """Return (aggregate requests/sec, average transactions visible per sender to one worker)"""
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    if backend == "sqlite":
+        SQLiteStateStore(path).close()
+
+    context = multiprocessing.get_context("spawn")
+    start_event = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(backend, path, seed, ops, start_event, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(0.5 + 0.1 * workers)
+    start_event.set()
+
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    wall = max(elapsed for elapsed, _ in outcomes)
+    total = workers * ops
+    if backend == "sqlite":
+        recorded = shared_recorded(path)
+        assert recorded == total, f"shared store recorded {recorded} of {total} transactions"
+        visible = recorded / SENDERS
+    else:
+        visible = sum(recorded for _, recorded in outcomes) / workers / SENDERS
+    return total / wall, visible
+
+
+def main():
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    print(f"{'backend':>7} | {'workers':>7} | {'req/sec':>9} | tx per sender seen by a worker")
+    print(f"{'-' * 7}-+-{'-' * 7}-+-{'-' * 9}-+-{'-' * 30}")
+    for backend in ("memory", "sqlite"):
+        for workers in WORKER_COUNTS:
+            rps, visible = run(backend, workers, ops)
+            print(f"{backend:>7} | {workers:>7} | {rps:>9,.0f} | {visible:>8.1f} of {workers * ops / SENDERS:.1f}")
+
+
+if __name__ == "__main__":
+    main()
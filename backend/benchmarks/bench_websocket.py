@@ -0,0 +1,176 @@
+"""
+WebSocket Channel Benchmark
+
+Starts the API under uvicorn on a loopback port (INFO logging off, as in
+production) and scores the same transactions over:
+
+- HTTP, sequential: POST /api/evaluate-transaction on one keep-alive
+  connection, each request waiting for the previous response
+- HTTP, concurrent: CONCURRENCY keep-alive connections in parallel
+- WebSocket, sequential: one message at a time on /api/ws/evaluate
+- WebSocket, pipelined: up to WINDOW messages in flight on one connection
+
+and reports throughput and per-transaction latency (send to reply). Each
+run gets a fresh server, so the sequential and pipelined runs must score
+identically (same order, same state): "differ" counts responses that do
+not match the sequential HTTP run. Client and server share the host, so
+on a small machine the client's own cost is part of every number.
+
+Needs httpx and websockets (FastAPI's test client and uvicorn[standard]).
+
+Usage:
+    python -m benchmarks.bench_websocket [transactions]
+"""
+
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import httpx
+import websockets
+
+from benchmarks.workload import TransactionGenerator
+
+SEED = 20260302
+CONCURRENCY = 32
+WINDOW = 256
+# Serves the app without per-transaction INFO logs (the routes configure INFO by default)
+SERVER = (
+    "import logging, sys, uvicorn; logging.disable(logging.INFO); "
+    "uvicorn.run('app.main:app', host='127.0.0.1', port=int(sys.argv[1]), log_level='warning', ws_per_message_deflate=False)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """Fresh uvicorn process, so every run starts from empty sender state"""
+
+    def __enter__(self) -> str:
+        self.port = free_port()
+        self.process = subprocess.Popen([sys.executable, "-c", SERVER, str(self.port)])
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return f"127.0.0.1:{self.port}"
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("Server did not start")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+
+def scores(replies: List[dict]) -> List[Tuple[str, int]]:
+    return [(reply["decision"], reply["risk_score"]) for reply in replies]
+
+
+async def http_sequential(address: str, bodies: List[dict]) -> Tuple[float, list, list]:
+    latencies, replies = [], []
+    async with httpx.AsyncClient(base_url=f"http://{address}") as client:
+        started = time.perf_counter()
+        for body in bodies:
+            sent = time.perf_counter()
+            replies.append((await client.post("/api/evaluate-transaction", json=body)).json())
+            latencies.append(time.perf_counter() - sent)
+        return time.perf_counter() - started, latencies, replies
+
+
+async def http_concurrent(address: str, bodies: List[dict]) -> Tuple[float, list, list]:
+    latencies = []
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=f"http://{address}", limits=limits) as client:
+        async def caller(offset: int):
+            for index in range(offset, len(bodies), CONCURRENCY):
+                sent = time.perf_counter()
+                await client.post("/api/evaluate-transaction", json=bodies[index])
+                latencies.append(time.perf_counter() - sent)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(caller(offset) for offset in range(CONCURRENCY)))
+        return time.perf_counter() - started, latencies, None
+
+
+async def ws_sequential(address: str, bodies: List[dict]) -> Tuple[float, list, list]:
+    latencies, replies = [], []
+    async with websockets.connect(f"ws://{address}/api/ws/evaluate") as ws:
+        started = time.perf_counter()
+        for index, body in enumerate(bodies):
+            sent = time.perf_counter()
+            await ws.send(json.dumps(dict(body, id=index)))
+            replies.append(json.loads(await ws.recv()))
+            latencies.append(time.perf_counter() - sent)
+        return time.perf_counter() - started, latencies, replies
+
+
+async def ws_pipelined(address: str, bodies: List[dict]) -> Tuple[float, list, list]:
+    sent_at = [0.0] * len(bodies)
+    latencies = [0.0] * len(bodies)
+    replies = [None] * len(bodies)
+    window = asyncio.Semaphore(WINDOW)
+    async with websockets.connect(f"ws://{address}/api/ws/evaluate") as ws:
+        async def send():
+            for index, body in enumerate(bodies):
+                await window.acquire()
+                sent_at[index] = time.perf_counter()
+                await ws.send(json.dumps(dict(body, id=index)))
+
+        async def receive():
+            for _ in bodies:
+                reply = json.loads(await ws.recv())
+                index = reply["id"]
+                latencies[index] = time.perf_counter() - sent_at[index]
+                replies[index] = reply
+                window.release()
+
+        started = time.perf_counter()
+        await asyncio.gather(send(), receive())
+        return time.perf_counter() - started, latencies, replies
+
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    bodies = [
+        {"amount": amount, "sender_id": sender, "receiver_id": receiver, "timestamp": timestamp}
+        for amount, sender, receiver, timestamp in TransactionGenerator(SEED, 5_000, "attack").take(count)
+    ]
+
+    print(f"{count:,} transactions (attack mix) over loopback\n")
+    print(f"{'transport':>26} | {'tx/s':>7} | {'p50 ms':>6} | {'p99 ms':>6} | {'differ':>6}")
+    print(f"{'-' * 26}-+-{'-' * 7}-+-{'-' * 6}-+-{'-' * 6}-+-{'-' * 6}")
+    baseline = None
+    for label, run in (
+        ("HTTP, sequential", http_sequential),
+        (f"HTTP, {CONCURRENCY} connections", http_concurrent),
+        ("WebSocket, sequential", ws_sequential),
+        (f"WebSocket, {WINDOW} in flight", ws_pipelined),
+    ):
+        with Server() as address:
+            elapsed, latencies, replies = asyncio.run(run(address, bodies))
+        if replies is None:
+            differ = "-"
+        else:
+            if baseline is None:
+                baseline = scores(replies)
+            differ = sum(a != b for a, b in zip(scores(replies), baseline))
+        print(f"{label:>26} | {count / elapsed:>7,.0f} | {percentile(latencies, 0.5) * 1e3:>6.2f} | "
+              f"{percentile(latencies, 0.99) * 1e3:>6.2f} | {differ:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+FraudDetector Benchmark Suite
+
+Drives FraudDetector and PaymentService in-process with the seeded
+synthetic workload (benchmarks/workload.py) and reports, per scenario,
+throughput (ops/s), per-call latency (p50 / p99) and memory per sender.
+Results can be saved as a JSON baseline and compared against a later run.
+
+Scenarios cover:
+- history depth: senders holding 0-100 stored transactions
+- sender cardinality: 1K to 10M known senders (10M only in --profile full;
+  it needs ~15 GB of RAM)
+- attack mixes: velocity bursts, flagged receivers, a combined attack
+- entry points: evaluate_transaction, evaluate_batch, process_payment
+
+Usage:
+    python -m benchmarks.suite [--profile quick|full] [--only PATTERN]
+                               [--repeat N] [--save baseline.json]
+                               [--compare baseline.json] [--threshold 0.1]
+
+--compare exits with status 1 when any scenario regressed by more than the
+threshold in throughput or p50 latency, so it can gate CI. On shared or
+noisy machines use --repeat 3 (each scenario keeps its fastest run) for
+both the baseline and the comparison.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.models.schemas import TransactionRequest
+from app.services.fraud_detector import FraudDetector
+from app.services.payment_service import PaymentService
+from app.services.state_store import InMemoryStateStore
+from benchmarks.workload import TransactionGenerator, history_rows, sender_id
+
+SEED = 20260302
+BATCH_SIZE = 500
+# Senders pre-loaded under tracemalloc to measure bytes per sender
+MEMORY_SAMPLE = 10_000
+# Distinct history templates shared round-robin by pre-loaded senders
+HISTORY_TEMPLATES = 64
+
+
+def scenario(name: str, senders: int, depth: int, mix: str = "normal", target: str = "evaluate",
+             ops: int = 20_000) -> dict:
+    return {"name": name, "target": target, "senders": senders, "depth": depth, "mix": mix, "ops": ops}
+
+
+def build_scenarios(profile: str) -> List[dict]:
+    ops = 20_000 if profile == "quick" else 100_000
+    scenarios = [scenario(f"depth_{depth}", 10_000, depth, ops=ops) for depth in (0, 10, 50, 100)]
+
+    cardinalities = [1_000, 100_000, 1_000_000]
+    if profile == "full":
+        cardinalities.append(10_000_000)
+    scenarios += [scenario(f"senders_{_short(count)}", count, 1, ops=ops) for count in cardinalities]
+
+    scenarios += [scenario(f"mix_{mix}", 10_000, 10, mix, ops=ops) for mix in ("velocity", "flagged", "attack")]
+    scenarios.append(scenario("batch_attack", 10_000, 10, "attack", target="batch", ops=ops))
+    scenarios.append(scenario("payment_attack", 10_000, 10, "attack", target="payment", ops=ops))
+    return scenarios
+
+
+def _short(count: int) -> str:
+    return f"{count // 1_000_000}M" if count >= 1_000_000 else f"{count // 1_000}K"
+
+
+# ========== Measurement ==========
+
+def preload(detector: FraudDetector, senders: int, depth: int):
+    """Give every sender `depth` stored transactions without scoring them"""
+    templates = [history_rows(SEED + k, depth) for k in range(HISTORY_TEMPLATES)]
+    store = detector.store
+    for n in range(senders):
+        with store.sender(sender_id(n)) as state:
+            for time_us, amount, receiver_id in templates[n % HISTORY_TEMPLATES]:
+                detector._apply_transaction(state, receiver_id, amount, time_us)
+
+
+def bytes_per_sender(depth: int) -> float:
+    """Heap held per sender with `depth` stored transactions"""
+    detector = FraudDetector(store=InMemoryStateStore())
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    preload(detector, MEMORY_SAMPLE, depth)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held / MEMORY_SAMPLE
+
+
+def percentile(sorted_values: List[int], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def timed_calls(call, items: list) -> List[int]:
+    """Nanoseconds per call(item)"""
+    clock = time.perf_counter_ns
+    latencies = []
+    append = latencies.append
+    for item in items:
+        started = clock()
+        call(item)
+        append(clock() - started)
+    return latencies
+
+
+def run_scenario(spec: dict) -> dict:
+    detector = FraudDetector(store=InMemoryStateStore(payment_max_entries=spec["ops"]))
+    preload(detector, spec["senders"], spec["depth"])
+    transactions = TransactionGenerator(SEED, spec["senders"], spec["mix"]).take(spec["ops"])
+    warmup = min(1_000, spec["ops"] // 10)
+    gc.collect()
+
+    target = spec["target"]
+    if target == "evaluate":
+        evaluate = detector.evaluate_transaction
+        timed_calls(lambda tx: evaluate(*tx), transactions[:warmup])
+        started = time.perf_counter()
+        latencies = timed_calls(lambda tx: evaluate(*tx), transactions[warmup:])
+        elapsed = time.perf_counter() - started
+        ops = len(latencies)
+
+    elif target == "batch":
+        requests = [
+            TransactionRequest(amount=tx[0], sender_id=tx[1], receiver_id=tx[2], timestamp=tx[3])
+            for tx in transactions
+        ]
+        batches = [requests[start:start + BATCH_SIZE] for start in range(0, len(requests), BATCH_SIZE)]
+        started = time.perf_counter()
+        per_batch = timed_calls(detector.evaluate_batch, batches)
+        elapsed = time.perf_counter() - started
+        # Amortized per transaction, so percentiles are comparable with single calls
+        latencies = [ns // len(batch) for ns, batch in zip(per_batch, batches)]
+        ops = len(requests)
+
+    elif target == "payment":
+        requests = [
+            TransactionRequest(amount=tx[0], sender_id=tx[1], receiver_id=tx[2], timestamp=tx[3])
+            for tx in transactions
+        ]
+        latencies, elapsed = asyncio.run(_drive_payments(detector, requests, warmup))
+        ops = len(latencies)
+
+    else:
+        raise ValueError(f"Unknown target '{target}'")
+
+    latencies.sort()
+    return {
+        **{key: spec[key] for key in ("target", "senders", "depth", "mix")},
+        "ops": ops,
+        "ops_per_s": round(ops / elapsed, 1),
+        "p50_us": round(percentile(latencies, 0.50) / 1000, 2),
+        "p99_us": round(percentile(latencies, 0.99) / 1000, 2),
+        "bytes_per_sender": round(bytes_per_sender(spec["depth"]), 1),
+    }
+
+
+async def _drive_payments(detector: FraudDetector, requests: List[TransactionRequest], warmup: int) -> tuple:
+    """process_payment needs a running loop for its settlement queue"""
+    service = PaymentService(fraud_detector=detector)
+    process = service.process_payment
+    timed_calls(process, requests[:warmup])
+
+    clock = time.perf_counter_ns
+    latencies = []
+    started = time.perf_counter()
+    for n, request in enumerate(requests[warmup:]):
+        began = clock()
+        process(request)
+        latencies.append(clock() - began)
+        if n % 256 == 0:
+            # Let settler tasks drain the queue as they would under real traffic
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    await service.settlement.stop()
+    return latencies, elapsed
+
+
+# ========== Baselines ==========
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "seed": SEED,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Print changes against a baseline; returns the names of regressed scenarios"""
+    regressed = []
+    print(f"\n{'scenario':>16} | {'ops/s':>9} | {'p50':>8} | {'p99':>8}")
+    print(f"{'-' * 16}-+-{'-' * 9}-+-{'-' * 8}-+-{'-' * 8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:>16} | {'new':>9} | {'':>8} | {'':>8}")
+            continue
+        throughput = result["ops_per_s"] / before["ops_per_s"] - 1
+        p50 = result["p50_us"] / before["p50_us"] - 1
+        p99 = result["p99_us"] / before["p99_us"] - 1
+        marker = ""
+        if throughput < -threshold or p50 > threshold:
+            regressed.append(name)
+            marker = "  REGRESSED"
+        print(f"{name:>16} | {throughput:>+8.1%} | {p50:>+7.1%} | {p99:>+7.1%}{marker}")
+    return regressed
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="In-process FraudDetector benchmark suite")
+    parser.add_argument("--profile", choices=("quick", "full"), default="quick")
+    parser.add_argument("--only", help="Run scenarios whose name matches this glob (e.g. 'depth_*')")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; the fastest is kept")
+    parser.add_argument("--save", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative throughput / p50 change counted as a regression")
+    args = parser.parse_args(argv)
+
+    scenarios = build_scenarios(args.profile)
+    if args.only:
+        scenarios = [spec for spec in scenarios if fnmatch.fnmatch(spec["name"], args.only)]
+
+    print(f"{'scenario':>16} | {'senders':>10} | {'depth':>5} | {'ops/s':>9} | {'p50 us':>7} | "
+          f"{'p99 us':>7} | {'B/sender':>8}")
+    print(f"{'-' * 16}-+-{'-' * 10}-+-{'-' * 5}-+-{'-' * 9}-+-{'-' * 7}-+-{'-' * 7}-+-{'-' * 8}")
+    results = {}
+    for spec in scenarios:
+        runs = [run_scenario(spec) for _ in range(max(1, args.repeat))]
+        result = results[spec["name"]] = max(runs, key=lambda run: run["ops_per_s"])
+        print(f"{spec['name']:>16} | {spec['senders']:>10,} | {spec['depth']:>5} | {result['ops_per_s']:>9,.0f} | "
+              f"{result['p50_us']:>7.1f} | {result['p99_us']:>7.1f} | {result['bytes_per_sender']:>8,.0f}",
+              flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {"environment": environment(), "profile": args.profile, "repeat": args.repeat, "results": results},
+                f,
+                indent=2
+            )
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("machine") != platform.machine():
+            print("\nNote: baseline was recorded on a different machine type", file=sys.stderr)
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Synthetic Workload
+
+Seeded transaction generator shared by the benchmark suite. The same seed
+and parameters always produce the same transactions, so runs on different
+commits (or machines) score identical traffic.
+
+Traffic is ordinary payments from uniformly chosen senders, mixed with
+attack patterns at configurable shares:
+
+- velocity_burst: one sender fires 6-12 payments within a couple of minutes
+- flagged: payments to receivers on the flagged list
+- night_round: round-amount transfers between 01:00 and 04:00
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from app.services.flagged_accounts import DEFAULT_FLAGGED_ACCOUNTS
+from app.services.velocity_window import to_epoch_us
+
+# (amount, sender_id, receiver_id, timestamp)
+Transaction = Tuple[float, str, str, str]
+
+# Attack mixes by name: {pattern: share of generated transactions}
+MIXES: Dict[str, Dict[str, float]] = {
+    "normal": {},
+    "velocity": {"velocity_burst": 0.3},
+    "flagged": {"flagged": 0.2},
+    "attack": {"velocity_burst": 0.25, "flagged": 0.15, "night_round": 0.1},
+}
+
+START = datetime(2026, 3, 2)
+MERCHANTS = 2000
+
+
+def sender_id(n: int) -> str:
+    return f"sender_{n}"
+
+
+class TransactionGenerator:
+    """Deterministic stream of synthetic transactions"""
+
+    def __init__(self, seed: int, senders: int, mix: str = "normal", start: datetime = START,
+                 mean_gap_s: float = 2.0):
+        """
+        Args:
+            seed: Random seed; identical arguments give identical streams
+            senders: Sender cardinality (IDs sender_0 .. sender_{senders-1})
+            mix: Key of MIXES
+            start: Timestamp of the first transaction
+            mean_gap_s: Mean seconds between consecutive transactions
+        """
+        if mix not in MIXES:
+            raise ValueError(f"Unknown mix '{mix}' (expected one of {', '.join(MIXES)})")
+        self.rng = random.Random(seed)
+        self.senders = senders
+        self.patterns = list(MIXES[mix].items())
+        self.now = start
+        self.mean_gap_s = mean_gap_s
+        self.flagged = sorted(DEFAULT_FLAGGED_ACCOUNTS)
+
+    def take(self, count: int) -> List[Transaction]:
+        stream = iter(self)
+        return [next(stream) for _ in range(count)]
+
+    def __iter__(self) -> Iterator[Transaction]:
+        rng = self.rng
+        while True:
+            pattern = None
+            roll = rng.random()
+            for name, share in self.patterns:
+                if roll < share:
+                    pattern = name
+                    break
+                roll -= share
+
+            if pattern == "velocity_burst":
+                yield from self._burst()
+                continue
+
+            self.now += timedelta(seconds=rng.expovariate(1 / self.mean_gap_s))
+            sender = sender_id(rng.randrange(self.senders))
+            if pattern == "flagged":
+                yield round(rng.uniform(500, 60000), 2), sender, rng.choice(self.flagged), self._timestamp()
+            elif pattern == "night_round":
+                when = self.now.replace(hour=rng.randrange(1, 4))
+                yield float(rng.choice([1000, 5000, 10000, 50000])), sender, self._merchant(), when.isoformat() + "Z"
+            else:
+                yield self._amount(), sender, self._merchant(), self._timestamp()
+
+    def _burst(self) -> Iterator[Transaction]:
+        rng = self.rng
+        sender = sender_id(rng.randrange(self.senders))
+        for _ in range(rng.randrange(6, 13)):
+            self.now += timedelta(seconds=rng.uniform(2, 15))
+            yield round(rng.uniform(50, 3000), 2), sender, self._merchant(), self._timestamp()
+
+    def _amount(self) -> float:
+        # Log-normal: most payments are small, with a long tail
+        return round(min(self.rng.lognormvariate(4.5, 1.2), 95000.0), 2)
+
+    def _merchant(self) -> str:
+        return f"merchant_{self.rng.randrange(MERCHANTS)}"
+
+    def _timestamp(self) -> str:
+        return self.now.isoformat() + "Z"
+
+
+def history_rows(seed: int, depth: int) -> List[Tuple[int, float, str]]:
+    """
+    `depth` past (epoch us, amount, receiver) rows ending before START,
+    for pre-loading a sender's history without scoring
+    """
+    rng = random.Random(seed)
+    first = START - timedelta(hours=3 * depth)
+    return [
+        (to_epoch_us(first + timedelta(hours=3 * n)), round(rng.lognormvariate(4.5, 1.2), 2),
+         f"merchant_{rng.randrange(MERCHANTS)}")
+        for n in range(depth)
+    ]
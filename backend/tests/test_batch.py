@@ -0,0 +1,44 @@
+"""Batch scoring: evaluate_batch (vectorized and per-item) matches sequential evaluate_transaction"""
+
+import pytest
+
+from app.models.schemas import TransactionRequest
+from app.services.fraud_detector import FraudDetector
+from benchmarks.workload import TransactionGenerator
+
+SEED = 20260302
+
+
+def requests(transactions) -> list:
+    return [
+        TransactionRequest(amount=amount, sender_id=sender, receiver_id=receiver, timestamp=timestamp)
+        for amount, sender, receiver, timestamp in transactions
+    ]
+
+
+def sequential(transactions, **kwargs) -> list:
+    detector = FraudDetector(**kwargs)
+    return [detector.evaluate_transaction(*transaction).model_dump() for transaction in transactions]
+
+
+@pytest.mark.parametrize("mix", ["normal", "velocity", "flagged", "attack"])
+def test_batch_matches_sequential(mix):
+    # Few senders, so batches repeat senders and history-dependent factors see earlier items
+    transactions = TransactionGenerator(SEED, senders=40, mix=mix).take(600)
+    expected = sequential(transactions)
+
+    detector = FraudDetector()
+    results = []
+    for start in range(0, len(transactions), 128):
+        results.extend(detector.evaluate_batch(requests(transactions[start:start + 128])))
+    assert [result.model_dump() for result in results] == expected
+
+
+def test_batch_with_custom_pipeline_matches_sequential():
+    # A non-default pipeline takes the per-item path
+    stages = ["recipient", "amount", "behavior", "context"]
+    transactions = TransactionGenerator(SEED, senders=40, mix="attack").take(300)
+    expected = sequential(transactions, stages=stages)
+
+    results = FraudDetector(stages=stages).evaluate_batch(requests(transactions))
+    assert [result.model_dump() for result in results] == expected
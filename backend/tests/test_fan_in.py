@@ -0,0 +1,82 @@
+"""Receiver fan-in: windows by transaction time, future-dated clamping, expiry, established receivers"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.config import Settings
+from app.services.fraud_detector import FraudDetector
+from app.services.receiver_fan_in import ReceiverFanIn
+
+START = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+MINUTE_US = 60_000_000
+
+
+def iso(moment: datetime) -> str:
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def fan_in_flags(result) -> list:
+    return [(flag.code, flag.params) for flag in result.flags or [] if flag.code.startswith("FAN_IN")]
+
+
+def spread_payers(detector: FraudDetector, payers: int = 300, days: int = 3) -> list:
+    step = timedelta(days=days) / payers
+    return [
+        detector.evaluate_transaction(45.0, f"payer_{n}", "merchant", iso(START + n * step))
+        for n in range(payers)
+    ]
+
+
+def test_disabled_by_default():
+    assert Settings().fan_in_window_s == 0
+    assert not FraudDetector().fan_in.enabled
+
+
+def test_future_dated_payment_does_not_hold_the_window_open():
+    baseline = FraudDetector(fan_in=ReceiverFanIn(600, established_s=0))
+    expected = [(result.decision, result.risk_score) for result in spread_payers(baseline)]
+
+    detector = FraudDetector(fan_in=ReceiverFanIn(600, established_s=0))
+    detector.evaluate_transaction(45.0, "early_payer", "merchant", "2099-01-01T00:00:00Z")
+    results = spread_payers(detector)
+    assert not any(fan_in_flags(result) for result in results)
+    # The 2099 payment counts as now; the 2026 traffic that follows scores as it would without it
+    assert [(result.decision, result.risk_score) for result in results] == expected
+
+
+def test_burst_of_distinct_senders_is_flagged():
+    detector = FraudDetector(fan_in=ReceiverFanIn(600, threshold=10))
+    results = [
+        detector.evaluate_transaction(45.0, f"victim_{n}", "mule", iso(START + timedelta(seconds=10 * n)))
+        for n in range(25)
+    ]
+    assert not fan_in_flags(results[8])
+    assert fan_in_flags(results[9]) == [("FAN_IN_HIGH", (10, 10))]
+    assert fan_in_flags(results[19]) == [("FAN_IN_EXTREME", (20, 10))]
+
+
+def test_counts_follow_each_payment_window():
+    fan_in = ReceiverFanIn(600)
+    start_us = int(START.timestamp() * 1_000_000)
+    for n in range(5):
+        fan_in.add("merchant", f"sender_{n}", start_us + n * MINUTE_US)
+    assert fan_in.count("merchant", "new", start_us + 5 * MINUTE_US) == 6
+    assert fan_in.count("merchant", "sender_0", start_us + 5 * MINUTE_US) == 5
+    # Twelve minutes on, only the senders of the last ten minutes count
+    assert fan_in.count("merchant", "new", start_us + 12 * MINUTE_US) == 3
+    # A backdated payment older than the window of the newest one is not recorded
+    fan_in.add("merchant", "late", start_us - 60 * MINUTE_US)
+    assert fan_in.count("merchant", "late", start_us + 4 * MINUTE_US) == 6
+
+
+def test_steady_receivers_are_exempt():
+    fan_in = ReceiverFanIn(600, established_s=3600)
+    start_us = int(START.timestamp() * 1_000_000)
+    for n in range(120):
+        fan_in.add("merchant", f"shopper_{n}", start_us + n * MINUTE_US)
+        if n == 30:
+            assert fan_in.count("merchant", "new", start_us + n * MINUTE_US) == 11
+    assert fan_in.count("merchant", "new", start_us + 120 * MINUTE_US) == 0
+
+    # A receiver that went quiet starts afresh
+    fan_in.add("merchant", "returning", start_us + 300 * MINUTE_US)
+    assert fan_in.count("merchant", "new", start_us + 300 * MINUTE_US) == 2
@@ -0,0 +1,39 @@
+"""Fast-decision mode and stage configuration: same decisions and default scores as the full pipeline"""
+
+import pytest
+
+from app.services.fraud_detector import FraudDetector
+from benchmarks.workload import TransactionGenerator
+
+SEED = 20260302
+MIXES = ["normal", "velocity", "flagged", "attack"]
+
+
+def score(detector: FraudDetector, transactions, fast=None) -> list:
+    return [detector.evaluate_transaction(*transaction, fast=fast) for transaction in transactions]
+
+
+@pytest.mark.parametrize("mix", MIXES)
+def test_fast_mode_gives_the_full_pipeline_decisions(mix):
+    transactions = TransactionGenerator(SEED, senders=40, mix=mix).take(600)
+    full = score(FraudDetector(), transactions)
+    fast = score(FraudDetector(), transactions, fast=True)
+
+    assert [result.decision for result in fast] == [result.decision for result in full]
+    # Skipped stages only ever lower the reported score
+    assert all(f.risk_score <= r.risk_score for f, r in zip(fast, full))
+    assert all(result.skipped_factors is not None for result in fast)
+    assert any(result.skipped_factors for result in fast)
+
+
+@pytest.mark.parametrize("mix", MIXES)
+def test_default_stage_configuration_keeps_default_scores(mix):
+    transactions = TransactionGenerator(SEED, senders=40, mix=mix).take(400)
+    expected = [result.model_dump() for result in score(FraudDetector(), transactions)]
+
+    configured = FraudDetector(stages=list(FraudDetector.DEFAULT_STAGES))
+    assert [result.model_dump() for result in score(configured, transactions)] == expected
+
+    reconfigured = FraudDetector(stages=["amount", "context"])
+    reconfigured.configure_stages(FraudDetector.DEFAULT_STAGES)
+    assert [result.model_dump() for result in score(reconfigured, transactions)] == expected
@@ -0,0 +1,120 @@
+"""Flagged-account lists: mmap lookups behind the Bloom filter, the index sidecar, duplicates, unsorted lists and reloads"""
+
+import mmap
+import os
+
+import numpy as np
+
+from app.services import flagged_accounts
+from app.services.flagged_accounts import DEFAULT_FLAGGED_ACCOUNTS, BloomFilter, FlaggedAccountStore
+
+ACCOUNTS = sorted(f"acct_{n:05d}" for n in range(0, 2_000, 2))
+
+
+def write_list(path, accounts, newline_at_end: bool = True):
+    body = "\n".join(accounts) + ("\n" if newline_at_end else "")
+    path.write_bytes(body.encode("utf-8"))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    keys = [f"key_{n}".encode() for n in range(5_000)]
+    bloom = BloomFilter.for_capacity(len(keys), 0.01)
+    bloom.add_many(keys)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other_{n}".encode() in bloom for n in range(5_000))
+    assert false_positives < 5_000 * 0.03
+
+
+def test_sorted_list_is_searched_in_place(tmp_path):
+    path = tmp_path / "flagged.txt"
+    write_list(path, ACCOUNTS)
+    store = FlaggedAccountStore(str(path))
+    assert len(store) == len(ACCOUNTS)
+    assert all(account in store for account in ACCOUNTS)
+    assert not any(f"acct_{n:05d}" in store for n in range(1, 2_000, 2))
+    assert "acct" not in store and "zzz" not in store and "" not in store
+    assert os.path.exists(f"{path}.idx")
+
+    # A second load reuses the sidecar index and answers the same
+    reloaded = FlaggedAccountStore(str(path))
+    assert all(account in reloaded for account in ACCOUNTS[::37])
+
+
+def test_last_line_without_newline(tmp_path):
+    path = tmp_path / "flagged.txt"
+    write_list(path, ACCOUNTS, newline_at_end=False)
+    store = FlaggedAccountStore(str(path))
+    assert ACCOUNTS[-1] in store
+    assert ACCOUNTS[0] in store
+
+
+def test_pages_follow_sorted_order(tmp_path):
+    path = tmp_path / "flagged.txt"
+    write_list(path, ACCOUNTS)
+    store = FlaggedAccountStore(str(path))
+    seen, cursor = [], None
+    while True:
+        ids, cursor = store.page(cursor, 300)
+        seen.extend(ids)
+        if cursor is None:
+            break
+    assert seen == ACCOUNTS
+
+
+def test_unsorted_list_is_loaded_into_memory(tmp_path):
+    path = tmp_path / "flagged.txt"
+    write_list(path, ["zeta", "alpha", "mid"])
+    store = FlaggedAccountStore(str(path))
+    assert "alpha" in store and "zeta" in store
+    assert "beta" not in store
+    assert store.page()[0] == ["alpha", "mid", "zeta"]
+
+
+def test_unsorted_fallback_closes_the_mapping(tmp_path, monkeypatch):
+    maps = []
+    original = mmap.mmap
+
+    def recording_mmap(*args, **kwargs):
+        maps.append(original(*args, **kwargs))
+        return maps[-1]
+
+    monkeypatch.setattr(flagged_accounts.mmap, "mmap", recording_mmap)
+    path = tmp_path / "flagged.txt"
+    write_list(path, ["zeta", "alpha", "mid"])
+    store = FlaggedAccountStore(str(path))
+    assert store.reload(force=True)
+    assert len(maps) == 2
+    assert all(mapping.closed for mapping in maps)
+
+
+def test_repeated_lines_are_counted_once(tmp_path):
+    path = tmp_path / "flagged.txt"
+    write_list(path, ["acct_a", "acct_b", "acct_b", "acct_b", "acct_c"])
+    store = FlaggedAccountStore(str(path))
+    assert len(store) == 3
+    assert store.page()[0] == ["acct_a", "acct_b", "acct_c"]
+    assert store.page(limit=2) == (["acct_a", "acct_b"], "acct_b")
+    assert store.page(cursor="acct_b")[0] == ["acct_c"]
+    # Same count from the cached index
+    assert len(FlaggedAccountStore(str(path))) == 3
+
+
+def test_reload_swaps_in_a_changed_list(tmp_path):
+    path = tmp_path / "flagged.txt"
+    write_list(path, ["acct_a", "acct_b"])
+    store = FlaggedAccountStore(str(path))
+    assert not store.reload()
+
+    replacement = tmp_path / "flagged.tmp"
+    write_list(replacement, ["acct_b", "acct_c", "acct_d"])
+    os.replace(replacement, path)
+    assert store.reload()
+    assert "acct_a" not in store
+    assert "acct_c" in store
+    assert len(store) == 3
+
+
+def test_contains_many_and_default_list():
+    store = FlaggedAccountStore()
+    ids = np.array([DEFAULT_FLAGGED_ACCOUNTS[0], "clean", DEFAULT_FLAGGED_ACCOUNTS[0]], dtype=object)
+    assert store.contains_many(ids).tolist() == [True, False, True]
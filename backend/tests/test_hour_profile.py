@@ -0,0 +1,116 @@
+"""Per-sender hour profile: counting, local days, decay-free shares, persistence, journal replay and pre-1970 times"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.fraud_detector import FraudDetector
+from app.services.hour_profile import HourProfile, local_time_us
+from app.services.journal import TransactionJournal
+from app.services.state_store import InMemoryStateStore
+from app.services.velocity_window import to_epoch_us
+
+HOUR_US = 3_600_000_000
+DAY_US = 24 * HOUR_US
+
+
+def test_counts_each_hour_once_per_day():
+    profile = HourProfile()
+    for minute in range(5):
+        profile.add(3 * HOUR_US + minute * 60_000_000)
+    assert profile.weight == 1.0
+    profile.add(DAY_US + 3 * HOUR_US)
+    assert profile.weight > 1.9
+
+
+def test_backdated_payment_does_not_count_a_day_twice():
+    profile = HourProfile()
+    profile.add(10 * DAY_US + 3 * HOUR_US)
+    profile.add(8 * DAY_US + 3 * HOUR_US)
+    profile.add(10 * DAY_US + 3 * HOUR_US + 60_000_000)
+    assert profile.weight == 1.0
+
+
+def test_days_are_local_days():
+    # 23:30 and 00:30 the next day at UTC+02:00 are two local days, though one UTC day
+    profile = HourProfile()
+    profile.add(local_time_us(21 * HOUR_US + 30 * 60_000_000, 120))
+    profile.add(local_time_us(DAY_US + 21 * HOUR_US + 30 * 60_000_000, 120))
+    assert profile.weight > 1.9
+    assert profile.share(23) == pytest.approx(1.0)
+
+
+def test_share_includes_neighbouring_hours():
+    profile = HourProfile()
+    for day in range(10):
+        profile.add(day * DAY_US + 2 * HOUR_US)
+        profile.add(day * DAY_US + 14 * HOUR_US)
+    # Later (day, hour) pairs weigh slightly more, so the two habits are close to, not exactly, half each
+    assert profile.share(1) == pytest.approx(0.5, abs=0.01)
+    assert profile.share(2) == pytest.approx(0.5, abs=0.01)
+    assert profile.share(8) == 0.0
+    assert HourProfile().share(2) == 0.0
+
+
+def test_state_round_trip():
+    profile = HourProfile.from_times([day * DAY_US + 9 * HOUR_US for day in range(30)])
+    restored = HourProfile.from_state(profile.to_state())
+    assert restored.weight == profile.weight
+    assert restored.share(9) == profile.share(9)
+    restored.add(29 * DAY_US + 9 * HOUR_US)
+    assert restored.weight == profile.weight
+
+
+def test_pre_epoch_times():
+    profile = HourProfile()
+    time_us = to_epoch_us(datetime(1960, 1, 1, 5, tzinfo=timezone.utc))
+    assert time_us < 0
+    profile.add(time_us)
+    profile.add(time_us)
+    assert profile.weight == 1.0
+    assert HourProfile.from_state(profile.to_state()).share(5) == pytest.approx(1.0)
+
+
+def test_detector_accepts_pre_epoch_timestamps():
+    detector = FraudDetector()
+    result = detector.evaluate_transaction(10.0, "sender_1", "merchant_1", "1960-01-01T00:00:00Z")
+    assert result.decision in ("approve", "warn", "block")
+    stats = detector.store.state_stats()
+    assert stats["senders"] == 1 and stats["transactions"] == 1
+
+
+def test_malformed_timestamp_is_stored_at_current_utc_time():
+    detector = FraudDetector()
+    before = to_epoch_us(datetime.now(timezone.utc))
+    detector.evaluate_transaction(10.0, "sender", "merchant", "not a timestamp")
+    after = to_epoch_us(datetime.now(timezone.utc))
+    with detector.store.sender("sender") as state:
+        (stored, _, _), = state.history.entries()
+    assert before <= stored <= after
+
+
+def test_journal_replay_restores_local_hours(tmp_path):
+    def open_detector():
+        store = InMemoryStateStore()
+        journal = TransactionJournal(str(tmp_path), store)
+        detector = FraudDetector(store=store, journal=journal)
+        journal.restore(detector._apply_transaction)
+        return detector, journal
+
+    detector, journal = open_detector()
+    # A night-shift sender at UTC-05:00, out of order on some days
+    for day in (3, 1, 2, 5, 4, 6, 9, 7, 8, 10):
+        detector.evaluate_transaction(40.0, "sender", f"merchant_{day}", f"2026-03-{day:02d}T03:15:00-05:00")
+        detector.evaluate_transaction(40.0, "sender", "merchant_0", f"2026-03-{day:02d}T23:45:00-05:00")
+    journal.close(snapshot=False)
+
+    restored, journal = open_detector()
+    try:
+        with detector.store.sender("sender") as live, restored.store.sender("sender") as replayed:
+            assert replayed.hours.to_state() == live.hours.to_state()
+        later = ("2026-03-11T03:20:00-05:00", "2026-03-11T14:00:00+09:00")
+        assert [restored.evaluate_transaction(40.0, "sender", "merchant_0", t) for t in later] == [
+            detector.evaluate_transaction(40.0, "sender", "merchant_0", t) for t in later
+        ]
+    finally:
+        journal.close()
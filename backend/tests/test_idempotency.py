@@ -0,0 +1,124 @@
+"""Idempotency keys: replay, reuse with another body, abandoned and cancelled requests, LRU/TTL eviction"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.models.schemas import TransactionRequest
+from app.services.fraud_detector import FraudDetector
+from app.services.idempotency import IdempotencyCache, IdempotencyKeyReused
+from app.services.payment_service import PaymentService
+
+FINGERPRINT = (100.0, "sender", "merchant", "2026-03-02T10:00:00Z")
+
+
+def payment(amount: float = 100.0) -> TransactionRequest:
+    return TransactionRequest(amount=amount, sender_id="sender", receiver_id="merchant", timestamp="2026-03-02T10:00:00Z")
+
+
+def test_repeated_key_replays_the_payment():
+    async def run():
+        service = PaymentService()
+        first, replayed_first = await service.process_payment_once(payment(), "key-1")
+        second, replayed_second = await service.process_payment_once(payment(), "key-1")
+        return first, replayed_first, second, replayed_second, service
+
+    first, replayed_first, second, replayed_second, service = asyncio.run(run())
+    assert (replayed_first, replayed_second) == (False, True)
+    assert second.payment_id == first.payment_id
+    assert service.fraud_detector.store.state_stats()["transactions"] == 1
+
+
+def test_key_reused_with_another_body():
+    async def run():
+        service = PaymentService()
+        await service.process_payment_once(payment(), "key-1")
+        await service.process_payment_once(payment(250.0), "key-1")
+
+    with pytest.raises(IdempotencyKeyReused):
+        asyncio.run(run())
+
+
+def test_abandoned_key_runs_again():
+    async def run():
+        cache = IdempotencyCache()
+        future = cache.begin("key-1", FINGERPRINT)
+        cache.abandon("key-1", future, RuntimeError("scoring failed"))
+        return cache.get("key-1", FINGERPRINT), future
+
+    retry, future = asyncio.run(run())
+    assert retry is None
+    assert isinstance(future.exception(), RuntimeError)
+
+
+def test_cancelled_request_releases_its_key():
+    release = threading.Event()
+
+    class SlowDetector(FraudDetector):
+        def evaluate_transaction(self, *args, **kwargs):
+            release.wait(5)
+            return super().evaluate_transaction(*args, **kwargs)
+
+    async def run():
+        service = PaymentService(SlowDetector())
+        first = asyncio.create_task(service.process_payment_once(payment(), "key-1"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await asyncio.wait_for(service.process_payment_once(payment(), "key-1"), 5)
+
+    result, replayed = asyncio.run(run())
+    assert not replayed
+    assert result.status == "pending"
+
+
+def test_in_flight_keys_are_not_evicted():
+    release = threading.Event()
+
+    class SlowDetector(FraudDetector):
+        def evaluate_transaction(self, *args, **kwargs):
+            release.wait(5)
+            return super().evaluate_transaction(*args, **kwargs)
+
+    async def run():
+        service = PaymentService(SlowDetector())
+        service.idempotency = IdempotencyCache(max_entries=1)
+        first = asyncio.create_task(service.process_payment_once(payment(), "key-1"))
+        second = asyncio.create_task(service.process_payment_once(payment(200.0), "key-2"))
+        await asyncio.sleep(0.05)
+        # Both in flight: a retry of the first must wait for it, not start another payment
+        retry = asyncio.create_task(service.process_payment_once(payment(), "key-1"))
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.wait_for(asyncio.gather(first, second, retry), 5)
+        # Completed keys are evicted down to the limit by the next request
+        service.idempotency.begin("key-3", FINGERPRINT).set_result(None)
+        return results, len(service.idempotency)
+
+    (first, second, retry), remaining = asyncio.run(run())
+    assert first[1] is False and second[1] is False
+    assert retry == (first[0], True)
+    assert remaining == 1
+
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    async def run():
+        cache = IdempotencyCache(max_entries=2, ttl_s=60)
+        for key in ("a", "b"):
+            cache.begin(key, FINGERPRINT).set_result(None)
+        cache.get("a", FINGERPRINT)  # b is now least recently used
+        cache.begin("c", FINGERPRINT).set_result(None)
+        kept = sorted(key for key in "abc" if cache.get(key, FINGERPRINT) is not None)
+
+        now = time.monotonic()
+        monkeypatch.setattr("app.services.idempotency.time.monotonic", lambda: now + 61)
+        return kept, cache.get("a", FINGERPRINT), len(cache)
+
+    kept, expired, remaining = asyncio.run(run())
+    assert kept == ["a", "c"]
+    assert expired is None
+    assert remaining == 1
@@ -0,0 +1,136 @@
+"""Transaction journal: replay, torn-write truncation, snapshot round-trips, old segments and oversized IDs"""
+
+import os
+import struct
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.fraud_detector import FraudDetector
+from app.services.journal import MAX_ID_BYTES, TransactionJournal
+from app.services.state_store import InMemoryStateStore
+
+TIMESTAMP = "2026-03-02T10:{:02d}:00Z"
+
+
+def open_detector(directory: str):
+    store = InMemoryStateStore()
+    journal = TransactionJournal(directory, store)
+    detector = FraudDetector(store=store, journal=journal)
+    journal.restore(detector._apply_transaction)
+    return detector, journal
+
+
+def score_some(detector: FraudDetector, count: int = 20) -> list:
+    return [
+        detector.evaluate_transaction(100.0 + n, f"sender_{n % 3}", f"merchant_{n % 5}", TIMESTAMP.format(n)).risk_score
+        for n in range(count)
+    ]
+
+
+def history_counts(detector: FraudDetector) -> dict:
+    return {
+        sender_id: len(state.history)
+        for sender_id, state in detector.store.senders.items()
+    }
+
+
+def test_log_replay_restores_state(tmp_path):
+    detector, journal = open_detector(str(tmp_path))
+    score_some(detector)
+    journal.close(snapshot=False)
+    expected = history_counts(detector)
+
+    restored, journal = open_detector(str(tmp_path))
+    assert history_counts(restored) == expected
+    assert journal.last_restore["replayed_records"] == 20
+    journal.close()
+
+
+def test_snapshot_round_trip_and_continued_log(tmp_path):
+    detector, journal = open_detector(str(tmp_path))
+    score_some(detector)
+    journal.snapshot()
+    detector.evaluate_transaction(50.0, "sender_0", "merchant_9", TIMESTAMP.format(30))
+    journal.close(snapshot=False)
+    expected = history_counts(detector)
+
+    restored, journal = open_detector(str(tmp_path))
+    assert history_counts(restored) == expected
+    assert journal.last_restore["replayed_records"] == 1
+    # Scores continue identically after a restart
+    assert score_some(restored, 5) == score_some(detector, 5)
+    journal.close()
+
+
+def test_torn_record_is_truncated(tmp_path):
+    detector, journal = open_detector(str(tmp_path))
+    score_some(detector, 10)
+    journal.close(snapshot=False)
+    segment = max(name for name in os.listdir(tmp_path) if name.startswith("log."))
+    path = os.path.join(tmp_path, segment)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    restored, journal = open_detector(str(tmp_path))
+    assert sum(history_counts(restored).values()) == 9
+    journal.close()
+
+
+def test_segment_without_magic_is_replayed_at_utc(tmp_path):
+    # Written before records carried a UTC offset: seq, time_us, amount, ID lengths
+    body = struct.pack("<QqdHH", 1, 1_772_445_600_000_000, 25.0, 8, 10) + b"sender_0merchant_0"
+    with open(os.path.join(tmp_path, "log.00000000000000000001.bin"), "wb") as f:
+        f.write(struct.pack("<I", zlib.crc32(body)) + body)
+
+    restored, journal = open_detector(str(tmp_path))
+    assert history_counts(restored) == {"sender_0": 1}
+    restored.evaluate_transaction(10.0, "sender_0", "merchant_1", TIMESTAMP.format(1))
+    journal.close(snapshot=False)
+
+    restored, journal = open_detector(str(tmp_path))
+    assert history_counts(restored) == {"sender_0": 2}
+    journal.close()
+
+
+def test_oversized_id_is_rejected_before_state_changes(tmp_path):
+    detector, journal = open_detector(str(tmp_path))
+    detector.evaluate_transaction(10.0, "sender_0", "merchant_0", TIMESTAMP.format(0))
+    with pytest.raises(ValueError):
+        detector.evaluate_transaction(10.0, "sender_0", "m" * (MAX_ID_BYTES + 1), TIMESTAMP.format(1))
+    assert history_counts(detector) == {"sender_0": 1}
+    # Snapshots and shutdown still work
+    journal.snapshot()
+    journal.close()
+
+
+def test_api_rejects_long_ids():
+    from app.main import app
+    body = {"amount": 10.0, "sender_id": "s" * 70_000, "receiver_id": "merchant", "timestamp": TIMESTAMP.format(0)}
+    response = TestClient(app).post("/api/evaluate-transaction", json=body)
+    assert response.status_code == 422
+    # Measured in UTF-8 bytes: 20,000 four-byte characters are over the limit
+    body["sender_id"] = "\U0001F600" * 20_000
+    assert TestClient(app).post("/api/evaluate-transaction", json=body).status_code == 422
+    # Long IDs within the journal's limit are accepted
+    body["sender_id"] = "s" * 300
+    assert TestClient(app).post("/api/evaluate-transaction", json=body).status_code == 200
+
+
+def test_restore_applies_the_sender_bound(tmp_path):
+    detector, journal = open_detector(str(tmp_path))
+    for n in range(20):
+        detector.evaluate_transaction(10.0, f"sender_{n}", "merchant", TIMESTAMP.format(n))
+    journal.snapshot()
+    journal.close(snapshot=False)
+
+    store = InMemoryStateStore(max_senders=5)
+    journal = TransactionJournal(str(tmp_path), store)
+    journal.restore(FraudDetector(store=store, journal=journal)._apply_transaction)
+    try:
+        assert store.sender_count() == 5
+        # The most recently written senders are the ones kept
+        assert sorted(store.senders) == [f"sender_{n}" for n in range(15, 20)]
+    finally:
+        journal.close(snapshot=False)
@@ -0,0 +1,42 @@
+"""Sharded metrics: totals across threads, shards of exited threads folded away"""
+
+import gc
+import threading
+
+from app.services.metrics import Counter, Histogram
+
+
+def run_threads(count: int, target):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+
+def test_exited_threads_leave_no_shards():
+    counter = Counter("test_total", "Test counter", ("kind",))
+    histogram = Histogram("test_seconds", "Test histogram", ("kind",), (0.1, 1.0))
+
+    def work():
+        counter.inc(("a",))
+        counter.inc(("b",), 2)
+        histogram.observe(("a",), 0.05)
+        histogram.observe(("a",), 5.0)
+
+    run_threads(500, work)
+    work()  # this thread stays alive, so its shard stays live
+
+    assert len(counter._shards) == 1
+    assert len(histogram._shards) == 1
+    assert counter.values() == {("a",): 501, ("b",): 1002}
+    assert 'test_seconds_bucket{kind="a",le="0.1"} 501' in histogram.render()
+    assert 'test_seconds_count{kind="a"} 1002' in histogram.render()
+
+
+def test_live_thread_keeps_counting_after_others_exit():
+    counter = Counter("test_total", "Test counter", ())
+    counter.inc()
+    run_threads(10, counter.inc)
+    counter.inc()
+    assert counter.values() == {(): 12}
@@ -0,0 +1,54 @@
+"""
+Public contract: the OpenAPI schema matches the committed snapshot, and the
+pre-serialized scoring responses equal what the response models would produce.
+
+After a deliberate API change, regenerate the snapshot from backend/:
+    python -c "import json; from app.main import app; open('tests/openapi.json', 'w').write(json.dumps(app.openapi(), sort_keys=True, indent=2) + '\\n')"
+"""
+
+import json
+import os
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_fraud_detector
+from app.main import app
+from app.models.schemas import PaymentResult, TransactionResponse
+from app.services.fraud_detector import FraudDetector
+from benchmarks.workload import TransactionGenerator
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), "openapi.json")
+SEED = 20260302
+
+
+def test_schema_matches_snapshot():
+    with open(SNAPSHOT) as f:
+        expected = json.load(f)
+    assert app.openapi() == expected
+
+
+def test_responses_match_response_models():
+    transactions = TransactionGenerator(SEED, senders=20, mix="attack").take(60)
+    bodies = [
+        {"amount": amount, "sender_id": sender, "receiver_id": receiver, "timestamp": timestamp}
+        for amount, sender, receiver, timestamp in transactions
+    ]
+    client = TestClient(app)
+    served = FraudDetector()
+    app.dependency_overrides[get_fraud_detector] = lambda: served
+    try:
+        single = [client.post("/api/evaluate-transaction", json=body).json() for body in bodies[:30]]
+        batch = client.post("/api/evaluate-transactions", json=bodies[30:]).json()
+    finally:
+        app.dependency_overrides.clear()
+    detector = FraudDetector()
+    expected = [
+        jsonable_encoder(TransactionResponse.model_validate(detector.evaluate_transaction(*t).model_dump()),
+                         exclude_none=True)
+        for t in transactions
+    ]
+    assert single + batch == expected
+
+    payment = client.post("/api/process-payment", json=bodies[0]).json()
+    assert jsonable_encoder(PaymentResult.model_validate(payment)) == payment
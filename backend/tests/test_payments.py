@@ -0,0 +1,74 @@
+"""Payment routes: waiting for a payment that left payment history, store calls off the event loop"""
+
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_payment_service
+from app.main import app
+from app.services.payment_service import PaymentService
+from app.services.state_store import InMemoryStateStore
+
+PAYMENT = {"amount": 100.0, "sender_id": "sender", "receiver_id": "merchant", "timestamp": "2026-03-02T10:00:00Z"}
+
+
+class EvictingPaymentService(PaymentService):
+    """Payment history drops the payment while the request waits for it"""
+
+    async def wait_for_settlement(self, payment_id: str, timeout: float):
+        self.store.clear_payments()
+        return await super().wait_for_settlement(payment_id, timeout)
+
+
+def test_wait_for_evicted_payment_returns_it_as_accepted():
+    service = EvictingPaymentService()
+    app.dependency_overrides[get_payment_service] = lambda: service
+    try:
+        response = TestClient(app).post("/api/process-payment?wait_ms=10", json=PAYMENT)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+
+
+class ThreadRecordingStore(InMemoryStateStore):
+    """Records the threads payment reads and writes run on"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def put_payment(self, result):
+        self.threads.add(threading.get_ident())
+        super().put_payment(result)
+
+    def get_payment(self, payment_id):
+        self.threads.add(threading.get_ident())
+        return super().get_payment(payment_id)
+
+    def list_payments(self, *args, **kwargs):
+        self.threads.add(threading.get_ident())
+        return super().list_payments(*args, **kwargs)
+
+
+def test_payment_store_is_not_called_on_the_event_loop():
+    store = ThreadRecordingStore()
+    service = PaymentService(store=store)
+    loop_threads = set()
+
+    async def provide_service():
+        # Async dependencies run on the event loop
+        loop_threads.add(threading.get_ident())
+        return service
+
+    app.dependency_overrides[get_payment_service] = provide_service
+    try:
+        with TestClient(app) as client:
+            payment = client.post("/api/process-payment?wait_ms=1000", json=PAYMENT).json()
+            assert payment["status"] == "success"  # settled: put twice, read back
+            assert client.get(f"/api/payments/{payment['payment_id']}").status_code == 200
+            assert client.get("/api/payments").status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+    assert store.threads
+    assert not store.threads & loop_threads
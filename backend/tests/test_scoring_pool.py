@@ -0,0 +1,106 @@
+"""
+Scoring pool: replies match the in-process detector; factor timings reach the
+caller; a stalled worker does not block the event loop; requests fail, not
+hang, once a worker has gone
+"""
+
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from app.models.schemas import TransactionRequest
+from app.services.fraud_detector import FraudDetector
+from app.services.metrics import FraudMetrics
+from app.services.profiling import RequestTimer, current_timer
+from app.services.scoring_pool import ScoringPool
+
+TRANSACTIONS = [(100.0 + n, f"sender_{n % 4}", f"merchant_{n % 3}", f"2026-03-02T10:{n:02d}:00Z") for n in range(20)]
+
+
+@pytest.fixture
+def pool():
+    pool = ScoringPool(2)
+    pool.start()
+    yield pool
+    pool.close()
+
+
+def test_matches_in_process_detector(pool):
+    detector = FraudDetector()
+    expected = [detector.evaluate_transaction(*transaction).risk_score for transaction in TRANSACTIONS]
+
+    async def score():
+        return await asyncio.gather(*(pool.evaluate_transaction_async(*transaction) for transaction in TRANSACTIONS))
+
+    assert [result.risk_score for result in asyncio.run(score())] == expected
+
+
+def test_factor_timings_are_recorded_by_the_caller():
+    metrics = FraudMetrics(factor_sample_every=1)
+    pool = ScoringPool(2, metrics=metrics)
+    pool.start()
+    try:
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            pool.evaluate_transaction(*TRANSACTIONS[0])
+        finally:
+            current_timer.reset(token)
+        pool.evaluate_batch([
+            TransactionRequest(amount=amount, sender_id=sender, receiver_id=receiver, timestamp=timestamp)
+            for amount, sender, receiver, timestamp in TRANSACTIONS
+        ])
+    finally:
+        pool.close()
+
+    phases = [name for name, _ in timer.phases]
+    factors = [name for name, _ in FraudDetector().stages]
+    assert phases == [f"factor-{name}" for name in factors] + ["history"]
+    rendered = "\n".join(metrics.factor_seconds.render())
+    for name in factors:
+        assert f'fraud_factor_duration_seconds_count{{factor="{name}"}}' in rendered
+
+
+def test_stalled_worker_does_not_block_the_event_loop(pool):
+    # Enough requests to fill the pipe while the worker is stopped
+    batch = [
+        TransactionRequest(amount=100.0, sender_id="sender_0", receiver_id=f"merchant_{n}" * 8, timestamp="2026-03-02T10:00:00Z")
+        for n in range(2000)
+    ]
+    workers = [partition.process.pid for partition in pool._partitions]
+
+    async def score():
+        for pid in workers:
+            os.kill(pid, signal.SIGSTOP)
+        try:
+            scoring = [asyncio.ensure_future(pool.evaluate_batch_async(batch)) for _ in range(5)]
+            started = time.perf_counter()
+            await asyncio.sleep(0.2)
+            stalled = time.perf_counter() - started
+        finally:
+            for pid in workers:
+                os.kill(pid, signal.SIGCONT)
+        results = await asyncio.wait_for(asyncio.gather(*scoring), 60)
+        return stalled, results
+
+    stalled, results = asyncio.run(score())
+    assert stalled < 1
+    assert all(len(result) == len(batch) for result in results)
+
+
+def test_requests_fail_after_worker_exit(pool):
+    for partition in pool._partitions:
+        partition.process.kill()
+        partition.reader.join(10)
+
+    with pytest.raises(RuntimeError):
+        pool.evaluate_transaction(*TRANSACTIONS[0])
+
+    async def score():
+        return await asyncio.wait_for(pool.evaluate_transaction_async(*TRANSACTIONS[0]), 5)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(score())
@@ -0,0 +1,81 @@
+"""In-memory sender state: LRU and idle eviction, spill reload, interned receiver bounds; SQLite sessions"""
+
+from app.services.fraud_detector import FraudDetector
+from app.services.sender_history import ReceiverInterner
+from app.services.state_store import InMemoryStateStore, SenderSpill, SQLiteStateStore
+
+
+def transaction(n: int, sender: str, receiver: str = "merchant") -> tuple:
+    return 100.0 + n, sender, receiver, f"2026-03-02T{10 + n // 60:02d}:{n % 60:02d}:00Z"
+
+
+def test_least_recently_active_senders_are_evicted():
+    store = InMemoryStateStore(max_senders=2)
+    detector = FraudDetector(store=store)
+    for n, sender in enumerate(["a", "b", "a", "c"]):
+        detector.evaluate_transaction(*transaction(n, sender))
+    assert sorted(store.senders) == ["a", "c"]
+    assert store.state_stats()["evicted_budget"] == 1
+
+
+def test_idle_senders_expire(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.state_store.time.monotonic", lambda: clock[0])
+    store = InMemoryStateStore(idle_ttl_s=60)
+    detector = FraudDetector(store=store)
+    detector.evaluate_transaction(*transaction(0, "idle"))
+    clock[0] += 120
+    detector.evaluate_transaction(*transaction(1, "active"))
+    assert list(store.senders) == ["active"]
+    assert store.state_stats()["evicted_idle"] == 1
+
+
+def test_spilled_sender_reloads_with_its_history(tmp_path):
+    spill = SenderSpill(str(tmp_path / "spill.db"))
+    store = InMemoryStateStore(max_senders=1, spill=spill)
+    detector = FraudDetector(store=store)
+    reference = FraudDetector()
+    sequence = [transaction(n, "a" if n % 2 else "b", f"merchant_{n % 3}") for n in range(12)]
+    for item in sequence:
+        assert detector.evaluate_transaction(*item).risk_score == reference.evaluate_transaction(*item).risk_score
+    stats = store.state_stats()
+    assert stats["reloaded"] > 0
+    assert stats["spilled"] == 1
+    store.close()
+
+
+def test_interned_receivers_are_released():
+    store = InMemoryStateStore(max_senders=1)
+    detector = FraudDetector(store=store)
+    for n in range(200):
+        detector.evaluate_transaction(*transaction(n, f"sender_{n}", f"merchant_{n}"))
+    # Only the resident sender's receivers stay interned
+    assert store.state_stats()["interned_receivers"] == 1
+
+    for n in range(300):
+        detector.evaluate_transaction(*transaction(n, "busy", f"shop_{n}"))
+    # Ring (100 slots) plus top-K counters, not every receiver ever paid
+    assert len(store.interner) <= 100 + 32
+
+
+def test_sqlite_sessions_release_interned_receivers(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "state.db"))
+    detector = FraudDetector(store=store)
+    for n in range(50):
+        detector.evaluate_transaction(*transaction(n, f"sender_{n % 5}", f"merchant_{n}"))
+    assert len(store.interner) == 0
+    assert store.state_stats()["senders"] == 5
+    store.close()
+
+
+def test_interner_forgets_ids_with_their_last_reference():
+    interner = ReceiverInterner()
+    index = interner.acquire("merchant")
+    interner.retain(index)
+    interner.release(index)
+    assert interner.get("merchant") == index
+    interner.release(index)
+    assert interner.get("merchant") is None
+    assert len(interner) == 0
+    # Released integers are reused
+    assert interner.acquire("other") == index
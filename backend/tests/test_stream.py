@@ -0,0 +1,39 @@
+"""NDJSON stream scoring: lines scored in order, equal to sequential evaluate_transaction, bad lines reported"""
+
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_fraud_detector
+from app.main import app
+from app.services.fraud_detector import FraudDetector
+from benchmarks.workload import TransactionGenerator
+
+SEED = 20260302
+
+
+def test_stream_matches_sequential_scoring():
+    transactions = TransactionGenerator(SEED, senders=40, mix="attack").take(1500)
+    lines = [
+        json.dumps({"amount": amount, "sender_id": sender, "receiver_id": receiver, "timestamp": timestamp})
+        for amount, sender, receiver, timestamp in transactions
+    ]
+    lines.insert(700, "{not json")
+    body = ("\n".join(lines) + "\n").encode()
+
+    served = FraudDetector()
+    app.dependency_overrides[get_fraud_detector] = lambda: served
+    try:
+        response = TestClient(app).post("/api/evaluate-stream", content=body,
+                                        headers={"Content-Type": "application/x-ndjson"})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    outputs = [json.loads(line) for line in response.text.splitlines()]
+
+    detector = FraudDetector()
+    expected = [jsonable_encoder(detector.evaluate_transaction(*t), exclude_none=True) for t in transactions]
+    error = outputs.pop(700)
+    assert error["line"] == 701 and "error" in error
+    assert outputs == expected
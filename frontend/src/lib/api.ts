@@ -41,12 +41,13 @@ export async function getFlaggedAccounts(): Promise<string[]> {
 }
 
 /**
- * Process a payment transaction with fraud detection
+ * Process a payment transaction with fraud detection.
+ * Waits up to 5s for settlement so the result carries its final status.
  */
 export async function processPayment(
   data: TransactionData
 ): Promise<PaymentResult> {
-  const response = await fetch(`${API_URL}/api/process-payment`, {
+  const response = await fetch(`${API_URL}/api/process-payment?wait_ms=5000`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
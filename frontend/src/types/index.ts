@@ -21,7 +21,7 @@ export interface FormData {
 
 export interface PaymentResult {
   payment_id: string;
-  status: "success" | "blocked";
+  status: "pending" | "success" | "failed" | "blocked";
   transaction_id: string;
   sender_id: string;
   receiver_id: string;